@@ -7,6 +7,8 @@ import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
 from pathlib import Path
+from bar_render import FigurePool, bar_chart
+from data_quality import representative_rows
 
 # ---------------- CONFIG ----------------
 INPUT_FILE = "summary_comparison.csv"
@@ -28,47 +30,46 @@ env_df = df[df["category"] == "ENV_FAIR"]
 qos_df = df[df["category"] == "QOS_EFFECT"]
 k8s_df = df[df["category"] == "K8S_POD_SCALING"]
 
+# nic_mode đại diện cho mỗi env (đánh dấu sẵn trong summary_comparison.csv, xem data_quality.py)
+representative = representative_rows(qos_df)
+
 # ---------------- VẼ BIỂU ĐỒ ----------------
+# Cột vẽ thẳng từ bảng đã gộp (bar_render.py); figure cùng kích thước được dùng lại
+figures = FigurePool()
 
 def save_plot(fig, name):
     fig.tight_layout()
     fig.savefig(OUT_DIR / name)
-    plt.close(fig)
     print(f"Saved: {OUT_DIR/name}")
 
 # ENV – Throughput, CPU, Latency
 if not env_df.empty:
-    fig, axes = plt.subplots(1, 3, figsize=(14, 5))
-    sns.barplot(data=env_df, x="env", y="throughput_mbps_mean", ax=axes[0])
+    fig, axes = figures.get((14, 5), 1, 3)
+    axes = axes[0]
+    bar_chart(axes[0], env_df, "env", "throughput_mbps_mean")
     axes[0].set_title("Throughput trung bình (Mbps)")
-    sns.barplot(data=env_df, x="env", y="cpu_mean_mean", ax=axes[1])
+    bar_chart(axes[1], env_df, "env", "cpu_mean_mean")
     axes[1].set_title("CPU trung bình (%)")
-    sns.barplot(data=env_df, x="env", y="latency_ms_mean", ax=axes[2])
+    bar_chart(axes[2], env_df, "env", "latency_ms_mean")
     axes[2].set_title("Độ trễ trung bình (ms)")
     fig.suptitle("So sánh môi trường (NOQoS – FAIR)")
     save_plot(fig, "1_env_fair_comparison.png")
 
 # ENV – Jitter Stability
 if not env_df.empty:
-    fig, ax = plt.subplots(figsize=(6,5))
-    sns.barplot(data=env_df, x="env", y="jitter_ms_mean", ax=ax)
+    fig, axes = figures.get((6, 5))
+    ax = axes[0, 0]
+    bar_chart(ax, env_df, "env", "jitter_ms_mean")
     ax.set_title("Độ ổn định truyền (Jitter trung bình, ms)")
     save_plot(fig, "2_env_fair_jitter.png")
 
 # QoS – Throughput effect (% so với NOQOS cùng env)
-# Lọc representative nic_mode cho mỗi env để tránh average sai
+# Dùng representative nic_mode cho mỗi env để tránh average sai
 if not qos_df.empty:
-    # Chọn nic_mode chính cho mỗi env
-    representative = qos_df[
-        ((qos_df["env"] == "DOCKER") & (qos_df["nic_mode"] == "BRIDGED")) |
-        ((qos_df["env"] == "VM") & (qos_df["nic_mode"] == "CROSS-HOSTS")) |
-        ((qos_df["env"] == "KUBERNETES") & (qos_df["nic_mode"] == "K8S_1 POD")) |
-        (qos_df["env"] == "NATIVE")
-    ].copy()
-    
     if not representative.empty:
-        fig, ax = plt.subplots(figsize=(11,6))
-        sns.barplot(data=representative, x="qos", y="qos_effect_pct", hue="env", ax=ax)
+        fig, axes = figures.get((11, 6))
+        ax = axes[0, 0]
+        bar_chart(ax, representative, "qos", "qos_effect_pct", "env")
         ax.set_title("Ảnh hưởng QoS – Throughput (% so với NOQOS)", fontsize=14)
         ax.set_ylabel("% so với NOQOS cùng môi trường")
         ax.set_xlabel("QoS Level")
@@ -81,8 +82,9 @@ if not qos_df.empty:
     for env_name in ["DOCKER", "VM", "KUBERNETES"]:
         env_data = qos_df[qos_df["env"] == env_name]
         if not env_data.empty and len(env_data["nic_mode"].unique()) > 1:
-            fig, ax = plt.subplots(figsize=(10,6))
-            sns.barplot(data=env_data, x="qos", y="qos_effect_pct", hue="nic_mode", ax=ax)
+            fig, axes = figures.get((10, 6))
+            ax = axes[0, 0]
+            bar_chart(ax, env_data, "qos", "qos_effect_pct", "nic_mode")
             ax.set_title(f"QoS Effect – {env_name} (chi tiết theo NIC/Pod)")
             ax.set_ylabel("% so với NOQOS")
             ax.axhline(y=100, color='red', linestyle='--', linewidth=1, alpha=0.5)
@@ -91,31 +93,35 @@ if not qos_df.empty:
 
 # QoS – Latency & Jitter (dùng representative data)
 if not qos_df.empty and not representative.empty:
-    fig, axes = plt.subplots(1, 2, figsize=(12,5))
-    sns.barplot(data=representative, x="qos", y="latency_ms_mean", hue="env", ax=axes[0])
+    fig, axes = figures.get((12, 5), 1, 2)
+    axes = axes[0]
+    bar_chart(axes[0], representative, "qos", "latency_ms_mean", "env")
     axes[0].set_title("Độ trễ (ms)")
-    sns.barplot(data=representative, x="qos", y="jitter_ms_mean", hue="env", ax=axes[1])
+    bar_chart(axes[1], representative, "qos", "jitter_ms_mean", "env")
     axes[1].set_title("Độ dao động Jitter (ms)")
     fig.suptitle("Ảnh hưởng QoS – Latency & Jitter")
     save_plot(fig, "4_qos_latency_jitter.png")
 
 # K8S – Scaling theo số Pod
 if not k8s_df.empty:
-    fig, axes = plt.subplots(1, 2, figsize=(12,5))
-    sns.barplot(data=k8s_df, x="pod_config", y="throughput_mbps_mean", ax=axes[0])
+    fig, axes = figures.get((12, 5), 1, 2)
+    axes = axes[0]
+    bar_chart(axes[0], k8s_df, "pod_config", "throughput_mbps_mean")
     axes[0].set_title("Throughput theo số Pod")
-    sns.barplot(data=k8s_df, x="pod_config", y="cpu_mean_mean", ax=axes[1])
+    bar_chart(axes[1], k8s_df, "pod_config", "cpu_mean_mean")
     axes[1].set_title("CPU trung bình theo số Pod")
     fig.suptitle("K8S Scaling – Hiệu năng theo số Pod")
     save_plot(fig, "5_k8s_scaling.png")
 
 # Tổng hợp – ENV vs CPU efficiency
 if not env_df.empty:
-    fig, ax = plt.subplots(figsize=(6,5))
+    fig, axes = figures.get((6, 5))
+    ax = axes[0, 0]
     env_df_copy = env_df.copy()
     env_df_copy["cpu_efficiency"] = env_df_copy["cpu_mean_mean"] / env_df_copy["throughput_mbps_mean"]
-    sns.barplot(data=env_df_copy, x="env", y="cpu_efficiency", ax=ax)
+    bar_chart(ax, env_df_copy, "env", "cpu_efficiency")
     ax.set_title("Hiệu suất CPU (% CPU per Mbps)")
     save_plot(fig, "6_cpu_efficiency.png")
 
+figures.close()
 print(f"Đã sinh 6 biểu đồ tổng hợp tại: {OUT_DIR.resolve()}")
@@ -5,6 +5,12 @@ import seaborn as sns
 from pathlib import Path
 import numpy as np
 import warnings
+from data_quality import GROUP_KEYS, normalize_labels, apply_outlier_policy, is_default_config, is_representative
+from validation_rules import invalid_reasons
+from sweep_params import PARAM_COLUMNS
+from group_stats import GroupAccumulator
+from bar_render import FigurePool, bar_chart
+from scatter_render import stratified_sample, corr_by_group, corr_matrix, scatter_or_density, pair_density
 
 # ---------------- CONFIG ----------------
 INPUT_FILE = "summary_client_only.csv"
@@ -13,56 +19,30 @@ OUT_DIR.mkdir(exist_ok=True)
 sns.set(style="whitegrid", font_scale=1.05)
 plt.rcParams["figure.dpi"] = 120
 ERRORBAR_MODE = "se"
+OUTLIER_POLICY = "drop"                 # flag | drop | winsorize (xem data_quality.py)
+OUTLIER_METRICS = ["throughput_mbps"]
+SCATTER_MAX_POINTS = 3000               # nhiều điểm hơn → hexbin / pairplot mật độ (scatter_render.py)
+SAMPLE_PER_ENV = None                   # vd 500: lấy mẫu phân tầng theo env trước khi vẽ scatter/pairplot
 
 # ---------------- LOAD DATA ----------------
 df = pd.read_csv(INPUT_FILE)
 num_cols = ["throughput_mbps", "latency_ms", "packet_loss_pct", "jitter_ms", "cpu_mean", "ram_mean"]
 df[num_cols] = df[num_cols].replace([np.inf, -np.inf], np.nan)
 
-# Chuẩn hoá cột dạng chuỗi
-df["env"] = df["env"].astype(str).str.upper().str.strip()
-df["qos"] = df["qos"].fillna("NOQOS").astype(str).str.upper().str.strip()
-df["nic_mode"] = df["nic_mode"].fillna("UNKNOWN").astype(str).str.upper().str.strip()
-df["direction"] = df["direction"].fillna("NONE").astype(str).str.lower().str.strip()
-if "pod_config" not in df.columns:
-    df["pod_config"] = "NONE"
-
-# Bổ sung: gán nic_mode cho K8S = "K8S_<số pod>"
-mask_k8s = df["env"].str.contains("K8S|KUBERNETES", na=False)
-df.loc[mask_k8s, "nic_mode"] = df.loc[mask_k8s, "pod_config"].apply(
-    lambda x: f"K8S_{x.upper()}" if isinstance(x, str) and x != "NONE" else "K8S_UNKNOWN"
-)
+df = normalize_labels(df)
 
 
 # ---------------- LỌC BẢN GHI KHÔNG HỢP LỆ ----------------
 # Loại bỏ các bản ghi có throughput hoặc cpu_mean rỗng hoặc bằng 0
-invalid_mask = (
-    df["throughput_mbps"].isna() | (df["throughput_mbps"] <= 0) |
-    df["cpu_mean"].isna() | (df["cpu_mean"] <= 0)
-)
-
-# Gắn lý do bị loại
-df["invalid_reason"] = np.select(
-    [
-        df["throughput_mbps"].isna(),
-        df["throughput_mbps"] <= 0,
-        df["cpu_mean"].isna(),
-        df["cpu_mean"] <= 0,
-    ],
-    [
-        "throughput_nan",
-        "throughput_zero_or_neg",
-        "cpu_nan",
-        "cpu_zero_or_neg",
-    ],
-    default=""
-)
+# (luật drop của validation_rules.py, đã đánh giá lúc tổng hợp; CSV cũ chưa có cột → tính lại)
+if "invalid_reason" in df.columns:
+    df["invalid_reason"] = df["invalid_reason"].fillna("").astype(str)
+else:
+    df["invalid_reason"] = invalid_reasons(df)
+invalid_mask = df["invalid_reason"] != ""
 
-# Xuất bản ghi không hợp lệ
 invalid_df = df[invalid_mask].copy()
-if not invalid_df.empty:
-    invalid_df.to_csv("invalid_records.csv", index=False)
-    print(f"Đã xuất {len(invalid_df)} bản ghi không hợp lệ → invalid_records.csv")
+invalid_df["outlier_action"] = "dropped"
 
 # Giữ lại bản ghi hợp lệ
 valid_mask = ~invalid_mask
@@ -74,6 +54,30 @@ print(f"Loại bỏ {before - after} bản ghi không hợp lệ ({before} → {
 # Bỏ chiều với NoQoS hoặc Native
 df.loc[(df["qos"] == "NOQOS") | (df["env"] == "NATIVE"), "direction"] = "none"
 
+# ---------------- OUTLIER (ROBUST) ----------------
+# Run "nửa hỏng" (vd 2 Mbps trong nhóm ~900 Mbps) vẫn qua được luật trên:
+# chấm điểm median/MAD + IQR trong từng nhóm (env, nic_mode, qos, direction, pod_config)
+# Run của --mode sweep / qos-sweep được chấm điểm trong nhóm cùng cấu hình (param_*, qos_value)
+PARAM_COLS = [c for c in PARAM_COLUMNS if c in df.columns]
+QOS_SWEEP_COLS = [c for c in ["qos_param","qos_value"] if c in df.columns]
+df, outlier_df = apply_outlier_policy(df, OUTLIER_METRICS, OUTLIER_POLICY,
+                                      keys=GROUP_KEYS + PARAM_COLS + QOS_SWEEP_COLS)
+print(f"Outlier ({OUTLIER_POLICY}): {len(outlier_df)} bản ghi")
+
+# ---------------- SWEEP: tách cấu hình khác mặc định ----------------
+# Phần còn lại của phân tích chỉ dùng cấu hình mặc định (-P 4) để so sánh công bằng;
+# toàn bộ run (mọi cấu hình) giữ trong sweep_df cho PHẦN F6.
+sweep_df = df
+df = df[is_default_config(df)].reset_index(drop=True)
+if len(df) < len(sweep_df):
+    print(f"Sweep: {len(sweep_df) - len(df)} run cấu hình khác mặc định chỉ dùng cho phân tích sweep")
+
+# Xuất bản ghi không hợp lệ + outlier (kèm mã lý do)
+invalid_df = pd.concat([invalid_df, outlier_df], ignore_index=True)
+if not invalid_df.empty:
+    invalid_df.to_csv("invalid_records.csv", index=False)
+    print(f"Đã xuất {len(invalid_df)} bản ghi không hợp lệ/outlier → invalid_records.csv")
+
 # ---------------- PHÂN LOẠI NETWORK TYPE ----------------
 # Fair comparison (cross-host, real network): NATIVE, VM CROSS-HOSTS, K8S
 # Internal (same-host, virtual): DOCKER all, VM BRIDGED/NAT/HOST-ONLY, K8S internal
@@ -109,12 +113,30 @@ df.loc[mask_k8s, "nic_mode"] = df.loc[mask_k8s, "pod_config"].apply(
 
 # ---------------- GROUP ----------------
 agg_cols = ["throughput_mbps","latency_ms","packet_loss_pct","jitter_ms","cpu_mean","ram_mean"]
-agg_df = (
-    df.groupby(["env","nic_mode","qos","direction","pod_config","is_fair","network_type"],dropna=False)[agg_cols]
-    .agg(["mean","std","count","sem"])
-)
-agg_df.columns = ["_".join(c) for c in agg_df.columns]
-agg_df = agg_df.reset_index()
+# Hiệu suất CPU chỉ trong cửa sổ truyền (timeline.py), nếu aggregator đã tính
+agg_cols += [c for c in ["cpu_active_mean","cpu_per_gbit","cpu_per_gbit_steady"] if c in df.columns]
+# Throughput sau khi bỏ pha slow-start và thời gian warm-up (steady_state.py)
+agg_cols += [c for c in ["steady_throughput_mbps","warmup_s"] if c in df.columns]
+# TCP internals từ stream record iperf3 (tcp_stats.py)
+agg_cols += [c for c in ["rtt_loaded_ms","cwnd_median_kb","retransmits_per_gb","stream_fairness"] if c in df.columns]
+# Bộ đếm NIC/kernel/qdisc trước–sau mỗi run (net_counters.py)
+agg_cols += [c for c in ["nic_tx_pps","nic_rx_pps","nic_tx_drops","qdisc_drops","qdisc_overlimits",
+                         "qdisc_backlog_max","tcp_retrans_segs"] if c in df.columns]
+# CPU-seconds/GB riêng của iperf3 và con số host-wide tương ứng (proc_accounting.py)
+agg_cols += [c for c in ["proc_cpu_s_per_gb","host_cpu_s_per_gb"] if c in df.columns]
+# Độ trễ request/response TCP/UDP (rr_probe.py); phân vị gộp đúng nằm ở summary_rr_grouped.csv
+agg_cols += [c for c in ["rr_p50_ms","rr_p99_ms","rr_tps"] if c in df.columns]
+# CPU / throughput nhận của server trong đúng cửa sổ session đã ghép (session_match.py)
+agg_cols += [c for c in ["server_cpu_mean","server_rx_mbps"] if c in df.columns]
+# CPU/RAM trong phạm vi cgroup v2 của container (env_backend.py), cạnh số liệu host
+agg_cols += [c for c in ["cg_cpu_mean","cg_mem_mean","cg_cpu_pressure_mean"] if c in df.columns]
+# Accumulator gộp được (group_stats.py): cùng mean/std/count/sem như groupby.agg, lưu kèm
+# M2/min/max + quantile sketch vào group_stats.json để gộp với đợt đo / máy đo khác
+AGG_KEYS = ["env","nic_mode","qos","direction","pod_config","is_fair","network_type"]
+group_acc = GroupAccumulator(AGG_KEYS, agg_cols)
+group_acc.update(df)
+group_acc.save("group_stats.json")
+agg_df = group_acc.to_frame()
 
 for col in ["throughput_mbps","latency_ms","jitter_ms","cpu_mean"]:
     agg_df[f"{col}_cv"] = (agg_df[f"{col}_std"]/agg_df[f"{col}_mean"]*100).replace([np.inf,-np.inf],np.nan)
@@ -200,14 +222,18 @@ def calc_qos_effect(row):
 agg_df["qos_effect_pct"] = agg_df.apply(calc_qos_effect, axis=1)
 
 # ---------------- TIỆN ÍCH ----------------
+# Cột vẽ thẳng từ agg_df bằng matplotlib (bar_render.py), figure 9×5 dùng lại giữa các biểu đồ
+figures = FigurePool()
+
 def plot_bar(data,x,y,hue,title,fname,ylabel,log=False):
     if data.empty: return
-    plt.figure(figsize=(9,5))
-    sns.barplot(data=data,x=x,y=y,hue=hue,errorbar=ERRORBAR_MODE)
-    if log: plt.yscale("log")
-    plt.title(title); plt.ylabel(ylabel)
-    if hue: plt.legend(title=hue,frameon=True)
-    plt.tight_layout(); plt.savefig(OUT_DIR/fname); plt.close()
+    fig, axes = figures.get((9,5))
+    ax = axes[0,0]
+    bar_chart(ax,data,x,y,hue,err=ERRORBAR_MODE)
+    if log: ax.set_yscale("log")
+    ax.set_title(title); ax.set_ylabel(ylabel)
+    if hue: ax.legend(title=hue,frameon=True)
+    fig.tight_layout(); fig.savefig(OUT_DIR/fname)
 
 def plot_box(data,x,y,hue,title,fname,ylabel):
     if data.empty: return
@@ -266,12 +292,128 @@ for nic in sorted(agg_df["nic_mode"].unique()):
 
 # ---------------- PHẦN F: CPU efficiency ----------------
 plot_bar(agg_df,"env","cpu_per_mbps","qos","CPU Efficiency (CPU%/Mbps)","cpu_efficiency.png","%/Mbps")
-
-# Scatter CPU vs Throughput
-plt.figure(figsize=(7,5))
-sns.scatterplot(data=df,x="throughput_mbps",y="cpu_mean",hue="env",style="nic_mode")
-plt.title("CPU vs Throughput (client)"); plt.tight_layout()
-plt.savefig(OUT_DIR/"cpu_vs_throughput_scatter.png"); plt.close()
+if "cpu_per_gbit_steady_mean" in agg_df.columns:
+    plot_bar(agg_df,"env","cpu_per_gbit_steady_mean","qos","CPU Efficiency – cửa sổ truyền (CPU%/Gbps, trung vị theo giây)",
+             "cpu_efficiency_active.png","%/Gbps",log=True)
+
+# Scatter CPU vs Throughput (corpus lớn → hexbin mật độ)
+scatter_df = stratified_sample(df, "env", SAMPLE_PER_ENV)
+fig, ax = plt.subplots(figsize=(7,5))
+scatter_or_density(ax,scatter_df,"throughput_mbps","cpu_mean",hue="env",style="nic_mode",max_points=SCATTER_MAX_POINTS)
+ax.set_title("CPU vs Throughput (client)"); fig.tight_layout()
+fig.savefig(OUT_DIR/"cpu_vs_throughput_scatter.png"); plt.close(fig)
+
+# CPU vs Mbps theo từng giây trong cửa sổ truyền (timeline_client_pairs.csv của aggregator)
+if Path("timeline_client_pairs.csv").exists():
+    pairs_df = pd.read_csv("timeline_client_pairs.csv").merge(df[["path","env"]], on="path")
+    pairs_df = stratified_sample(pairs_df[pairs_df["mbps"] > 0], "env", SAMPLE_PER_ENV)
+    if not pairs_df.empty:
+        fig, ax = plt.subplots(figsize=(7,5))
+        scatter_or_density(ax,pairs_df,"mbps","cpu_percent",hue="env",max_points=SCATTER_MAX_POINTS,
+                           s=8,alpha=0.4,linewidth=0)
+        ax.set_title(f"CPU vs Throughput theo giây ({len(pairs_df)} mẫu)"); fig.tight_layout()
+        fig.savefig(OUT_DIR/"cpu_vs_throughput_per_second.png"); plt.close(fig)
+
+if "proc_cpu_s_per_gb_mean" in agg_df.columns:
+    cpu_src = agg_df.melt(id_vars=["env"], value_vars=["proc_cpu_s_per_gb_mean","host_cpu_s_per_gb_mean"],
+                          var_name="nguồn", value_name="cpu_s_per_gb")
+    cpu_src["nguồn"] = cpu_src["nguồn"].map({"proc_cpu_s_per_gb_mean":"iperf3","host_cpu_s_per_gb_mean":"host"})
+    plot_bar(cpu_src,"env","cpu_s_per_gb","nguồn","CPU-seconds / GB: tiến trình iperf3 vs host-wide",
+             "cpu_seconds_per_gb.png","CPU·s/GB",log=True)
+
+if "cg_cpu_mean_mean" in agg_df.columns:
+    cpu_scope = agg_df.melt(id_vars=["env"], value_vars=["cpu_mean_mean","cg_cpu_mean_mean"],
+                            var_name="phạm vi", value_name="cpu_percent").dropna()
+    cpu_scope["phạm vi"] = cpu_scope["phạm vi"].map({"cpu_mean_mean":"host","cg_cpu_mean_mean":"cgroup"})
+    plot_bar(cpu_scope,"env","cpu_percent","phạm vi","CPU trung bình: host vs cgroup của container",
+             "cpu_host_vs_cgroup.png","CPU (%)")
+
+# ---------------- PHẦN F2: Steady state / warm-up ----------------
+if "warmup_s_mean" in agg_df.columns:
+    plot_bar(agg_df,"qos","warmup_s_mean","env","Thời gian warm-up (slow-start) theo QoS","warmup_by_qos.png","giây")
+    plot_bar(agg_df,"env","steady_throughput_mbps_mean","qos","Steady-state Throughput","env_steady_throughput.png","Mbps",log=True)
+
+# ---------------- PHẦN F3: TCP internals ----------------
+if "rtt_loaded_ms_mean" in agg_df.columns:
+    plot_bar(agg_df,"qos","rtt_loaded_ms_mean","env","RTT khi có tải (iperf3 TCP info)","tcp_rtt_loaded.png","ms")
+    plot_bar(agg_df,"qos","retransmits_per_gb_mean","env","Retransmits / GB","tcp_retransmits_per_gb.png","retrans/GB")
+    plot_bar(agg_df,"env","stream_fairness_mean","qos","Công bằng giữa các stream (Jain)","tcp_stream_fairness.png","Jain index")
+
+# ---------------- PHẦN F4: NIC / qdisc ----------------
+# Tách mất throughput dưới QoS1 (tbf): do shaping (qdisc drops/overlimits) hay do host (NIC drops)
+if "qdisc_drops_mean" in agg_df.columns:
+    plot_bar(agg_df,"qos","qdisc_drops_mean","env","qdisc drops mỗi run","qdisc_drops.png","gói")
+    plot_bar(agg_df,"qos","qdisc_overlimits_mean","env","qdisc overlimits mỗi run","qdisc_overlimits.png","lần")
+if "nic_tx_drops_mean" in agg_df.columns:
+    plot_bar(agg_df,"qos","nic_tx_drops_mean","env","NIC tx drops mỗi run","nic_tx_drops.png","gói")
+
+# ---------------- PHẦN F5: Capacity UDP (--mode capacity) ----------------
+# Bản ghi loại "capacity" nằm riêng ở summary_capacity.csv / capacity_probes.csv
+if Path("summary_capacity.csv").exists():
+    cap_df = normalize_labels(pd.read_csv("summary_capacity.csv"))
+    plot_bar(cap_df,"env","capacity_mbps","qos","Capacity UDP (loss dưới ngưỡng)","capacity_by_env.png","Mbps",log=True)
+    plot_bar(cap_df,"nic_mode","capacity_mbps","env","Capacity UDP theo NIC mode","capacity_by_nic.png","Mbps",log=True)
+    if Path("capacity_probes.csv").exists():
+        probes_df = normalize_labels(pd.read_csv("capacity_probes.csv"))
+        plt.figure(figsize=(9,5))
+        sns.scatterplot(data=probes_df,x="rate_mbps",y="loss_pct",hue="env",style="passed")
+        plt.xscale("log"); plt.yscale("symlog",linthresh=0.1)
+        plt.title("Capacity search: loss theo tốc độ gửi (từng lần thử)"); plt.xlabel("Mbps gửi"); plt.ylabel("loss (%)")
+        plt.tight_layout(); plt.savefig(OUT_DIR/"capacity_probe_ladder.png"); plt.close()
+
+# ---------------- PHẦN F6: Sweep tham số iperf3 (--mode sweep) ----------------
+# Cấu hình throughput cao nhất của từng ô (env, nic_mode, qos, direction, pod_config)
+# và cấu hình mặc định -P 4 đạt bao nhiêu % so với nó
+if PARAM_COLS:
+    param_runs = sweep_df[sweep_df["qos_param"].isna()] if QOS_SWEEP_COLS else sweep_df
+    cfg = (param_runs.groupby(GROUP_KEYS + PARAM_COLS, dropna=False)["throughput_mbps"]
+           .agg(["mean","std","count"]).reset_index())
+    cfg["n_configs"] = cfg.groupby(GROUP_KEYS, dropna=False)["mean"].transform("size")
+    cfg = cfg[cfg["n_configs"] > 1]
+    if not cfg.empty:
+        best = cfg.loc[cfg.groupby(GROUP_KEYS, dropna=False)["mean"].idxmax()]
+        best = best.rename(columns={"mean":"best_mbps","std":"best_std","count":"best_count"})
+        default = cfg[is_default_config(cfg)][GROUP_KEYS + ["mean"]].rename(columns={"mean":"default_mbps"})
+        best = best.merge(default, on=GROUP_KEYS, how="left")
+        best["default_vs_best_pct"] = best["default_mbps"] / best["best_mbps"] * 100
+        best.to_csv("summary_sweep_best.csv", index=False)
+        cfg.to_csv("summary_sweep_configs.csv", index=False)
+        print(f"Sweep: cấu hình tốt nhất của {len(best)} ô → summary_sweep_best.csv")
+
+        plot_bar(best,"env","default_vs_best_pct","nic_mode","-P 4 mặc định so với cấu hình tốt nhất",
+                 "sweep_default_vs_best.png","% throughput tốt nhất")
+        sweep_runs = param_runs.merge(cfg[GROUP_KEYS].drop_duplicates(), on=GROUP_KEYS)
+        plot_bar(sweep_runs,"param_streams","throughput_mbps","env","Throughput theo số stream (-P)",
+                 "sweep_streams.png","Mbps",log=True)
+        plot_bar(sweep_runs,"param_window","throughput_mbps","env","Throughput theo socket buffer (-w)",
+                 "sweep_window.png","Mbps",log=True)
+
+# ---------------- PHẦN F7: RR probe (độ trễ ứng dụng) ----------------
+# Phân vị từ histogram gộp của cả nhóm (không lấy trung bình p99 của từng run)
+if Path("summary_rr_grouped.csv").exists():
+    rr_df = normalize_labels(pd.read_csv("summary_rr_grouped.csv"))
+    rr_long = rr_df.melt(id_vars=["env","qos","rr_proto"], value_vars=["rr_p50_ms","rr_p99_ms","rr_p999_ms"],
+                         var_name="phân vị", value_name="ms")
+    rr_long["phân vị"] = rr_long["phân vị"].map({"rr_p50_ms":"p50","rr_p99_ms":"p99","rr_p999_ms":"p99.9"})
+    for proto, g in rr_long.groupby("rr_proto"):
+        plot_bar(g,"env","ms","phân vị",f"Độ trễ request/response {proto.upper()} (histogram gộp)",
+                 f"rr_latency_{proto}.png","ms",log=True)
+
+# ---------------- PHẦN F8: Đường cong throughput theo tham số QoS (--mode qos-sweep) ----------------
+if "qos_param" in sweep_df.columns and sweep_df["qos_param"].notna().any():
+    curve_runs = sweep_df[sweep_df["qos_param"].notna()]
+    curve = (curve_runs.groupby(["env","nic_mode","qos","qos_param","qos_value_num"])["throughput_mbps"]
+             .agg(["mean","std","count"]).reset_index())
+    curve.to_csv("summary_qos_curve.csv", index=False)
+    print(f"Sweep QoS: {len(curve)} điểm đường cong → summary_qos_curve.csv")
+    for param, g in curve_runs.groupby("qos_param"):
+        plt.figure(figsize=(8,5))
+        sns.lineplot(data=g,x="qos_value_num",y="throughput_mbps",hue="env",style="nic_mode",
+                     markers=True,errorbar=ERRORBAR_MODE)
+        values = g["qos_value_num"][g["qos_value_num"] > 0]
+        if len(values) and values.max() / values.min() > 50: plt.xscale("log")
+        plt.title(f"Throughput theo {param} (sweep QoS thích nghi)"); plt.xlabel(param); plt.ylabel("Mbps")
+        plt.tight_layout(); plt.savefig(OUT_DIR/f"qos_curve_{param}.png"); plt.close()
 
 # ---------------- PHẦN G: Direction ----------------
 if set(df["direction"].unique()) & {"cs","sc"}:
@@ -300,50 +442,61 @@ if not kube_df.empty:
     plot_bar(kube_df,"pod_config","cpu_mean_mean","qos","K8S Pod – CPU","k8s_pod_cpu.png","%")
 
 # ---------------- PHẦN L: CORRELATION ----------------
+# Ma trận tương quan của toàn bộ và của mọi env tính trong một lượt (scatter_render.corr_by_group)
 corr_cols = ["throughput_mbps","cpu_mean","ram_mean","latency_ms","jitter_ms"]
-corr_overall = df[corr_cols].corr()
+corr_long = pd.concat([corr_by_group(df,corr_cols).assign(env="ALL"), corr_by_group(df,corr_cols,"env")],
+                      ignore_index=True)[["env","x","y","r","n"]]
+corr_long.to_csv("summary_correlation.csv", index=False)
+corr_overall = corr_matrix(corr_long[corr_long["env"]=="ALL"], corr_cols)
 plt.figure(figsize=(6,5))
 sns.heatmap(corr_overall,annot=True,cmap="coolwarm",fmt=".2f")
 plt.title("Correlation – Overall"); plt.tight_layout()
 plt.savefig(OUT_DIR/"correlation_heatmap_overall.png"); plt.close()
 
+env_sizes = df["env"].value_counts()
 for env_name in sorted(df["env"].unique()):
-    sub = df[df["env"]==env_name]
-    if len(sub)<3: continue
-    corr_env = sub[corr_cols].corr()
+    if env_sizes[env_name]<3: continue
+    corr_env = corr_matrix(corr_long[corr_long["env"]==env_name], corr_cols)
     plt.figure(figsize=(6,5))
     sns.heatmap(corr_env,annot=True,cmap="coolwarm",fmt=".2f")
     plt.title(f"Correlation – {env_name}")
     plt.tight_layout(); plt.savefig(OUT_DIR/f"correlation_heatmap_{env_name}.png"); plt.close()
 
-# Pairplot
+# Pairplot (corpus lớn → hexbin dưới đường chéo, histogram theo env trên đường chéo)
 try:
-    pp = sns.pairplot(df.dropna(subset=corr_cols),vars=corr_cols,hue="env",corner=True,
-                      plot_kws=dict(alpha=0.6,s=25,linewidth=0))
-    pp.fig.suptitle("Pairplot Metrics",y=1.02)
-    pp.savefig(OUT_DIR/"pairplot_metrics.png"); plt.close('all')
+    pair_df = stratified_sample(df.dropna(subset=corr_cols), "env", SAMPLE_PER_ENV)
+    if len(pair_df) <= SCATTER_MAX_POINTS:
+        pp = sns.pairplot(pair_df,vars=corr_cols,hue="env",corner=True,
+                          plot_kws=dict(alpha=0.6,s=25,linewidth=0))
+        pp.fig.suptitle("Pairplot Metrics",y=1.02)
+        pp.savefig(OUT_DIR/"pairplot_metrics.png"); plt.close('all')
+    else:
+        fig = pair_density(pair_df,corr_cols,hue="env")
+        fig.suptitle(f"Pairplot Metrics – mật độ ({len(pair_df)} run)",y=1.02)
+        fig.savefig(OUT_DIR/"pairplot_metrics.png",bbox_inches="tight"); plt.close(fig)
 except Exception as e:
     warnings.warn(f"Pairplot fail: {e}")
 
+figures.close()
+
 # ---------------- XUẤT CSV ----------------
 agg_df.to_csv("summary_full_grouped.csv",index=False)
+# Run hợp lệ đã lọc (cấu hình mặc định) – dữ liệu thô cho compare_campaigns.py (Mann-Whitney)
+df.to_csv("summary_client_clean.csv",index=False)
 print(f"Đã sinh biểu đồ đầy đủ tại: {OUT_DIR.resolve()}")
 
 # ---------------- BẢNG GỘP SO SÁNH TỔNG HỢP ----------------
 summary_tables = []
 
 # ===== 1. So sánh ENV (NOQOS, EXTERNAL only - fair comparison) =====
-env_summary = (
-    agg_df[(agg_df["qos"]=="NOQOS") & (agg_df["network_type"]=="external")]
-    .groupby("env", as_index=False)
-    .apply(lambda g: pd.Series({
-        "throughput_mbps_mean": np.average(g["throughput_mbps_mean"], weights=g["throughput_mbps_count"]),
-        "latency_ms_mean": np.average(g["latency_ms_mean"], weights=g["latency_ms_count"]),
-        "cpu_mean_mean": np.average(g["cpu_mean_mean"], weights=g["cpu_mean_count"]),
-        "jitter_ms_mean": np.average(g["jitter_ms_mean"], weights=g["jitter_ms_count"])
-    }))
-    .reset_index(drop=True)
-)
+# Trung bình có trọng số count của các ô = mean của các ô gộp lại trong accumulator
+ROLLUP_METRICS = ["throughput_mbps","latency_ms","cpu_mean","jitter_ms"]
+def rollup_means(cells, by):
+    keys = cells[AGG_KEYS].itertuples(index=False, name=None)
+    out = group_acc.rollup(by, keys).to_frame()
+    return out[by + [f"{m}_mean" for m in ROLLUP_METRICS]]
+
+env_summary = rollup_means(agg_df[(agg_df["qos"]=="NOQOS") & (agg_df["network_type"]=="external")], ["env"])
 env_summary["category"] = "ENV_FAIR"
 summary_tables.append(env_summary)
 
@@ -352,27 +505,20 @@ summary_tables.append(env_summary)
 # Giữ chi tiết (env, nic_mode, qos) để so sánh chính xác
 qos_summary = agg_df[["env", "nic_mode", "qos", "qos_effect_pct", "latency_ms_mean", "jitter_ms_mean", "cpu_mean_mean"]].copy()
 qos_summary["category"] = "QOS_EFFECT"
+# Đánh dấu một lần nic_mode đại diện của mỗi env (dùng chung cho analyze_summary_comparison/overview)
+qos_summary["representative"] = is_representative(qos_summary)
 
 # Chỉ lấy các cột cần thiết cho summary
 qos_summary = qos_summary[[
     "env", "nic_mode", "qos", "qos_effect_pct", 
-    "latency_ms_mean", "jitter_ms_mean", "cpu_mean_mean", "category"
+    "latency_ms_mean", "jitter_ms_mean", "cpu_mean_mean", "category", "representative"
 ]]
 summary_tables.append(qos_summary)
 
 # ===== 3. So sánh K8S theo Pod (nếu có) =====
 k8s_data = agg_df[agg_df["env"].str.contains("K8S|KUBERNETES",na=False)]
 if not k8s_data.empty:
-    k8s_summary = (
-        k8s_data.groupby("pod_config", as_index=False)
-        .apply(lambda g: pd.Series({
-            "throughput_mbps_mean": np.average(g["throughput_mbps_mean"], weights=g["throughput_mbps_count"]),
-            "latency_ms_mean": np.average(g["latency_ms_mean"], weights=g["latency_ms_count"]),
-            "cpu_mean_mean": np.average(g["cpu_mean_mean"], weights=g["cpu_mean_count"]),
-            "jitter_ms_mean": np.average(g["jitter_ms_mean"], weights=g["jitter_ms_count"])
-        }))
-        .reset_index(drop=True)
-    )
+    k8s_summary = rollup_means(k8s_data, ["pod_config"])
     k8s_summary["category"] = "K8S_POD_SCALING"
     summary_tables.append(k8s_summary)
 
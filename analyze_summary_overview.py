@@ -5,6 +5,8 @@ import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
 from pathlib import Path
+from bar_render import bar_chart
+from data_quality import representative_rows
 
 # ---------------- CONFIG ----------------
 INPUT_FILE = "summary_comparison.csv"
@@ -23,16 +25,8 @@ env_df = df[df["category"] == "ENV_FAIR"]
 qos_df = df[df["category"] == "QOS_EFFECT"]
 k8s_df = df[df["category"] == "K8S_POD_SCALING"]
 
-# Lọc representative nic_mode cho QoS comparison
-if not qos_df.empty:
-    qos_representative = qos_df[
-        ((qos_df["env"] == "DOCKER") & (qos_df["nic_mode"] == "BRIDGED")) |
-        ((qos_df["env"] == "VM") & (qos_df["nic_mode"] == "CROSS-HOSTS")) |
-        ((qos_df["env"] == "KUBERNETES") & (qos_df["nic_mode"] == "K8S_1 POD")) |
-        (qos_df["env"] == "NATIVE")
-    ].copy()
-else:
-    qos_representative = qos_df
+# Representative nic_mode cho QoS comparison (đánh dấu sẵn trong summary_comparison.csv)
+qos_representative = representative_rows(qos_df)
 
 # ---------------- VẼ 6 BIỂU ĐỒ TRÊN 1 BẢNG ----------------
 fig, axes = plt.subplots(3, 2, figsize=(13, 12))
@@ -40,14 +34,14 @@ fig.subplots_adjust(hspace=0.4, wspace=0.25)
 
 # ENV Fair – Throughput, CPU
 if not env_df.empty:
-    sns.barplot(data=env_df, x="env", y="throughput_mbps_mean", ax=axes[0,0])
+    bar_chart(axes[0,0], env_df, "env", "throughput_mbps_mean")
     axes[0,0].set_title("ENV – Throughput (Mbps)")
-    sns.barplot(data=env_df, x="env", y="cpu_mean_mean", ax=axes[0,1])
+    bar_chart(axes[0,1], env_df, "env", "cpu_mean_mean")
     axes[0,1].set_title("ENV – CPU trung bình (%)")
 
 # QoS Effect – Throughput (% so với NOQOS cùng env) - dùng representative
 if not qos_representative.empty:
-    sns.barplot(data=qos_representative, x="qos", y="qos_effect_pct", hue="env", ax=axes[1,0])
+    bar_chart(axes[1,0], qos_representative, "qos", "qos_effect_pct", "env")
     axes[1,0].set_title("QoS Effect – Throughput (% NOQOS)")
     axes[1,0].axhline(y=100, color='red', linestyle='--', linewidth=0.8, alpha=0.5)
     axes[1,0].legend(fontsize=7, loc='best')
@@ -55,15 +49,15 @@ if not qos_representative.empty:
 
 # QoS Effect – Latency (ms) - dùng representative
 if not qos_representative.empty:
-    sns.barplot(data=qos_representative, x="qos", y="latency_ms_mean", hue="env", ax=axes[1,1])
+    bar_chart(axes[1,1], qos_representative, "qos", "latency_ms_mean", "env")
     axes[1,1].set_title("QoS ảnh hưởng – Latency (ms)")
     axes[1,1].legend(fontsize=7, loc='best')
 
 # K8S Scaling – Pod throughput
 if not k8s_df.empty:
-    sns.barplot(data=k8s_df, x="pod_config", y="throughput_mbps_mean", ax=axes[2,0])
+    bar_chart(axes[2,0], k8s_df, "pod_config", "throughput_mbps_mean")
     axes[2,0].set_title("K8S – Throughput theo số Pod")
-    sns.barplot(data=k8s_df, x="pod_config", y="cpu_mean_mean", ax=axes[2,1])
+    bar_chart(axes[2,1], k8s_df, "pod_config", "cpu_mean_mean")
     axes[2,1].set_title("K8S – CPU trung bình theo số Pod")
 
 # ---------------- TỔNG QUAN & GHI CHÚ ----------------
@@ -0,0 +1,131 @@
+# bar_render.py
+# ------------------------------------------
+# Vẽ biểu đồ cột trực tiếp từ thống kê nhóm đã tính sẵn (agg_df, summary_comparison.csv)
+# bằng artist matplotlib, thay cho sns.barplot (groupby + ước lượng lại ở mỗi lần gọi).
+# - Hình giữ nguyên như sns.barplot (seaborn 0.13): thứ tự category theo lần xuất hiện
+#   (số thì sắp xếp), bề rộng 0.8 chia đều theo hue, palette hiện hành với saturation 0.75,
+#   thanh lỗi màu ".26", trục category không kẻ lưới dọc
+# - Nhiều dòng cùng (x, hue) → cột là trung bình các dòng; thanh lỗi:
+#     "se"   : sai số chuẩn giữa các dòng (như errorbar="se"), 1 dòng → không có thanh lỗi
+#     <cột>  : cột sai số đã tính (vd throughput_mbps_sem), gộp sqrt(Σ err²) / k
+#     None   : không vẽ
+# - FigurePool: dùng lại figure/axes cùng kích thước giữa các biểu đồ thay vì tạo mới
+# ------------------------------------------
+
+import numpy as np
+import pandas as pd
+import matplotlib as mpl
+import matplotlib.pyplot as plt
+import seaborn as sns
+
+BAR_WIDTH = 0.8
+SATURATION = 0.75
+ERR_COLOR = ".26"
+
+
+# ---------------- THỐNG KÊ -----------------
+def category_order(values):
+    """Thứ tự category như seaborn: theo lần xuất hiện, cột số thì sắp xếp; bỏ NaN"""
+    values = pd.Series(values)
+    order = values.dropna().unique()
+    if pd.api.types.is_numeric_dtype(values):
+        order = np.sort(order)
+    return list(order)
+
+
+def bar_stats(data, x, y, hue=None, err="se"):
+    """
+    Thống kê từng cột (x, hue): mean, err (nửa độ dài thanh lỗi, NaN = không vẽ), n.
+    Dòng thiếu x / hue / y bị bỏ qua như sns.barplot.
+    """
+    keys = [x] + ([hue] if hue else [])
+    cols = keys + [y] + ([err] if err not in (None, "se") else [])
+    d = data[cols].dropna(subset=keys + [y])
+    g = d.groupby(keys, sort=False)[y]
+    out = g.agg(mean="mean", n="size")
+    if err == "se":
+        out["err"] = g.sem()
+    elif err is not None:
+        e = d.assign(_sq=d[err] ** 2).groupby(keys, sort=False)["_sq"]
+        out["err"] = np.sqrt(e.sum(min_count=1)) / out["n"]
+    else:
+        out["err"] = np.nan
+    return out.reset_index()
+
+
+# ---------------- VẼ -----------------
+def hue_colors(n):
+    """Palette của sns.barplot cho n mức hue (palette hiện hành, nhiều mức hơn → husl)"""
+    palette = sns.color_palette(None, n) if n <= len(sns.color_palette()) else sns.color_palette("husl", n)
+    return [sns.desaturate(c, SATURATION) for c in palette]
+
+
+def first_color():
+    """Màu đầu của chu trình màu hiện hành (axes.prop_cycle) – màu sns.barplot dùng trên trục mới khi không có hue"""
+    return mpl.rcParams["axes.prop_cycle"].by_key()["color"][0]
+
+
+def draw_bars(ax, stats, x, y, hue=None, x_order=None, hue_order=None):
+    """Vẽ bảng bar_stats lên ax (cột + thanh lỗi + nhãn trục + legend khi có hue)"""
+    x_order = category_order(stats[x]) if x_order is None else x_order
+    pos = {v: i for i, v in enumerate(x_order)}
+    levels = [None] if not hue else (category_order(stats[hue]) if hue_order is None else hue_order)
+    colors = hue_colors(len(levels)) if hue else [sns.desaturate(first_color(), SATURATION)]
+    width = BAR_WIDTH / len(levels)
+    err_kws = dict(color=ERR_COLOR, linewidth=1.5 * mpl.rcParams["lines.linewidth"])
+
+    for i, (level, color) in enumerate(zip(levels, colors)):
+        s = stats if level is None else stats[stats[hue] == level]
+        s = s[s[x].isin(pos)]
+        center = s[x].map(pos).to_numpy(float) + (i + 0.5) * width - BAR_WIDTH / 2
+        ax.bar(center - width / 2, s["mean"].to_numpy(float), width, align="edge", color=color, facecolor=color)
+        if level is not None:  # mục legend riêng cho từng mức hue, kể cả mức không có cột nào
+            ax.add_artist(mpl.patches.Rectangle((0, 0), 0, 0, facecolor=color, label=str(level)))
+        lo, hi = s["mean"] - s["err"], s["mean"] + s["err"]
+        for c, a, b in zip(center, lo, hi):
+            if np.isfinite(a) and np.isfinite(b):
+                ax.plot([c, c], [a, b], **err_kws)
+
+    ax.set_xticks(range(len(x_order)), [str(v) for v in x_order])
+    ax.xaxis.grid(False)
+    ax.set_xlim(-0.5, len(x_order) - 0.5)
+    ax.set_xlabel(x)
+    ax.set_ylabel(y)
+    if hue:
+        ax.legend(title=hue)
+
+
+def bar_chart(ax, data, x, y, hue=None, err="se"):
+    """Tương đương sns.barplot(data, x, y, hue, errorbar=...) trên dữ liệu đã gộp theo nhóm"""
+    if data.empty:
+        return
+    draw_bars(ax, bar_stats(data, x, y, hue, err), x, y, hue, x_order=category_order(data[x]),
+              hue_order=category_order(data[hue]) if hue else None)
+
+
+# ---------------- DÙNG LẠI FIGURE -----------------
+class FigurePool:
+    """
+    Giữ figure theo (figsize, lưới subplot): biểu đồ sau cùng kích thước xoá trục và vẽ lại
+    trên figure cũ thay vì plt.figure() / plt.close() mỗi lần
+    """
+
+    def __init__(self):
+        self._figs = {}
+
+    def get(self, figsize, nrows=1, ncols=1):
+        key = (tuple(figsize), nrows, ncols)
+        if key not in self._figs:
+            self._figs[key] = plt.subplots(nrows, ncols, figsize=figsize, squeeze=False)
+        fig, axes = self._figs[key]
+        for text in list(fig.texts):  # suptitle / fig.text của biểu đồ trước (remove() trả lại chỗ cho tight_layout)
+            text.remove()
+        for ax in axes.flat:
+            ax.clear()
+            ax.set_visible(True)
+        return fig, axes
+
+    def close(self):
+        for fig, _ in self._figs.values():
+            plt.close(fig)
+        self._figs.clear()
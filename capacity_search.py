@@ -0,0 +1,87 @@
+# capacity_search.py
+# ------------------------------------------
+# Tìm năng lực (capacity) UDP kiểu RFC 2544: tốc độ cao nhất mà loss/jitter
+# vẫn dưới ngưỡng, bằng các lần thử ngắn iperf3 -u -b <rate>
+# - Pha 1 (luỹ thừa): nhân đôi tốc độ từ start_mbps đến khi lần thử đầu tiên trượt
+# - Pha 2 (nhị phân): chia đôi khoảng [đạt cao nhất, trượt thấp nhất]
+#   đến khi khoảng hẹp hơn resolution (tương đối) hoặc hết max_trials
+# Số lần thử bị chặn trên bởi max_trials → mỗi ô đo chỉ mất vài phút.
+# Chỉ dùng thư viện chuẩn (chạy trên máy đo).
+# ------------------------------------------
+
+import json, math
+
+
+def udp_result(doc):
+    """
+    Kết quả một lần thử UDP từ iperf3 -J: Mbps nhận được, loss %, jitter ms.
+    Loss/jitter do phía nhận đo (end.sum_received, iperf3 cũ: end.sum);
+    --bidir lấy chiều xấu hơn.
+    """
+    end = doc.get("end", {})
+    sums = [end.get(k) for k in ("sum_received", "sum_received_bidir_reverse") if end.get(k)]
+    if not sums and end.get("sum"):
+        sums = [end["sum"]]
+    if not sums:
+        return {"received_mbps": math.nan, "loss_pct": math.nan, "jitter_ms": math.nan}
+    loss = max(s.get("lost_percent", math.nan) for s in sums)
+    jitter = max(s.get("jitter_ms", math.nan) for s in sums)
+    mbps = sum(s.get("bits_per_second", 0) for s in sums) / 1e6
+    if "sum_received" not in end and not math.isnan(loss):
+        mbps *= 1 - loss / 100  # end.sum là tốc độ gửi
+    return {"received_mbps": mbps, "loss_pct": loss, "jitter_ms": jitter}
+
+
+def probe_passes(res, loss_max, jitter_max=None):
+    """Lần thử đạt khi có kết quả, loss <= loss_max và (nếu đặt) jitter <= jitter_max"""
+    if res.get("error") or not res["loss_pct"] <= loss_max:
+        return False
+    return not jitter_max or res["jitter_ms"] <= jitter_max
+
+
+def search_capacity(probe, start_mbps=10, max_mbps=10000, loss_max=0.1, jitter_max=None,
+                    max_trials=14, resolution=0.05):
+    """
+    probe(rate_mbps) → dict kết quả (udp_result, có thể kèm "error").
+    Trả về (capacity_mbps, danh sách lần thử); không lần thử nào đạt → capacity NaN.
+    """
+    probes, best, fail = [], None, None
+
+    def run(rate):
+        res = probe(rate)
+        res.update(trial=len(probes) + 1, rate_mbps=rate,
+                   passed=probe_passes(res, loss_max, jitter_max))
+        probes.append(res)
+        return res["passed"]
+
+    # Pha 1: nhân đôi
+    rate = start_mbps
+    while len(probes) < max_trials:
+        if not run(rate):
+            fail = rate
+            break
+        best = rate
+        if rate >= max_mbps:
+            break
+        rate = min(rate * 2, max_mbps)
+
+    # Pha 2: chia đôi giữa mức đạt cao nhất (0 nếu chưa có) và mức trượt thấp nhất
+    while fail is not None and len(probes) < max_trials:
+        lo = best or 0.0
+        if fail - lo <= resolution * fail:
+            break
+        rate = (lo + fail) / 2
+        if run(rate):
+            best = rate
+        else:
+            fail = rate
+
+    return (best if best is not None else math.nan), probes
+
+
+def write_capacity(path, capacity, probes, **target):
+    """capacity.json: năng lực tìm được, ngưỡng và từng lần thử"""
+    doc = {"capacity_mbps": capacity, **target, "trials": len(probes), "probes": probes}
+    with open(path, "w") as f:
+        json.dump(doc, f, indent=1)
+    return doc
@@ -0,0 +1,322 @@
+# collect_runs.py
+# ------------------------------------------
+# Thu kết quả đo từ nhiều máy đo (VM, container, pod) về cây runs/ mà aggregator đọc
+#   runs/<dest>/1. Client/run_NN/...   (client: chỉ run đã xong = có meta.txt)
+#   runs/<dest>/0. Server/...          (server: toàn bộ --base-dir, log dài được kéo lại khi thay đổi)
+# - Transport cắm được: local (thư mục, dùng để thử offline / share mạng), ssh (sha256sum + rsync/scp),
+#   kubectl (exec sha256sum + tar qua exec, như kubectl cp)
+# - Song song: pool --jobs luồng, mỗi máy tối đa --per-host kết nối đồng thời
+# - Tiếp tục được: manifest sha256 từng file của từng run lưu ở <out>/collect_state.json;
+#   chỉ file mới/đổi được kéo, file kéo về được kiểm tra lại checksum trước khi ghi nhận;
+#   run đã bị `run_source.py pack --remove` gói vào runs.pack.zip vẫn tính là đã có (không kéo lại)
+# Danh sách máy: JSON
+#   {"hosts": [{"name": "vm-client", "transport": "ssh", "address": "user@10.0.0.2",
+#               "path": "NT531/runs/test_batch", "role": "client", "dest": "1. VM/0. CROSS/1. QoS1 C-_S"},
+#              {"name": "pod-0", "transport": "kubectl", "pod": "iperf-0", "namespace": "default",
+#               "path": "/data/runs", "role": "server", "dest": "3. KUBERNETES/1. 5 POD/0. NoQoS"}]}
+#
+#   python collect_runs.py pull --hosts hosts.json --out runs --jobs 8 --per-host 2
+#   python collect_runs.py plan --hosts hosts.json --out runs     # chỉ liệt kê, không kéo
+# Chỉ dùng thư viện chuẩn (+ ssh/rsync/kubectl có sẵn trên máy tổng hợp).
+# ------------------------------------------
+
+import argparse, hashlib, json, shlex, shutil, subprocess, sys, threading, time, zipfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path, PurePosixPath
+
+CLIENT_DIR, SERVER_DIR = "1. Client", "0. Server"
+STATE_FILE = "collect_state.json"
+PACK_NAME, PACK_INDEX = "runs.pack.zip", "pack_index.json"  # như run_source.py (không kéo pandas vào đây)
+SHA_CMD = "cd {path} && find . -type f -exec sha256sum {{}} +"
+
+
+def sha256_file(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def parse_sha_lines(text):
+    """Kết quả `sha256sum` ("<hash>  ./a/b") → {"a/b": hash}"""
+    out = {}
+    for line in text.splitlines():
+        digest, _, name = line.partition("  ")
+        if name:
+            out[str(PurePosixPath(name.strip()))] = digest.strip()
+    return out
+
+
+# ---------------- TRANSPORT -----------------
+class LocalTransport:
+    """Thư mục cục bộ / share mạng đã mount"""
+    name = "local"
+
+    def __init__(self, host):
+        self.root = Path(host["path"]).expanduser()
+
+    def manifest(self):
+        if not self.root.is_dir():
+            raise OSError(f"không có thư mục {self.root}")
+        return {f.relative_to(self.root).as_posix(): sha256_file(f)
+                for f in sorted(self.root.rglob("*")) if f.is_file()}
+
+    def fetch(self, files, staging):
+        for rel in files:
+            (staging / rel).parent.mkdir(parents=True, exist_ok=True)
+            shutil.copy2(self.root / rel, staging / rel)
+
+
+class SshTransport:
+    """ssh + sha256sum trên máy đo; kéo bằng rsync (nếu có) hoặc scp từng file"""
+    name = "ssh"
+
+    def __init__(self, host):
+        self.address, self.root = host["address"], host["path"]
+        self.options = list(host.get("ssh_options", []))
+        self.ssh = ["ssh", "-o", "BatchMode=yes", *self.options]
+
+    def scp_options(self):
+        """ssh_options cho scp: cổng là -P thay vì -p (dạng "-p 2222" hoặc "-p2222"), các tuỳ chọn khác giữ nguyên"""
+        return ["-P" + opt[2:] if opt.startswith("-p") else opt for opt in self.options]
+
+    def manifest(self):
+        res = subprocess.run([*self.ssh, self.address, SHA_CMD.format(path=shlex.quote(self.root))],
+                             capture_output=True, text=True, timeout=300)
+        if res.returncode != 0:
+            raise OSError(f"ssh {self.address}: {res.stderr.strip()}")
+        return parse_sha_lines(res.stdout)
+
+    def fetch(self, files, staging):
+        staging.mkdir(parents=True, exist_ok=True)
+        if shutil.which("rsync"):
+            res = subprocess.run(["rsync", "-a", "--files-from=-", "-e", shlex.join(self.ssh),
+                                  f"{self.address}:{self.root}/", str(staging)],
+                                 input="\n".join(files), capture_output=True, text=True)
+            if res.returncode != 0:
+                raise OSError(f"rsync {self.address}: {res.stderr.strip()}")
+            return
+        for rel in files:
+            (staging / rel).parent.mkdir(parents=True, exist_ok=True)
+            res = subprocess.run(["scp", "-q", "-o", "BatchMode=yes", *self.scp_options(),
+                                  f"{self.address}:{self.root}/{rel}",
+                                  str(staging / rel)],
+                                 capture_output=True, text=True)
+            if res.returncode != 0:
+                raise OSError(f"scp {self.address}:{rel}: {res.stderr.strip()}")
+
+
+class KubectlTransport:
+    """kubectl exec: sha256sum trong pod, kéo file bằng tar qua exec (cách kubectl cp làm)"""
+    name = "kubectl"
+
+    def __init__(self, host):
+        self.root = host["path"]
+        self.exec = ["kubectl", "exec", "-n", host.get("namespace", "default"), host["pod"]]
+        if host.get("container"):
+            self.exec += ["-c", host["container"]]
+
+    def manifest(self):
+        res = subprocess.run([*self.exec, "--", "sh", "-c", SHA_CMD.format(path=shlex.quote(self.root))],
+                             capture_output=True, text=True, timeout=300)
+        if res.returncode != 0:
+            raise OSError(f"kubectl exec: {res.stderr.strip()}")
+        return parse_sha_lines(res.stdout)
+
+    def fetch(self, files, staging):
+        staging.mkdir(parents=True, exist_ok=True)
+        tar = subprocess.Popen([*self.exec, "--", "tar", "cf", "-", "-C", self.root, *files],
+                               stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        res = subprocess.run(["tar", "xf", "-", "-C", str(staging)], stdin=tar.stdout, capture_output=True)
+        tar.stdout.close()
+        if tar.wait() != 0 or res.returncode != 0:
+            raise OSError(f"kubectl tar: {tar.stderr.read().decode(errors='ignore').strip()}")
+
+
+TRANSPORTS = {t.name: t for t in (LocalTransport, SshTransport, KubectlTransport)}
+
+
+# ---------------- KẾ HOẠCH -----------------
+def plan_units(host, manifest):
+    """
+    Manifest của một máy → {đích cục bộ (tương đối out): {rel máy đo: (rel trong đích, sha256)}}.
+    Client: mỗi run_* có meta.txt là một đơn vị; server: cả thư mục là một đơn vị.
+    """
+    dest = PurePosixPath(host["dest"])
+    if host.get("role", "client") == "server":
+        return {str(dest / SERVER_DIR): {rel: (rel, sha) for rel, sha in manifest.items()}}
+    units = {}
+    for rel, sha in manifest.items():
+        parts = PurePosixPath(rel).parts
+        if len(parts) > 1 and parts[0].startswith("run_"):
+            units.setdefault(parts[0], {})[rel] = (str(PurePosixPath(*parts[1:])), sha)
+    finished = {run: files for run, files in units.items() if any(v[0] == "meta.txt" for v in files.values())}
+    return {str(dest / CLIENT_DIR / run): files for run, files in finished.items()}
+
+
+def pack_members(pack):
+    """
+    {member: ZipInfo} của các run có trong pack_index.json của một runs.pack.zip
+    (gói do `run_source.py pack` tạo; không có gói → {})
+    """
+    if not pack.is_file():
+        return {}
+    with zipfile.ZipFile(pack) as zf:
+        names = set(zf.namelist())
+        runs = json.loads(zf.read(PACK_INDEX)).get("runs", {}) if PACK_INDEX in names else {}
+        return {i.filename: i for i in zf.infolist() if i.filename.split("/", 1)[0] in runs}
+
+
+# ---------------- THU THẬP -----------------
+class Collector:
+    def __init__(self, hosts, out, jobs=8, per_host=2):
+        self.hosts, self.out = hosts, Path(out)
+        self.jobs = jobs
+        self.limits = {h["name"]: threading.BoundedSemaphore(per_host) for h in hosts}
+        self.state_path = self.out / STATE_FILE
+        self.state = json.loads(self.state_path.read_text()) if self.state_path.exists() else {}
+        self.lock = threading.Lock()
+        self.packs, self.packed_new = {}, False
+
+    def transport(self, host):
+        return TRANSPORTS[host.get("transport", "local")](host)
+
+    def _manifest(self, host):
+        with self.limits[host["name"]]:
+            return self.transport(host).manifest()
+
+    def _pull(self, host, unit, files):
+        """Kéo các file của một đơn vị về thư mục tạm, kiểm tra sha256 rồi chuyển vào chỗ"""
+        tmp = self.out / ".collect_tmp" / host["name"] / unit
+        rels = sorted(files)
+        with self.limits[host["name"]]:
+            self.transport(host).fetch(rels, tmp)
+        for rel in rels:
+            got = sha256_file(tmp / rel)
+            if got != files[rel][1]:
+                raise OSError(f"{host['name']}:{rel} sai checksum ({got[:12]} ≠ {files[rel][1][:12]})")
+        for rel in rels:
+            target = self.out / unit / files[rel][0]
+            target.parent.mkdir(parents=True, exist_ok=True)
+            (tmp / rel).replace(target)
+        with self.lock:
+            entry = self.state.setdefault(unit, {"host": host["name"], "files": {}})
+            entry["files"].update({v[0]: v[1] for v in files.values()})
+            entry["time"] = time.strftime("%Y-%m-%d %H:%M:%S")
+            self.save_state()
+        return len(rels)
+
+    def _in_pack(self, unit, rel, sha):
+        """
+        File đã được gói vào runs.pack.zip của thư mục CLIENT (thư mục rời đã xoá bởi pack --remove):
+        member phải có trong pack_index.json và cùng sha256 với máy đo. Đã kiểm tra một lần thì
+        CRC32 + kích thước của member được ghi vào state ("packed"), lần sau chỉ so với central directory.
+        """
+        unit = PurePosixPath(unit)
+        pack = self.out / unit.parent / PACK_NAME
+        if str(pack) not in self.packs:
+            self.packs[str(pack)] = pack_members(pack)
+        info = self.packs[str(pack)].get(f"{unit.name}/{rel}")
+        if info is None:
+            return False
+        seen = self.state[str(unit)].setdefault("packed", {})
+        if seen.get(rel) == [info.CRC, info.file_size]:
+            return True
+        with zipfile.ZipFile(pack) as zf:
+            if hashlib.sha256(zf.read(info)).hexdigest() != sha:
+                return False
+        seen[rel] = [info.CRC, info.file_size]
+        self.packed_new = True
+        return True
+
+    def pending_files(self, unit, files):
+        """File cần kéo: chưa có trong state, khác checksum, hoặc mất cả bản rời lẫn bản trong gói"""
+        known = self.state.get(unit, {}).get("files", {})
+        return {rel: v for rel, v in files.items()
+                if known.get(v[0]) != v[1]
+                or not ((self.out / unit / v[0]).exists() or self._in_pack(unit, v[0], v[1]))}
+
+    def save_state(self):
+        self.out.mkdir(parents=True, exist_ok=True)
+        tmp = self.state_path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(self.state, indent=1))
+        tmp.replace(self.state_path)
+
+    def plan(self):
+        """Manifest mọi máy (song song) → [(host, unit, file cần kéo)], lỗi theo máy"""
+        work, errors = [], {}
+        self.packs, self.packed_new = {}, False
+        with ThreadPoolExecutor(self.jobs) as pool:
+            futures = {pool.submit(self._manifest, h): h for h in self.hosts}
+            for fut in as_completed(futures):
+                host = futures[fut]
+                try:
+                    units = plan_units(host, fut.result())
+                except (OSError, subprocess.SubprocessError) as e:
+                    errors[host["name"]] = str(e)
+                    continue
+                for unit, files in sorted(units.items()):
+                    entry = self.state.get(unit, {})
+                    if entry and entry.get("host") != host["name"]:
+                        errors[f"{host['name']}:{unit}"] = f"đã được thu từ {entry['host']} (bỏ qua)"
+                        continue
+                    todo = self.pending_files(unit, files)
+                    if todo:
+                        work.append((host, unit, todo))
+        if self.packed_new:
+            self.save_state()  # ghi nhận member gói vừa kiểm tra
+        return work, errors
+
+    def pull(self):
+        work, errors = self.plan()
+        fetched, done = 0, 0
+        with ThreadPoolExecutor(self.jobs) as pool:
+            futures = {pool.submit(self._pull, h, u, f): (h, u) for h, u, f in work}
+            for fut in as_completed(futures):
+                host, unit = futures[fut]
+                try:
+                    fetched += fut.result()
+                    done += 1
+                except (OSError, subprocess.SubprocessError) as e:
+                    errors[f"{host['name']}:{unit}"] = str(e)
+        shutil.rmtree(self.out / ".collect_tmp", ignore_errors=True)
+        return done, fetched, errors
+
+
+def load_hosts(path):
+    with open(path, encoding="utf-8") as f:
+        hosts = json.load(f)["hosts"]
+    for h in hosts:
+        if h.get("transport", "local") not in TRANSPORTS:
+            raise ValueError(f"{h.get('name')}: transport phải thuộc {list(TRANSPORTS)}")
+        h.setdefault("name", h.get("address") or h.get("pod") or h["path"])
+    return hosts
+
+
+# ---------------- CLI -----------------
+def main():
+    parser = argparse.ArgumentParser(description="Thu kết quả đo từ nhiều máy về cây runs/")
+    parser.add_argument("cmd", choices=["pull", "plan"])
+    parser.add_argument("--hosts", required=True, help="File JSON danh sách máy đo")
+    parser.add_argument("--out", default="runs")
+    parser.add_argument("--jobs", type=int, default=8, help="Số kết nối đồng thời tối đa")
+    parser.add_argument("--per-host", type=int, default=2, help="Số kết nối đồng thời tối đa mỗi máy")
+    args = parser.parse_args()
+
+    collector = Collector(load_hosts(args.hosts), args.out, args.jobs, args.per_host)
+    if args.cmd == "plan":
+        work, errors = collector.plan()
+        for host, unit, files in work:
+            print(f"{host['name']}: {unit} ({len(files)} file)")
+        print(f"{len(work)} đơn vị cần kéo")
+    else:
+        done, fetched, errors = collector.pull()
+        print(f"Đã kéo {fetched} file của {done} run/thư mục server → {args.out}")
+    for name, err in errors.items():
+        print(f"⚠️  {name}: {err}", file=sys.stderr)
+    sys.exit(1 if errors else 0)
+
+
+if __name__ == "__main__":
+    main()
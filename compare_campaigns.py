@@ -0,0 +1,185 @@
+# compare_campaigns.py
+# ------------------------------------------
+# So sánh một đợt đo mới với baseline đã chụp (snapshot) → bảng regression + mã thoát,
+# dùng làm "cổng hiệu năng" sau mỗi đợt đo.
+# - snapshot: chép summary_full_grouped.csv (+ summary_client_clean.csv nếu có) vào baselines/<tên>/
+# - compare: mỗi ô (env, nic_mode, qos, direction, pod_config) × metric
+#     welch (mặc định): Welch t-test từ mean/std/count của bảng grouped
+#     mw: Mann-Whitney U trên run thô (cần summary_client_clean.csv ở cả hai phía)
+#   effect size: Hedges' g (+ rank-biserial với mw), FDR Benjamini-Hochberg theo từng metric
+# Regression = q < alpha và metric xấu đi quá ngưỡng (% so với baseline) → exit code 1.
+# Ô baseline có ≥ 2 run mà đợt mới thiếu hoặc < 2 run (mọi run hỏng sau khi đổi kernel/CNI...) = missing,
+# cũng làm cổng thất bại với metric có ngưỡng (trừ khi --allow-missing).
+#
+#   python compare_campaigns.py snapshot --name 2025-11
+#   python compare_campaigns.py compare --baseline baselines/2025-11 --max-throughput-drop 5 --max-latency-rise 10
+# ------------------------------------------
+
+import argparse, json, shutil, sys, time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from data_quality import GROUP_KEYS
+from stat_tests import welch_test, hedges_g, mann_whitney, bh_fdr
+
+GROUPED_FILE = "summary_full_grouped.csv"
+RUNS_FILE = "summary_client_clean.csv"
+BASELINE_DIR = Path("baselines")
+
+# Chiều "tốt hơn" của từng metric được so sánh
+METRICS = {"throughput_mbps": "higher", "latency_ms": "lower", "jitter_ms": "lower", "cpu_mean": "lower"}
+
+
+# ---------------- NẠP DỮ LIỆU -----------------
+def load_side(path):
+    """Thư mục (snapshot / thư mục phân tích) hoặc file grouped → (grouped, runs hoặc None)"""
+    path = Path(path)
+    grouped_path = path / GROUPED_FILE if path.is_dir() else path
+    runs_path = grouped_path.parent / RUNS_FILE
+    grouped = pd.read_csv(grouped_path)
+    runs = pd.read_csv(runs_path) if runs_path.exists() else None
+    return grouped, runs
+
+
+def cell_stats(grouped, metric):
+    """mean/std/count của metric theo ô GROUP_KEYS (bỏ các cột nhóm dẫn xuất is_fair, network_type)"""
+    cols = [f"{metric}_mean", f"{metric}_std", f"{metric}_count"]
+    if not set(cols) <= set(grouped.columns):
+        return None
+    out = grouped[GROUP_KEYS + cols].rename(columns=dict(zip(cols, ["mean", "std", "n"])))
+    return out.drop_duplicates(GROUP_KEYS)
+
+
+# ---------------- SO SÁNH -----------------
+def compare_metric(base, cur, metric, test="welch", base_runs=None, cur_runs=None):
+    """Bảng so sánh một metric cho mọi ô (outer join: ô thiếu một phía vẫn được liệt kê)"""
+    b, c = cell_stats(base, metric), cell_stats(cur, metric)
+    if b is None or c is None:
+        return pd.DataFrame()
+    t = b.merge(c, on=GROUP_KEYS, how="outer", suffixes=("_base", "_cur"))
+    t.insert(len(GROUP_KEYS), "metric", metric)
+    t["n_base"], t["n_cur"] = t["n_base"].fillna(0), t["n_cur"].fillna(0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t["change_pct"] = (t["mean_cur"] - t["mean_base"]) / t["mean_base"].abs() * 100
+    args = (t["mean_base"], t["std_base"], t["n_base"], t["mean_cur"], t["std_cur"], t["n_cur"])
+    t["hedges_g"] = hedges_g(*args)
+
+    if test == "mw":
+        both = pd.concat([base_runs.assign(_side=0), cur_runs.assign(_side=1)], ignore_index=True)
+        mw = mann_whitney(both, GROUP_KEYS, metric, "_side")
+        t = t.merge(mw[GROUP_KEYS + ["u", "p", "rank_biserial"]].rename(columns={"u": "statistic", "p": "p_value"}),
+                    on=GROUP_KEYS, how="left")
+    else:
+        stat, _, p = welch_test(*args)
+        t["statistic"], t["p_value"] = stat, p
+    t["test"] = test
+    t["q_value"] = bh_fdr(t["p_value"])
+    return t
+
+
+def classify(t, alpha, thresholds):
+    """
+    status: regression (q < alpha, xấu đi quá ngưỡng của metric có ngưỡng) | worse | better | same |
+    missing (baseline ≥ 2 run, đợt mới thiếu ô hoặc < 2 run) | insufficient (các trường hợp thiếu run khác)
+    """
+    sign = t["metric"].map(METRICS).map({"higher": -1.0, "lower": 1.0})
+    t["worse_pct"] = t["change_pct"] * sign  # > 0: xấu đi
+    t["threshold_pct"] = t["metric"].map(thresholds)
+    sig = t["q_value"] < alpha
+    t["status"] = np.select(
+        [(t["n_base"] >= 2) & (t["n_cur"] < 2), t["q_value"].isna(),
+         sig & (t["worse_pct"] > t["threshold_pct"]), sig & (t["worse_pct"] > 0), sig & (t["worse_pct"] < 0)],
+        ["missing", "insufficient", "regression", "worse", "better"], default="same")
+    return t
+
+
+def compare(baseline, current, test="welch", alpha=0.05, thresholds=None):
+    base, base_runs = load_side(baseline)
+    cur, cur_runs = load_side(current)
+    if test == "mw" and (base_runs is None or cur_runs is None):
+        print(f"⚠️  Thiếu {RUNS_FILE} ở baseline hoặc đợt mới → dùng Welch t-test", file=sys.stderr)
+        test = "welch"
+    parts = [compare_metric(base, cur, m, test, base_runs, cur_runs) for m in METRICS]
+    table = pd.concat([p for p in parts if not p.empty], ignore_index=True)
+    return classify(table, alpha, thresholds or {})
+
+
+# ---------------- CLI -----------------
+def cmd_snapshot(args):
+    out = BASELINE_DIR / args.name
+    out.mkdir(parents=True, exist_ok=True)
+    src = Path(args.source)
+    shutil.copy(src / GROUPED_FILE, out / GROUPED_FILE)
+    if (src / RUNS_FILE).exists():
+        shutil.copy(src / RUNS_FILE, out / RUNS_FILE)
+    info = {"name": args.name, "created": time.strftime("%Y-%m-%d %H:%M:%S"), "source": str(src.resolve()),
+            "cells": len(pd.read_csv(out / GROUPED_FILE)), "has_runs": (out / RUNS_FILE).exists()}
+    with open(out / "snapshot.json", "w") as f:
+        json.dump(info, f, indent=2)
+    print(f"Đã chụp baseline {args.name}: {info['cells']} ô → {out}")
+    return 0
+
+
+def cmd_compare(args):
+    thresholds = {"throughput_mbps": args.max_throughput_drop, "latency_ms": args.max_latency_rise}
+    for item in args.gate or []:
+        metric, _, pct = item.partition("=")
+        if metric not in METRICS or not pct:
+            raise SystemExit(f"--gate phải có dạng <metric>=<%>, metric thuộc {list(METRICS)}")
+        thresholds[metric] = float(pct)
+    table = compare(args.baseline, args.current, args.test, args.alpha, thresholds)
+    table.to_csv(args.out, index=False)
+
+    counts = table["status"].value_counts()
+    print(f"So sánh {table[GROUP_KEYS].drop_duplicates().shape[0]} ô × {table['metric'].nunique()} metric "
+          f"({table['test'].iat[0] if len(table) else args.test}, alpha={args.alpha}, FDR BH) → {args.out}")
+    print("  " + ", ".join(f"{k}: {v}" for k, v in counts.items()))
+    reg = table[table["status"] == "regression"]
+    for _, r in reg.iterrows():
+        cell = " / ".join(str(r[k]) for k in GROUP_KEYS)
+        print(f"❌ {cell}: {r['metric']} {r['mean_base']:.3f} → {r['mean_cur']:.3f} "
+              f"({r['change_pct']:+.1f}%, q={r['q_value']:.3g}, g={r['hedges_g']:.2f})")
+    # Ô mất hẳn / còn < 2 run ở đợt mới, tính với metric có ngưỡng
+    lost = table[(table["status"] == "missing") & table["metric"].isin(thresholds)]
+    mark = "⚠️ " if args.allow_missing else "❌"
+    for cell, g in lost.groupby(GROUP_KEYS, sort=False, dropna=False):
+        r = g.iloc[0]
+        print(f"{mark} {' / '.join(map(str, cell))}: thiếu ở đợt mới ({int(r['n_base'])} → {int(r['n_cur'])} run; "
+              f"{', '.join(g['metric'])})")
+    failed = not reg.empty or (not lost.empty and not args.allow_missing)
+    if not failed:
+        print("✅ Không có regression vượt ngưỡng" + (" (bỏ qua ô thiếu: --allow-missing)" if not lost.empty else ""))
+        return 0
+    return 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description="So sánh đợt đo mới với baseline (cổng hiệu năng)")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    p = sub.add_parser("snapshot", help="Chụp kết quả phân tích hiện tại làm baseline")
+    p.add_argument("--name", required=True)
+    p.add_argument("--source", default=".", help="Thư mục chứa summary_full_grouped.csv")
+    p.set_defaults(func=cmd_snapshot)
+
+    p = sub.add_parser("compare", help="So sánh với baseline, exit 1 khi có regression")
+    p.add_argument("--baseline", required=True, help="Thư mục snapshot hoặc file grouped")
+    p.add_argument("--current", default=".", help="Thư mục hoặc file grouped của đợt mới")
+    p.add_argument("--test", choices=["welch", "mw"], default="welch")
+    p.add_argument("--alpha", type=float, default=0.05, help="Ngưỡng q-value (FDR)")
+    p.add_argument("--max-throughput-drop", type=float, default=5.0, help="%% giảm throughput tối đa")
+    p.add_argument("--max-latency-rise", type=float, default=10.0, help="%% tăng latency tối đa")
+    p.add_argument("--gate", nargs="+", help="Ngưỡng cho metric khác, vd jitter_ms=20 cpu_mean=15")
+    p.add_argument("--allow-missing", action="store_true",
+                   help="Ô baseline thiếu / < 2 run ở đợt mới chỉ cảnh báo, không làm cổng thất bại")
+    p.add_argument("--out", default="regression_table.csv")
+    p.set_defaults(func=cmd_compare)
+
+    args = parser.parse_args()
+    sys.exit(args.func(args))
+
+
+if __name__ == "__main__":
+    main()
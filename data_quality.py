@@ -0,0 +1,143 @@
+# data_quality.py
+# ------------------------------------------
+# Chuẩn hoá nhãn, cấu hình mặc định và lọc outlier theo nhóm
+# (luật loại bản ghi không hợp lệ: validation_rules.py)
+# Dùng chung cho analyze_summary_full.py và watch_runs.py
+# ------------------------------------------
+
+import pandas as pd
+import numpy as np
+
+from sweep_params import DEFAULT_PARAMS
+
+GROUP_KEYS = ["env", "nic_mode", "qos", "direction", "pod_config"]
+
+# nic_mode đại diện của mỗi env khi so sánh QoS giữa các env (mỗi nic_mode có baseline NOQOS riêng,
+# không lấy trung bình qua nic_mode); NATIVE chỉ có một nic_mode
+REPRESENTATIVE_NIC = {"DOCKER": "BRIDGED", "VM": "CROSS-HOSTS", "KUBERNETES": "K8S_1 POD"}
+
+
+def normalize_labels(df):
+    """Chuẩn hoá cột dạng chuỗi (env, qos, nic_mode, direction, pod_config)"""
+    df["env"] = df["env"].astype(str).str.upper().str.strip()
+    df["qos"] = df["qos"].fillna("NOQOS").astype(str).str.upper().str.strip()
+    df["nic_mode"] = df["nic_mode"].fillna("UNKNOWN").astype(str).str.upper().str.strip()
+    df["direction"] = df["direction"].fillna("NONE").astype(str).str.lower().str.strip()
+    if "pod_config" not in df.columns:
+        df["pod_config"] = "NONE"
+
+    # Gán nic_mode cho K8S = "K8S_<số pod>"
+    mask_k8s = df["env"].str.contains("K8S|KUBERNETES", na=False)
+    df.loc[mask_k8s, "nic_mode"] = df.loc[mask_k8s, "pod_config"].apply(
+        lambda x: f"K8S_{x.upper()}" if isinstance(x, str) and x != "NONE" else "K8S_UNKNOWN"
+    )
+    return df
+
+
+def is_representative(df):
+    """Mask các ô (env, nic_mode) đại diện theo REPRESENTATIVE_NIC, NATIVE luôn được chọn"""
+    return (df["nic_mode"] == df["env"].map(REPRESENTATIVE_NIC)) | (df["env"] == "NATIVE")
+
+
+def representative_rows(qos_df):
+    """Ô QOS_EFFECT đại diện đã đánh dấu trong summary_comparison.csv (bảng cũ chưa có cột → tính lại)"""
+    if "representative" in qos_df.columns:
+        return qos_df[qos_df["representative"].astype(str).str.upper() == "TRUE"].copy()
+    return qos_df[is_representative(qos_df)].copy()
+
+
+def is_default_config(df):
+    """
+    Mask các run chạy cấu hình iperf3 mặc định (-P 4, không -w/-l/-Z/-A) và không thuộc
+    sweep QoS (qos_param rỗng); cột param_* thiếu hoặc rỗng (run cũ) được coi là mặc định
+    """
+    mask = pd.Series(True, index=df.index)
+    if "qos_param" in df.columns:
+        mask &= df["qos_param"].isna()
+    for k, v in DEFAULT_PARAMS.items():
+        col = f"param_{k}"
+        if col not in df.columns:
+            continue
+        same = pd.to_numeric(df[col], errors="coerce") == v if isinstance(v, int) else df[col].astype(str) == v
+        mask &= same | df[col].isna()
+    return mask
+
+
+# ---------------- ROBUST OUTLIER ----------------
+# Chấm điểm từng run trong nhóm của nó bằng median/MAD và IQR:
+# - MAD: |x - median| * 0.6745 / MAD > z_max
+# - IQR: ngoài hàng rào [Q1 - k*IQR, Q3 + k*IQR]
+# Run nằm ngoài một trong hai khoảng là outlier; nhóm ít hơn min_count run bỏ qua.
+# Cận luôn cách median ít nhất min_rel_spread * |median| để nhóm rất ổn định
+# (vd QoS1 tbf 40mbit: 38.6–39.2 Mbps) không bị gắn cờ vì dao động nhỏ.
+OUTLIER_POLICIES = ("flag", "drop", "winsorize")
+
+
+def outlier_bounds(df, metrics, keys=GROUP_KEYS, z_max=3.5, iqr_k=3.0, min_count=5, min_rel_spread=0.10):
+    """
+    Cận dưới/trên của từng run theo nhóm, tính cho cả corpus trên một groupby
+    (thống kê nhóm được phát lại về từng dòng qua mã nhóm ngroup).
+    Trả về DataFrame <m>_lo, <m>_hi và nguồn của cận (<m>_src_lo/hi = "mad"/"iqr").
+    """
+    g = df.groupby(keys, dropna=False, sort=False)
+    codes = g.ngroup().to_numpy()
+
+    def per_row(stat):
+        return pd.DataFrame(stat.to_numpy()[codes], columns=metrics, index=df.index)
+
+    x = g[metrics]
+    med, count = per_row(x.median()), per_row(x.count())
+    q1, q3 = per_row(x.quantile(0.25)), per_row(x.quantile(0.75))
+    mad = per_row((df[metrics] - med).abs().groupby(codes).median())
+
+    out = {}
+    for m in metrics:
+        spread = mad[m].where(mad[m] > 0) * z_max / 0.6745
+        mad_lo, mad_hi = med[m] - spread, med[m] + spread
+        iqr = q3[m] - q1[m]
+        iqr_lo, iqr_hi = q1[m] - iqr_k * iqr, q3[m] + iqr_k * iqr
+        enough = count[m] >= min_count
+        floor = min_rel_spread * med[m].abs()
+        out[f"{m}_lo"] = np.fmin(np.fmax(mad_lo, iqr_lo), med[m] - floor).where(enough)
+        out[f"{m}_hi"] = np.fmax(np.fmin(mad_hi, iqr_hi), med[m] + floor).where(enough)
+        out[f"{m}_src_lo"] = np.where(mad_lo.fillna(-np.inf) >= iqr_lo, "mad", "iqr")
+        out[f"{m}_src_hi"] = np.where(mad_hi.fillna(np.inf) <= iqr_hi, "mad", "iqr")
+    return pd.DataFrame(out, index=df.index)
+
+
+def outlier_reasons(df, metrics, bounds):
+    """Mã lý do outlier, vd "throughput_mbps_low_mad" ("" = bình thường)"""
+    reason = pd.Series("", index=df.index)
+    for m in reversed(metrics):  # metric đầu tiên được ưu tiên
+        low = df[m] < bounds[f"{m}_lo"]
+        high = df[m] > bounds[f"{m}_hi"]
+        reason = reason.mask(low, m + "_low_" + bounds[f"{m}_src_lo"])
+        reason = reason.mask(high, m + "_high_" + bounds[f"{m}_src_hi"])
+    return reason
+
+
+def apply_outlier_policy(df, metrics, policy="flag", **kwargs):
+    """
+    Áp dụng chính sách cho outlier:
+    - flag: giữ nguyên, chỉ ghi nhận
+    - drop: loại khỏi dữ liệu
+    - winsorize: kẹp giá trị về cận của nhóm
+    Trả về (df sau xử lý, các bản ghi outlier kèm invalid_reason + outlier_action)
+    """
+    if policy not in OUTLIER_POLICIES:
+        raise ValueError(f"policy phải thuộc {OUTLIER_POLICIES}, nhận {policy!r}")
+    bounds = outlier_bounds(df, metrics, **kwargs)
+    reason = outlier_reasons(df, metrics, bounds)
+    is_out = reason != ""
+
+    flagged = df[is_out].copy()
+    flagged["invalid_reason"] = reason[is_out]
+    flagged["outlier_action"] = {"flag": "flagged", "drop": "dropped", "winsorize": "winsorized"}[policy]
+
+    if policy == "drop":
+        df = df[~is_out].reset_index(drop=True)
+    elif policy == "winsorize":
+        df = df.copy()
+        for m in metrics:
+            df[m] = df[m].clip(bounds[f"{m}_lo"], bounds[f"{m}_hi"])
+    return df, flagged
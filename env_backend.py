@@ -0,0 +1,171 @@
+# env_backend.py
+# ------------------------------------------
+# Backend môi trường cho harness đo (thay cho bản sao measure_system_loop_docker.py)
+# - host:      tc qua sudo (nếu không phải root), server mở trong gnome-terminal
+# - container: không sudo, server chạy bash nền; đọc thêm cgroup v2 của chính container
+# Trong container, psutil.cpu_percent / virtual_memory là số của HOST →
+# ghi song song số liệu cgroup (cpu.stat, memory.current, cpu.pressure) để
+# DOCKER / KUBERNETES so được với NATIVE.
+# Chỉ dùng thư viện chuẩn + psutil (chạy trên máy đo).
+# ------------------------------------------
+
+import os, platform, shutil, subprocess, time
+from pathlib import Path
+
+import psutil
+
+CGROUP_ROOT = Path("/sys/fs/cgroup")
+BACKENDS = ("auto", "host", "container")
+
+
+# ---------------- CGROUP V2 -----------------
+def cgroup_v2_dir():
+    """
+    Thư mục cgroup v2 của tiến trình hiện tại, None nếu máy không dùng cgroup v2.
+    /proc/self/cgroup có dòng '0::/<path>' (trong container có cgroupns thường là '0::/').
+    """
+    if not (CGROUP_ROOT / "cgroup.controllers").exists():
+        return None
+    try:
+        for line in Path("/proc/self/cgroup").read_text().splitlines():
+            if line.startswith("0::"):
+                path = CGROUP_ROOT / line[3:].strip().lstrip("/")
+                return path if (path / "cpu.stat").exists() else CGROUP_ROOT
+    except OSError:
+        pass
+    return None
+
+
+def read_kv(path):
+    """File dạng 'key value' mỗi dòng (cpu.stat, memory.stat) → dict số nguyên"""
+    out = {}
+    try:
+        for line in Path(path).read_text().splitlines():
+            k, _, v = line.partition(" ")
+            if v.strip().isdigit():
+                out[k] = int(v)
+    except OSError:
+        pass
+    return out
+
+
+def read_pressure(path):
+    """cpu.pressure: 'some avg10=.. avg60=.. avg300=.. total=..' → {'some_avg10': .., ...}"""
+    out = {}
+    try:
+        for line in Path(path).read_text().splitlines():
+            kind, *fields = line.split()
+            for f in fields:
+                k, _, v = f.partition("=")
+                out[f"{kind}_{k}"] = float(v)
+    except (OSError, ValueError):
+        pass
+    return out
+
+
+def cgroup_cpus(cg_dir):
+    """Số CPU hiệu dụng của cgroup: quota cpu.max (nếu có), tối đa bằng số CPU host"""
+    n = psutil.cpu_count() or 1
+    try:
+        quota, period = (cg_dir / "cpu.max").read_text().split()
+        if quota != "max":
+            return min(n, int(quota) / int(period))
+    except (OSError, ValueError):
+        pass
+    return n
+
+
+class CgroupSampler:
+    """Lấy mẫu CPU (% trên số CPU hiệu dụng), bộ nhớ và PSI của một cgroup v2"""
+
+    COLUMNS = ["cg_cpu_percent", "cg_mem_mb", "cg_cpu_pressure"]
+
+    def __init__(self, cg_dir):
+        self.dir = cg_dir
+        self.cpus = cgroup_cpus(cg_dir)
+        self._last = None
+
+    def sample(self):
+        now = time.monotonic()
+        usage = read_kv(self.dir / "cpu.stat").get("usage_usec")
+        cpu = ""
+        if usage is not None and self._last:
+            t0, u0 = self._last
+            cpu = f"{(usage - u0) / ((now - t0) * 1e6) / self.cpus * 100:.2f}"
+        self._last = (now, usage) if usage is not None else None
+        try:
+            mem = f"{int((self.dir / 'memory.current').read_text()) / (1024 * 1024):.2f}"
+        except (OSError, ValueError):
+            mem = ""
+        psi = read_pressure(self.dir / "cpu.pressure").get("some_avg10")
+        return [cpu, mem, "" if psi is None else f"{psi:.2f}"]
+
+
+# ---------------- BACKEND -----------------
+def in_container():
+    """Nhận diện Docker / Kubernetes / containerd"""
+    if Path("/.dockerenv").exists() or os.environ.get("KUBERNETES_SERVICE_HOST"):
+        return True
+    try:
+        text = Path("/proc/1/cgroup").read_text()
+    except OSError:
+        return False
+    return any(k in text for k in ("docker", "kubepods", "containerd", "libpod"))
+
+
+class HostBackend:
+    """Máy thật / VM: tc cần sudo khi không chạy bằng root"""
+
+    name = "host"
+
+    def __init__(self):
+        self.sudo = ["sudo"] if platform.system() == "Linux" and os.geteuid() != 0 else []
+        self.cgroup = None
+
+    def extra_columns(self):
+        return CgroupSampler.COLUMNS if self.cgroup else []
+
+    def sample_extra(self):
+        return self.cgroup.sample() if self.cgroup else []
+
+    def server_cmd(self, base):
+        """Lệnh chạy vòng lặp iperf3 -s -1 -J, mỗi session một file JSON"""
+        return [
+            "bash", "-c",
+            f'mkdir -p {base}/server_json; i=1; while true; do '
+            f'echo "[SERVER] Waiting $i..."; '
+            f'iperf3 -s -1 -J > {base}/server_json/session_$i.json; '
+            f'echo "[SERVER] Session $i done."; sleep 3; i=$((i+1)); done'
+        ]
+
+    def start_server(self, base):
+        cmd = self.server_cmd(base)
+        if shutil.which("gnome-terminal"):
+            return subprocess.Popen(["gnome-terminal", "--", *cmd])
+        print("Không có gnome-terminal: chạy iperf3 server nền.")
+        return subprocess.Popen(cmd)
+
+
+class ContainerBackend(HostBackend):
+    """Docker / Kubernetes: không sudo, server chạy nền, ghi thêm số liệu cgroup v2"""
+
+    name = "container"
+
+    def __init__(self):
+        super().__init__()
+        self.sudo = []
+        cg_dir = cgroup_v2_dir()
+        self.cgroup = CgroupSampler(cg_dir) if cg_dir else None
+        if not self.cgroup:
+            print("Không tìm thấy cgroup v2: chỉ ghi CPU/RAM của host.")
+
+    def start_server(self, base):
+        print("Chạy iperf3 server nền trong container (không cần gnome-terminal).")
+        return subprocess.Popen(self.server_cmd(base))
+
+
+def make_backend(kind="auto"):
+    """'auto' → container nếu phát hiện Docker/Kubernetes, ngược lại host"""
+    if kind == "auto":
+        kind = "container" if platform.system() == "Linux" and in_container() else "host"
+    return ContainerBackend() if kind == "container" else HostBackend()
@@ -0,0 +1,302 @@
+# group_stats.py
+# ------------------------------------------
+# Thống kê theo nhóm dạng accumulator gộp được (mergeable), lưu ra JSON giữa các lần chạy
+# - Mỗi (nhóm, metric): count, mean, M2 (Welford/Chan), min, max + QuantileSketch
+# - update(batch): chỉ các nhóm có run mới bị cập nhật, run đã nạp (theo cột id) được bỏ qua
+# - merge(other): gộp chính xác hai accumulator (máy đo khác nhau, đợt đo khác nhau); hai bên phải
+#   rời nhau về run (sources) – run chung sẽ bị đếm hai lần nên bị từ chối bằng ValueError
+# - rollup(by): gộp các ô thành nhóm thô hơn (thay np.average có trọng số count)
+# QuantileSketch: bucket log kiểu DDSketch (sai số tương đối `accuracy`), có bucket 0 và
+# giá trị âm → median/p90/p99 gộp được bằng cộng số đếm, giống rr_probe.LogHistogram.
+#
+#   python group_stats.py merge a.json b.json --out merged.json --csv merged.csv
+#   python group_stats.py export group_stats.json --csv grouped.csv --quantiles 0.5 0.9 0.99
+# ------------------------------------------
+
+import argparse, json, math, sys
+import numpy as np
+import pandas as pd
+
+ZERO_EPS = 1e-12
+
+
+# ---------------- QUANTILE SKETCH -----------------
+class QuantileSketch:
+    """Bucket log: |v| rơi vào bucket ceil(log_gamma |v|), gamma = (1 + a) / (1 - a)"""
+
+    def __init__(self, accuracy=0.01):
+        self.accuracy = accuracy
+        self._log_gamma = math.log((1 + accuracy) / (1 - accuracy))
+        self.pos, self.neg, self.zero = {}, {}, 0
+
+    def _add_counts(self, store, values):
+        idx, cnt = np.unique(np.ceil(np.log(values) / self._log_gamma).astype(int), return_counts=True)
+        for i, c in zip(idx.tolist(), cnt.tolist()):
+            store[i] = store.get(i, 0) + c
+
+    def add(self, values):
+        v = np.asarray(values, float)
+        v = v[~np.isnan(v)]
+        self.zero += int((np.abs(v) <= ZERO_EPS).sum())
+        if (v > ZERO_EPS).any():
+            self._add_counts(self.pos, v[v > ZERO_EPS])
+        if (v < -ZERO_EPS).any():
+            self._add_counts(self.neg, -v[v < -ZERO_EPS])
+        return self
+
+    def merge(self, other):
+        if other.accuracy != self.accuracy:
+            raise ValueError("Chỉ gộp được sketch cùng accuracy")
+        for mine, theirs in ((self.pos, other.pos), (self.neg, other.neg)):
+            for i, c in theirs.items():
+                mine[i] = mine.get(i, 0) + c
+        self.zero += other.zero
+        return self
+
+    @property
+    def count(self):
+        return self.zero + sum(self.pos.values()) + sum(self.neg.values())
+
+    def quantile(self, q):
+        """Giá trị đại diện của bucket chứa hạng q·(n−1); rỗng → NaN"""
+        n = self.count
+        if not n:
+            return math.nan
+        rank, seen = q * (n - 1), 0
+        gamma = math.exp(self._log_gamma)
+        for i in sorted(self.neg, reverse=True):  # âm: |v| lớn nhất đứng đầu
+            seen += self.neg[i]
+            if seen > rank:
+                return -2 * gamma ** i / (gamma + 1)
+        seen += self.zero
+        if seen > rank:
+            return 0.0
+        for i in sorted(self.pos):
+            seen += self.pos[i]
+            if seen > rank:
+                return 2 * gamma ** i / (gamma + 1)
+        return 2 * gamma ** max(self.pos) / (gamma + 1)
+
+    def to_dict(self):
+        return {"accuracy": self.accuracy, "zero": self.zero,
+                "pos": {str(k): v for k, v in sorted(self.pos.items())},
+                "neg": {str(k): v for k, v in sorted(self.neg.items())}}
+
+    @classmethod
+    def from_dict(cls, d):
+        s = cls(d.get("accuracy", 0.01))
+        s.zero = d.get("zero", 0)
+        s.pos = {int(k): v for k, v in d.get("pos", {}).items()}
+        s.neg = {int(k): v for k, v in d.get("neg", {}).items()}
+        return s
+
+
+# ---------------- MOMENT CỦA MỘT METRIC -----------------
+class RunningStat:
+    """count/mean/M2/min/max + sketch; gộp theo công thức Chan (chính xác, không phụ thuộc thứ tự)"""
+
+    def __init__(self, accuracy=0.01):
+        self.n, self.mean, self.m2 = 0, 0.0, 0.0
+        self.min, self.max = math.inf, -math.inf
+        self.sketch = QuantileSketch(accuracy)
+
+    def merge_moments(self, n, mean, m2, vmin, vmax):
+        if not n:
+            return self
+        total = self.n + n
+        delta = mean - self.mean
+        self.mean += delta * n / total
+        self.m2 += m2 + delta * delta * self.n * n / total
+        self.n = total
+        self.min, self.max = min(self.min, vmin), max(self.max, vmax)
+        return self
+
+    def merge(self, other):
+        self.merge_moments(other.n, other.mean, other.m2, other.min, other.max)
+        self.sketch.merge(other.sketch)
+        return self
+
+    def summary(self, prefix, quantiles=()):
+        n = self.n
+        std = math.sqrt(self.m2 / (n - 1)) if n > 1 else math.nan
+        out = {f"{prefix}_mean": self.mean if n else math.nan, f"{prefix}_std": std,
+               f"{prefix}_count": n, f"{prefix}_sem": std / math.sqrt(n) if n > 1 else math.nan}
+        if quantiles:
+            out[f"{prefix}_min"] = self.min if n else math.nan
+            out[f"{prefix}_max"] = self.max if n else math.nan
+        for q in quantiles:
+            out[f"{prefix}_p{q * 100:g}"] = min(max(self.sketch.quantile(q), self.min), self.max) if n else math.nan
+        return out
+
+    def to_dict(self):
+        return {"n": self.n, "mean": self.mean, "m2": self.m2,
+                "min": self.min if self.n else None, "max": self.max if self.n else None,
+                "sketch": self.sketch.to_dict()}
+
+    @classmethod
+    def from_dict(cls, d):
+        s = cls()
+        s.n, s.mean, s.m2 = d["n"], d["mean"], d["m2"]
+        s.min = d["min"] if d.get("min") is not None else math.inf
+        s.max = d["max"] if d.get("max") is not None else -math.inf
+        s.sketch = QuantileSketch.from_dict(d["sketch"])
+        return s
+
+
+# ---------------- ACCUMULATOR THEO NHÓM -----------------
+def _plain(v):
+    """Giá trị khoá → kiểu Python thuần (JSON được, so sánh được giữa các lần nạp)"""
+    if v is None or (isinstance(v, float) and math.isnan(v)):
+        return None
+    return v.item() if hasattr(v, "item") else v
+
+
+class GroupAccumulator:
+    def __init__(self, keys, metrics, accuracy=0.01):
+        self.keys, self.metrics, self.accuracy = list(keys), list(metrics), accuracy
+        self.cells = {}       # tuple khoá → {metric: RunningStat}
+        self.sources = set()  # id các run đã nạp
+
+    def _cell(self, key):
+        if key not in self.cells:
+            self.cells[key] = {m: RunningStat(self.accuracy) for m in self.metrics}
+        return self.cells[key]
+
+    def update(self, df, id_col="path"):
+        """
+        Nạp một lô run (DataFrame có cột keys + metrics); run có id đã nạp bị bỏ qua.
+        Moment của lô tính vector hoá bằng một groupby rồi gộp vào các nhóm bị ảnh hưởng.
+        Trả về tập khoá nhóm đã cập nhật.
+        """
+        if id_col and id_col in df.columns:
+            df = df[~df[id_col].astype(str).isin(self.sources)]
+            self.sources.update(df[id_col].astype(str))
+        metrics = [m for m in self.metrics if m in df.columns]
+        if df.empty or not metrics:
+            return set()
+        x = df[metrics].apply(pd.to_numeric, errors="coerce").replace([np.inf, -np.inf], np.nan)
+        g = x.groupby([df[k] for k in self.keys], dropna=False, sort=False)
+        n, mean = g.count(), g.mean()
+        m2, vmin, vmax = g.var(ddof=0).fillna(0.0) * n, g.min(), g.max()
+        # Vị trí dòng của từng nhóm (ngroup cùng thứ tự với kết quả agg khi sort=False)
+        codes = g.ngroup().to_numpy()
+        order = np.argsort(codes, kind="stable")
+        rows = np.split(order, np.cumsum(np.bincount(codes, minlength=len(n)))[:-1])
+        values = x.to_numpy()
+        touched = set()
+        for idx, key in enumerate(n.index):
+            key = tuple(_plain(k) for k in (key if isinstance(key, tuple) else (key,)))
+            cell = self._cell(key)
+            for col, m in enumerate(metrics):
+                cnt = int(n.iat[idx, col])
+                if cnt:
+                    cell[m].merge_moments(cnt, mean.iat[idx, col], m2.iat[idx, col], vmin.iat[idx, col], vmax.iat[idx, col])
+                    cell[m].sketch.add(values[rows[idx], col])
+            touched.add(key)
+        return touched
+
+    def merge(self, other):
+        if other.keys != self.keys:
+            raise ValueError(f"Khoá nhóm khác nhau: {self.keys} vs {other.keys}")
+        shared = self.sources & other.sources
+        if shared:
+            ids = sorted(shared)
+            more = f" … (+{len(ids) - 5})" if len(ids) > 5 else ""
+            raise ValueError(f"{len(ids)} run có ở cả hai accumulator (sẽ bị đếm hai lần): {ids[:5]}{more}")
+        for m in other.metrics:
+            if m not in self.metrics:
+                self.metrics.append(m)
+                for cell in self.cells.values():
+                    cell[m] = RunningStat(self.accuracy)
+        for key, stats in other.cells.items():
+            cell = self._cell(key)
+            for m, s in stats.items():
+                cell[m].merge(s)
+        self.sources |= other.sources
+        return self
+
+    def rollup(self, by, keys=None):
+        """Gộp các ô (chỉ các khoá trong `keys` nếu có) thành nhóm theo cột `by`"""
+        pos = [self.keys.index(b) for b in by]
+        out = GroupAccumulator(by, self.metrics, self.accuracy)
+        for key in (self.cells if keys is None else keys):
+            key = tuple(_plain(k) for k in key)
+            if key not in self.cells:
+                continue
+            cell = out._cell(tuple(key[i] for i in pos))
+            for m, s in self.cells[key].items():
+                cell[m].merge(s)
+        out.sources = set(self.sources)
+        return out
+
+    def summary(self, key, quantiles=()):
+        out = {}
+        for m in self.metrics:
+            out.update(self.cells[key][m].summary(m, quantiles))
+        return out
+
+    def to_frame(self, quantiles=()):
+        """Một dòng mỗi nhóm: <m>_mean, <m>_std, <m>_count, <m>_sem (+ min/max/p.. nếu có quantiles)"""
+        rows = [dict(zip(self.keys, key), **self.summary(key, quantiles)) for key in self.cells]
+        cols = self.keys + [f"{m}_{s}" for m in self.metrics for s in ("mean", "std", "count", "sem")]
+        frame = pd.DataFrame(rows, columns=None if quantiles else cols)
+        if frame.empty:
+            return pd.DataFrame(columns=cols)
+        return frame.sort_values(self.keys, na_position="last", key=lambda s: s.astype(str)).reset_index(drop=True)
+
+    # ---------------- LƯU / NẠP -----------------
+    def to_dict(self):
+        return {"keys": self.keys, "metrics": self.metrics, "accuracy": self.accuracy,
+                "sources": sorted(self.sources),
+                "cells": [{"key": list(k), "stats": {m: s.to_dict() for m, s in v.items()}}
+                          for k, v in self.cells.items()]}
+
+    @classmethod
+    def from_dict(cls, d):
+        acc = cls(d["keys"], d["metrics"], d.get("accuracy", 0.01))
+        acc.sources = set(d.get("sources", []))
+        for c in d.get("cells", []):
+            acc.cells[tuple(c["key"])] = {m: RunningStat.from_dict(s) for m, s in c["stats"].items()}
+        return acc
+
+    def save(self, path):
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
+
+
+# ---------------- CLI -----------------
+def main():
+    parser = argparse.ArgumentParser(description="Gộp / xuất accumulator thống kê nhóm")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p = sub.add_parser("merge", help="Gộp nhiều file accumulator")
+    p.add_argument("inputs", nargs="+")
+    p.add_argument("--out", required=True)
+    p.add_argument("--csv", default=None)
+    p.add_argument("--quantiles", type=float, nargs="*", default=[0.5, 0.9, 0.99])
+    p = sub.add_parser("export", help="Xuất accumulator ra CSV")
+    p.add_argument("inputs", nargs=1)
+    p.add_argument("--csv", required=True)
+    p.add_argument("--quantiles", type=float, nargs="*", default=[0.5, 0.9, 0.99])
+    args = parser.parse_args()
+
+    acc = GroupAccumulator.load(args.inputs[0])
+    for path in args.inputs[1:]:
+        try:
+            acc.merge(GroupAccumulator.load(path))
+        except ValueError as e:
+            sys.exit(f"Không gộp được {path}: {e}")
+    if args.cmd == "merge":
+        acc.save(args.out)
+        print(f"Đã gộp {len(args.inputs)} accumulator: {len(acc.cells)} nhóm, {len(acc.sources)} run → {args.out}")
+    if args.csv:
+        acc.to_frame(tuple(args.quantiles)).to_csv(args.csv, index=False)
+        print(f"Đã xuất {len(acc.cells)} nhóm → {args.csv}")
+
+
+if __name__ == "__main__":
+    main()
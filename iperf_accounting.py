@@ -0,0 +1,103 @@
+# iperf_accounting.py
+# ------------------------------------------
+# Đọc throughput của một iperf JSON theo đúng hướng của test (start.test_start.reverse / bidir),
+# không theo tên thư mục và không mặc định "sum_sent là số cần lấy":
+# - Luồng chính (end.sum_sent / sum_received): client → server, -R thì server → client
+# - --bidir thêm luồng ngược (sum_sent_bidir_reverse / sum_received_bidir_reverse)
+# - Client có số liệu cả hai đầu (iperf3 trao đổi kết quả cuối test); server chỉ có phía của mình,
+#   phía kia là 0 byte → NaN (trước đây server forward ra throughput_mbps = 0)
+# - Goodput mỗi hướng = tốc độ bên nhận, thiếu thì lấy tốc độ bên gửi; throughput_mbps = tổng các hướng
+# - Nhãn suy từ thư mục bị ghi đè theo test: direction, và phần hướng trong nhãn QoS ("QOS2 S-_C" của một
+#   test cs → "QOS2 C-_S") để không sinh nhóm mâu thuẫn qos/direction
+# ------------------------------------------
+
+import re
+
+import numpy as np
+
+# (khoá sum phía gửi, khoá sum phía nhận) của từng luồng
+FLOWS = {"main": ("sum_sent", "sum_received"),
+         "bidir_reverse": ("sum_sent_bidir_reverse", "sum_received_bidir_reverse")}
+QOS_DIRECTION = re.compile(r"\b[CS][-_]+[CS]\b|\bBIDIR\b", re.IGNORECASE)  # "C-_S", "S-_C" trong tên thư mục QoS
+QOS_TOKENS = {"cs": "C-_S", "sc": "S-_C", "bidir": "BIDIR"}
+COLUMNS = ["test_direction", "sender_mbps", "receiver_mbps", "reverse_sender_mbps", "reverse_receiver_mbps",
+           "cs_mbps", "sc_mbps", "throughput_mbps", "retransmits"]
+
+
+def test_direction(doc):
+    """Hướng theo chính test: "cs", "sc" (-R), "bidir"; JSON thiếu test_start → "" """
+    ts = doc.get("start", {}).get("test_start")
+    if not ts:
+        return ""
+    if ts.get("bidir"):
+        return "bidir"
+    return "sc" if ts.get("reverse") else "cs"
+
+
+def resolve_direction(folder_direction, qos, doc):
+    """
+    Chiều của kịch bản: lấy từ test (cs / sc / bidir), chỉ dùng tên thư mục khi JSON không có
+    test_start; NOQOS giữ "none" như extract_env_info
+    """
+    direction = test_direction(doc)
+    if not direction or qos == "NOQOS":
+        return folder_direction
+    return direction
+
+
+def resolve_labels(folder_direction, qos, doc):
+    """
+    {"qos", "direction"} của kịch bản: direction như resolve_direction; phần hướng trong nhãn QoS
+    (nếu có) được viết lại theo direction đó
+    """
+    direction = resolve_direction(folder_direction, qos, doc)
+    if direction in QOS_TOKENS and isinstance(qos, str):
+        qos = QOS_DIRECTION.sub(QOS_TOKENS[direction], qos)
+    return {"qos": qos, "direction": direction}
+
+
+def _mbps(s):
+    bps = (s or {}).get("bits_per_second")
+    return np.nan if bps is None else bps / 1e6
+
+
+def direction_accounting(doc, role):
+    """
+    Cột throughput theo hướng của một iperf JSON (role = "client" / "server"), xem COLUMNS.
+    sender_/receiver_mbps thuộc luồng chính, reverse_* thuộc luồng ngược của --bidir;
+    ô không đo được (phía đầu kia trên server, luồng không tồn tại) là NaN.
+    """
+    end = doc.get("end", {})
+    direction = test_direction(doc)
+    out = dict.fromkeys(COLUMNS, np.nan)
+    out["test_direction"] = direction
+    if not end:
+        return out
+
+    # Hướng của từng luồng (test_start thiếu → coi như client → server)
+    flows = {"main": "sc" if direction == "sc" else "cs"}
+    if direction == "bidir":
+        flows["bidir_reverse"] = "sc"
+
+    retrans = []
+    for flow, dirn in flows.items():
+        sent_key, recv_key = FLOWS[flow]
+        sent, recv = end.get(sent_key), end.get(recv_key)
+        if flow == "main" and not sent and not recv:
+            sent = end.get("sum")  # iperf3 cũ chỉ có end.sum
+        sender, receiver = _mbps(sent), _mbps(recv)
+        if role == "server":  # chỉ tin phía của server: gửi ở luồng sc, nhận ở luồng cs
+            if dirn == "sc":
+                receiver = np.nan
+            else:
+                sender = np.nan
+        prefix = "" if flow == "main" else "reverse_"
+        out[f"{prefix}sender_mbps"], out[f"{prefix}receiver_mbps"] = sender, receiver
+        out[f"{dirn}_mbps"] = receiver if not np.isnan(receiver) else sender
+        if not np.isnan(sender) and (sent or {}).get("retransmits") is not None:
+            retrans.append(sent["retransmits"])
+
+    goodput = [out[f"{d}_mbps"] for d in set(flows.values()) if not np.isnan(out[f"{d}_mbps"])]
+    out["throughput_mbps"] = sum(goodput) if goodput else np.nan
+    out["retransmits"] = sum(retrans) if retrans else np.nan
+    return out
@@ -0,0 +1,144 @@
+# iperf_runner.py
+# ------------------------------------------
+# Chạy iperf3 client và đọc kết quả dạng stream (--json-stream, iperf3 >= 3.17)
+# - In từng interval ngay khi có
+# - Dừng sớm khi throughput = 0 liên tục N giây hoặc iperf3 báo lỗi
+# - iperf3 cũ không có --json-stream: chạy -J như trước, kiểm tra sau khi xong
+# Kết quả luôn được ghi lại thành một JSON dạng -J (start/intervals/end)
+# để aggregate_results.py đọc như cũ.
+# - POSIX: thu tiến trình bằng os.wait4 → rusage cuối cùng của iperf3 (on_exit), gồm cả CPU
+#   tiêu thụ sau mẫu cuối của ProcessTreeSampler
+# ------------------------------------------
+
+import json, os, signal, subprocess, time
+
+STATUS_OK, STATUS_STALLED, STATUS_ERROR = "ok", "stalled", "error"
+
+
+def supports_json_stream(iperf_bin="iperf3"):
+    """Kiểm tra iperf3 có hỗ trợ --json-stream không"""
+    try:
+        out = subprocess.run([iperf_bin, "--help"], capture_output=True, text=True, timeout=10)
+    except (OSError, subprocess.SubprocessError):
+        return False
+    return "--json-stream" in (out.stdout + out.stderr)
+
+
+def interval_bps(interval):
+    """Tổng bits/s của một interval (cộng cả chiều ngược khi --bidir)"""
+    total = interval.get("sum", {}).get("bits_per_second", 0.0)
+    total += interval.get("sum_bidir_reverse", {}).get("bits_per_second", 0.0)
+    return total
+
+
+def result_status(doc):
+    """Phân loại kết quả: ok / error (iperf3 báo lỗi hoặc thiếu end) / stalled (0 Mbps)"""
+    if doc.get("error") or not doc.get("end"):
+        return STATUS_ERROR
+    end = doc["end"]
+    sent = end.get("sum_sent") or end.get("sum") or {}
+    if not sent.get("bits_per_second"):
+        return STATUS_STALLED
+    return STATUS_OK
+
+
+def wait_rusage(proc, timeout=None):
+    """
+    Chờ proc kết thúc (timeout giây, None = không giới hạn) → (đã kết thúc?, rusage).
+    POSIX thu tiến trình bằng os.wait4 để lấy rusage của nó; Windows / đã bị thu trước đó → rusage None
+    """
+    if not hasattr(os, "wait4"):
+        try:
+            proc.wait(timeout)
+            return True, None
+        except subprocess.TimeoutExpired:
+            return False, None
+    deadline = None if timeout is None else time.monotonic() + timeout
+    while proc.returncode is None:
+        try:
+            pid, status, usage = os.wait4(proc.pid, os.WNOHANG)
+        except ChildProcessError:
+            proc.wait()
+            break
+        if pid:
+            proc.returncode = os.waitstatus_to_exitcode(status)
+            return True, usage
+        if deadline is not None and time.monotonic() >= deadline:
+            return False, None
+        time.sleep(0.02)
+    return True, None
+
+
+def run_streaming(cmd, out_path, stall_seconds=5, on_interval=None, on_start=None, on_exit=None):
+    """
+    Chạy iperf3 với --json-stream, trả về (status, doc).
+    cmd là lệnh iperf3 đầy đủ (không gồm -J); kết quả ghi vào out_path.
+    on_start(pid) được gọi ngay sau khi tiến trình khởi động, on_exit(rusage) khi đã thu
+    được tiến trình (chỉ POSIX).
+    """
+    doc = {"start": {}, "intervals": [], "end": {}}
+    status, zero_secs, finished = None, 0.0, False
+    proc = subprocess.Popen(cmd + ["--json-stream"], stdout=subprocess.PIPE,
+                            stderr=subprocess.STDOUT, text=True, bufsize=1)
+    if on_start:
+        on_start(proc.pid)
+    try:
+        for line in proc.stdout:
+            try:
+                msg = json.loads(line)
+            except ValueError:
+                continue
+            event, data = msg.get("event"), msg.get("data")
+            if event == "start":
+                doc["start"] = data
+            elif event == "interval":
+                doc["intervals"].append(data)
+                if on_interval:
+                    on_interval(data)
+                bps = interval_bps(data)
+                zero_secs = zero_secs + data.get("sum", {}).get("seconds", 1.0) if bps <= 0 else 0.0
+                if stall_seconds and zero_secs >= stall_seconds:
+                    status = STATUS_STALLED
+                    break
+            elif event == "end":
+                doc["end"] = data
+            elif event == "error":
+                doc["error"] = data
+                status = STATUS_ERROR
+                break
+        else:
+            finished = True
+    finally:
+        # Không dùng poll()/terminate() của Popen: chúng thu tiến trình và làm mất rusage
+        done, usage = wait_rusage(proc, None if finished else 0)
+        if not done:
+            os.kill(proc.pid, signal.SIGTERM)
+            done, usage = wait_rusage(proc, 5)
+        if not done:
+            proc.kill()
+            proc.wait()
+        if on_exit and usage is not None:
+            on_exit(usage)
+
+    with open(out_path, "w") as f:
+        json.dump(doc, f, indent=2)
+    return status or result_status(doc), doc
+
+
+def run_blocking(cmd, out_path, on_start=None, on_exit=None):
+    """Cách chạy cũ: iperf3 -J ghi thẳng ra file, chỉ kiểm tra sau khi xong"""
+    with open(out_path, "w") as f:
+        proc = subprocess.Popen(cmd + ["-J"], stdout=f, stderr=subprocess.STDOUT)
+        if on_start:
+            on_start(proc.pid)
+        _, usage = wait_rusage(proc)
+    if on_exit and usage is not None:
+        on_exit(usage)
+    try:
+        with open(out_path) as f:
+            doc = json.load(f)
+    except ValueError:
+        doc = None
+    if not isinstance(doc, dict):
+        doc = {"error": "invalid JSON output"}
+    return result_status(doc), doc
@@ -1,6 +1,15 @@
-import argparse, psutil, subprocess, threading, time, platform
+import argparse, asyncio, psutil, subprocess, threading, time, platform
 from pathlib import Path
-import os, sys, json
+import os, sys, json, math
+from iperf_runner import run_streaming, run_blocking, supports_json_stream, interval_bps, STATUS_OK
+from net_counters import CounterSampler
+from proc_accounting import ProcessTreeSampler
+from env_backend import make_backend, BACKENDS
+from capacity_search import udp_result, search_capacity, write_capacity
+from sweep_params import DEFAULT_PARAMS, iperf_args, sweep_grid
+from qos_profiles import (PROFILE_FILE, load_profiles, parse_overrides, with_overrides, describe,
+                          apply_profile, initial_points, next_point)
+import rr_probe
 
 # ---------------- ARGPARSE -----------------
 parser = argparse.ArgumentParser(description="Đo hiệu năng mạng đa hướng với QoS")
@@ -11,56 +20,126 @@ parser.add_argument("--duration", type=int, default=30)
 parser.add_argument("--repeat", type=int, default=10)
 parser.add_argument("--direction", choices=["cs", "sc", "bidir"], default="cs",
                     help="Hướng đo: cs=client→server, sc=server→client, bidir=hai chiều")
-parser.add_argument("--qos", choices=["noqos", "qos1", "qos2", "qos3"], default="noqos",
-                    help="Áp dụng QoS: noqos, qos1(rate limit), qos2(delay), qos3(delay+loss)")
+parser.add_argument("--qos", default="noqos",
+                    help="Tên profile QoS trong --qos-file: noqos, qos1(rate limit), qos2(delay), qos3(delay+loss), ...")
+parser.add_argument("--qos-file", default=str(PROFILE_FILE), help="File JSON khai báo profile QoS (tc qdisc)")
+parser.add_argument("--qos-set", nargs="+", default=[], metavar="TÊN=GIÁ_TRỊ",
+                    help="Ghi đè tham số tc của profile, vd --qos-set delay=50ms loss=2%%")
 parser.add_argument("--iface", default="eth0", help="Tên interface để áp QoS (Linux)")
+parser.add_argument("--omit", type=int, default=0,
+                    help="Bỏ qua N giây đầu (iperf3 -O) để loại pha slow-start khỏi kết quả")
+parser.add_argument("--net-sample", type=float, default=0,
+                    help="Chu kỳ (giây) chụp bộ đếm NIC/qdisc trong lúc đo; 0 = chỉ trước/sau")
+parser.add_argument("--stall-seconds", type=float, default=5,
+                    help="Dừng sớm lần đo khi throughput = 0 liên tục N giây (0 = tắt)")
+parser.add_argument("--retries", type=int, default=2,
+                    help="Số lần chạy lại tối đa khi iperf3 lỗi hoặc 0 Mbps")
+parser.add_argument("--no-stream", action="store_true",
+                    help="Không dùng --json-stream (chạy -J và chỉ kiểm tra khi xong)")
+parser.add_argument("--mode", choices=["fixed", "capacity", "sweep", "qos-sweep"], default="fixed",
+                    help="fixed: TCP trong --duration giây; capacity: tìm tốc độ UDP cao nhất đạt ngưỡng loss/jitter; "
+                         "sweep: lặp TCP qua lưới tham số --sweep-*; qos-sweep: quét một tham số tc của --qos")
+# Tham số iperf3 cho mode fixed (sweep dùng các lưới --sweep-* bên dưới)
+parser.add_argument("--streams", type=int, default=DEFAULT_PARAMS["streams"], help="Số stream song song (-P)")
+parser.add_argument("--window", default="default", help="Socket buffer (-w), vd 256K; default = mặc định hệ điều hành")
+parser.add_argument("--blocklen", default="default", help="Kích thước block (-l), vd 128K")
+parser.add_argument("--zerocopy", action="store_true", help="Zero-copy sendfile (-Z)")
+parser.add_argument("--affinity", default="none", help="CPU affinity (-A): 'n' (client) hoặc 'n,m' (client,server)")
+parser.add_argument("--sweep-streams", nargs="+", default=["1", "2", "4", "8"])
+parser.add_argument("--sweep-window", nargs="+", default=["default", "256K", "1M"])
+parser.add_argument("--sweep-blocklen", nargs="+", default=["default"])
+parser.add_argument("--sweep-zerocopy", nargs="+", default=["0", "1"])
+parser.add_argument("--sweep-affinity", nargs="+", default=["none"])
+parser.add_argument("--cap-start", type=float, default=10, help="Capacity: tốc độ thử đầu tiên (Mbps)")
+parser.add_argument("--cap-max", type=float, default=10000, help="Capacity: tốc độ thử tối đa (Mbps)")
+parser.add_argument("--cap-trial", type=int, default=5, help="Capacity: thời lượng mỗi lần thử (giây)")
+parser.add_argument("--cap-trials", type=int, default=14, help="Capacity: số lần thử tối đa mỗi run")
+parser.add_argument("--cap-resolution", type=float, default=0.05,
+                    help="Capacity: dừng khi khoảng tìm kiếm hẹp hơn tỉ lệ này")
+parser.add_argument("--loss-target", type=float, default=0.1, help="Capacity: loss tối đa (%%)")
+parser.add_argument("--jitter-target", type=float, default=0, help="Capacity: jitter tối đa (ms), 0 = không xét")
+# Sweep QoS thích nghi (--mode qos-sweep)
+parser.add_argument("--qos-param", default="delay", help="Tham số tc được quét, vd delay, loss, rate")
+parser.add_argument("--qos-range", nargs=2, type=float, default=[1, 200], metavar=("LO", "HI"))
+parser.add_argument("--qos-unit", default="ms", help="Đơn vị ghép sau giá trị, vd ms, %%, mbit")
+parser.add_argument("--qos-log", action="store_true", help="Lấy mẫu theo thang log (rate, loss)")
+parser.add_argument("--qos-initial", type=int, default=3, help="Số điểm đều ban đầu")
+parser.add_argument("--qos-points", type=int, default=8, help="Tổng số điểm (ban đầu + thích nghi)")
+parser.add_argument("--rr-probe", choices=["off", "alone", "concurrent"], default="off",
+                    help="Probe request/response TCP/UDP (rr_probe.py): alone = sau iperf3, concurrent = cùng lúc iperf3; "
+                         "server cũng cần cờ này để mở echo")
+parser.add_argument("--rr-proto", choices=["tcp", "udp"], default="tcp")
+parser.add_argument("--rr-port", type=int, default=rr_probe.DEFAULT_PORT)
+parser.add_argument("--rr-duration", type=float, default=10, help="Thời lượng probe khi chạy riêng (giây)")
+parser.add_argument("--clock-sync", action="store_true",
+                    help="Ước lượng lệch đồng hồ client/server (kiểu NTP qua echo UDP của rr_probe) trước/sau mỗi run "
+                         "→ clock.json; server cũng cần cờ này để mở echo")
+parser.add_argument("--env", choices=BACKENDS, default="auto",
+                    help="Backend môi trường: host (sudo, gnome-terminal), container (cgroup v2), auto = tự nhận diện")
+# Các tính năng của harness có thể bật/tắt (self_bench.py đo chi phí của từng tính năng)
+parser.add_argument("--monitor", choices=["on", "off"], default="on",
+                    help="Ghi CPU/RAM vào sys_usage.log trong lúc đo (off → không có cột cpu_mean)")
+parser.add_argument("--sample-period", type=float, default=1.0, help="Chu kỳ lấy mẫu CPU/RAM của monitor (giây)")
+parser.add_argument("--ping", choices=["sequential", "concurrent", "off"], default="sequential",
+                    help="sequential = ping sau iperf3, concurrent = ping cùng lúc iperf3 (RTT khi có tải, "
+                         "gói trong cửa sổ duration + omit, tối đa --ping-count)")
+parser.add_argument("--ping-count", type=int, default=100, help="Số gói ping mỗi run")
+parser.add_argument("--no-qos", action="store_true",
+                    help="Không gọi tc (giữ nguyên qdisc hiện có), vd testbed loopback/netns của self_bench.py")
 args = parser.parse_args()
 
 BASE = Path(args.base_dir)
 BASE.mkdir(parents=True, exist_ok=True)
+BACKEND = make_backend(args.env)
+PROFILES = load_profiles(args.qos_file)
+if args.qos not in PROFILES:
+    parser.error(f"--qos {args.qos!r} không có trong {args.qos_file} ({', '.join(PROFILES)})")
+QOS_PROFILE = with_overrides(PROFILES[args.qos], parse_overrides(args.qos_set))
 
 # ---------------- QoS -----------------
-def apply_qos():
-    """Áp dụng QoS theo loại và hệ điều hành"""
-    print(f"Đang áp dụng QoS: {args.qos} trên {args.iface}")
+def apply_qos(profile):
+    """Áp profile QoS (danh sách đối số tc, không qua shell) và kiểm tra lại bằng tc -s qdisc show"""
+    if args.no_qos:
+        print("--no-qos: giữ nguyên qdisc hiện có.")
+        return
+    print(f"Đang áp dụng QoS: {args.qos} ({describe(profile)}) trên {args.iface}")
 
     if platform.system() == "Windows":
         print("QoS không khả dụng trực tiếp trên Windows (bỏ qua).")
         return
 
-    # Xóa QoS cũ nếu có
-    subprocess.run(["sudo", "tc", "qdisc", "del", "dev", args.iface, "root"], stderr=subprocess.DEVNULL)
-
-    # Chọn loại QoS
-    if args.qos == "qos1":
-        cmd = f"sudo tc qdisc add dev {args.iface} root tbf rate 40mbit burst 32kbit latency 400ms"
-    elif args.qos == "qos2":
-        cmd = f"sudo tc qdisc add dev {args.iface} root netem delay 25ms"
-    elif args.qos == "qos3":
-        cmd = f"sudo tc qdisc add dev {args.iface} root netem delay 25ms loss 1%"
-    else:
-        print("QoS: không áp dụng (noqos).")
-        return
-
-    print(f"Thực thi: {cmd}")
-    os.system(cmd)
-    print("Áp dụng QoS thành công.\n")
+    try:
+        check = apply_profile(args.iface, profile, BACKEND.sudo)
+    except (RuntimeError, OSError, subprocess.SubprocessError) as e:
+        sys.exit(f"Không áp dụng được QoS: {e}")
+    with open(BASE / "qos_applied.json", "w") as f:
+        json.dump({"qos": args.qos, "profile": profile, "root": check["root"],
+                   "readback": check["readback"], "time": time.time()}, f, indent=1)
+    print(f"Áp dụng QoS thành công: {check['root'] or '(qdisc mặc định)'}\n")
 
 # ---------------- System Monitor -----------------
-def monitor(out_path, duration=None):
-    """Theo dõi CPU/RAM và ghi ra file mỗi 1 giây"""
+def monitor(out_path, duration=None, stop=None, period=None):
+    """
+    Theo dõi CPU/RAM và ghi ra file mỗi `period` giây (mặc định --sample-period),
+    dừng khi hết duration hoặc stop được set.
+    Backend container ghi thêm cột cgroup (cg_*) cạnh số liệu host.
+    """
+    period = period or args.sample_period
     log_file = out_path / "sys_usage.log"
+    extra = BACKEND.extra_columns()
     with open(log_file, "w") as f:
-        f.write("timestamp,cpu_percent,mem_used_mb\n")
+        f.write(",".join(["timestamp", "cpu_percent", "mem_used_mb", *extra]) + "\n")
+        BACKEND.sample_extra()  # mốc đầu cho delta cpu.stat
         print(f"Ghi log CPU/RAM vào {log_file}")
         try:
-            while True if duration is None else duration > 0:
-                cpu = psutil.cpu_percent(interval=1)
+            while (True if duration is None else duration > 0) and not (stop and stop.is_set()):
+                cpu = psutil.cpu_percent(interval=period)
                 mem = psutil.virtual_memory().used / (1024 * 1024)
-                f.write(f"{time.time()},{cpu:.2f},{mem:.2f}\n")
+                row = [f"{time.time()}", f"{cpu:.2f}", f"{mem:.2f}", *BACKEND.sample_extra()]
+                f.write(",".join(row) + "\n")
                 f.flush()
                 if duration is not None:
-                    duration -= 1
+                    duration -= period
         except KeyboardInterrupt:
             print("\nDừng ghi log CPU/RAM.")
 
@@ -80,42 +159,154 @@ def start_iperf_server_in_new_window():
         )
         os.system(cmd)
     else:
-        subprocess.Popen(
-            [
-                "gnome-terminal", "--", "bash", "-c",
-                f'mkdir -p {BASE}/server_json; i=1; while true; do '
-                f'echo "[SERVER] Waiting $i..."; '
-                f'iperf3 -s -1 -J > {BASE}/server_json/session_$i.json; '
-                f'echo "[SERVER] Session $i done."; sleep 3; i=$((i+1)); done'
-            ]
-        )
+        BACKEND.start_server(BASE)
 
 # ---------------- Client -----------------
-def client_run(run_dir):
-    """Chạy iperf3 + ping"""
-    ping_flag = "-c" if platform.system() != "Windows" else "-n"
+def print_interval(data):
+    """In throughput của từng interval ngay khi iperf3 trả về"""
+    s = data.get("sum", {})
+    print(f"  [{s.get('start', 0):6.1f}-{s.get('end', 0):6.1f}s] {interval_bps(data) / 1e6:10.2f} Mbps")
+
+def start_monitor(run_dir, duration):
+    """Thread monitor CPU/RAM + Event để dừng; (None, None) khi --monitor off"""
+    if args.monitor == "off":
+        return None, None
+    stop = threading.Event()
+    t = threading.Thread(target=monitor, args=(run_dir, duration, stop), daemon=True)
+    t.start()
+    return t, stop
+
+def stop_monitor(t, stop):
+    if t is not None:
+        stop.set()
+        t.join()
+
+def client_run(run_dir, params):
+    """Chạy iperf3 với params (stream + dừng sớm + chạy lại) rồi ping; trả về (status, số lần thử)"""
 
     # Chọn hướng đo
-    iperf_cmd = ["iperf3", "-c", args.server_ip, "-t", str(args.duration), "-P", "4", "-J"]
+    iperf_cmd = ["iperf3", "-c", args.server_ip, "-t", str(args.duration), *iperf_args(params)]
     if args.direction == "sc":
         iperf_cmd.append("-R")  # reverse (server → client)
     elif args.direction == "bidir":
         iperf_cmd.append("--bidir")  # bidirectional
+    if args.omit > 0:
+        iperf_cmd += ["-O", str(args.omit)]  # warm-up không tính vào kết quả
+
+    # Lệch đồng hồ trước/sau run để ghép timeline server ↔ client (session_match.py)
+    clock = {"before": rr_probe.clock_offset(args.server_ip, args.rr_port)} if args.clock_sync else None
+
+    # iperf3 test: monitor CPU/RAM chạy lại theo từng lần thử
+    for attempt in range(1, args.retries + 2):
+        print(f"Chạy (lần thử {attempt}): {' '.join(iperf_cmd)}")
+        t, stop = start_monitor(run_dir, args.duration + args.omit)
+        counters = CounterSampler(args.iface, args.net_sample or None) if platform.system() == "Linux" else None
+        if counters:
+            counters.start()
+        procs = ProcessTreeSampler()  # CPU/RSS riêng của cây tiến trình iperf3
+        rr = None
+        if args.rr_probe == "concurrent":  # độ trễ ứng dụng khi đường truyền đang tải
+            rr = threading.Thread(target=rr_test, args=(run_dir, args.duration + args.omit), daemon=True)
+            rr.start()
+        pinger = None
+        if args.ping == "concurrent":  # ping trong lúc iperf3 chạy → RTT khi có tải
+            pinger = threading.Thread(target=ping_test, args=(run_dir, args.duration + args.omit), daemon=True)
+            pinger.start()
+        if USE_STREAM:
+            status, doc = run_streaming(iperf_cmd, run_dir / "iperf_client.json",
+                                        args.stall_seconds, print_interval, on_start=procs.start,
+                                        on_exit=procs.finish)
+        else:
+            status, doc = run_blocking(iperf_cmd, run_dir / "iperf_client.json", on_start=procs.start,
+                                       on_exit=procs.finish)
+        procs.stop(run_dir / "proc_usage.json")
+        stop_monitor(t, stop)
+        if rr:
+            rr.join()
+        if pinger:
+            pinger.join()
+        if counters:
+            counters.stop(run_dir / "net_counters.json")
+        if status == STATUS_OK:
+            break
+        print(f"⚠ Lần thử {attempt} thất bại ({status}: {doc.get('error', '0 Mbps')})")
+        if attempt <= args.retries:
+            time.sleep(3)
+
+    if clock is not None:
+        clock["after"] = rr_probe.clock_offset(args.server_ip, args.rr_port)
+        with open(run_dir / "clock.json", "w") as f:
+            json.dump(clock, f, indent=1)
+        print(f"  Lệch đồng hồ server - client: {clock['after']['offset_s'] * 1000:.2f} ms")
 
-    # iperf3 test
-    with open(run_dir / "iperf_client.json", "w") as f:
-        print(f"Chạy: {' '.join(iperf_cmd)}")
-        subprocess.run(iperf_cmd, stdout=f, stderr=subprocess.STDOUT)
+    if args.ping == "sequential":
+        ping_test(run_dir)
+    if args.rr_probe == "alone":
+        rr_test(run_dir, args.rr_duration)
+    return status, attempt
 
-    # ping test
+def capacity_run(run_dir):
+    """
+    Tìm capacity UDP (luỹ thừa rồi nhị phân, tối đa --cap-trials lần thử ngắn) rồi ping.
+    Mỗi lần thử → probe_NN.json; kết quả → capacity.json. Trả về (status, số lần thử)
+    """
+    base_cmd = ["iperf3", "-c", args.server_ip, "-u", "-t", str(args.cap_trial)]
+    if args.direction == "sc":
+        base_cmd.append("-R")
+    elif args.direction == "bidir":
+        base_cmd.append("--bidir")
+
+    def probe(rate):
+        cmd = base_cmd + ["-b", f"{rate:.3f}M"]
+        status, doc = run_blocking(cmd, run_dir / f"probe_{len(probes_done) + 1:02d}.json")
+        res = udp_result(doc) if status == STATUS_OK else {**udp_result({}), "error": doc.get("error", status)}
+        probes_done.append(res)
+        print(f"  thử {len(probes_done):2d}: {rate:10.2f} Mbps → nhận {res['received_mbps']:10.2f} Mbps, "
+              f"loss {res['loss_pct']:.3f}%, jitter {res['jitter_ms']:.3f} ms")
+        time.sleep(1)  # server iperf3 -s -1 cần khởi động lại giữa các session
+        return res
+
+    probes_done = []
+    t, stop = start_monitor(run_dir, None)
+    counters = CounterSampler(args.iface, args.net_sample or None) if platform.system() == "Linux" else None
+    if counters:
+        counters.start()
+    capacity, probes = search_capacity(probe, args.cap_start, args.cap_max, args.loss_target,
+                                       args.jitter_target or None, args.cap_trials, args.cap_resolution)
+    stop_monitor(t, stop)
+    if counters:
+        counters.stop(run_dir / "net_counters.json")
+    write_capacity(run_dir / "capacity.json", capacity, probes, loss_target=args.loss_target,
+                   jitter_target=args.jitter_target or None, trial_seconds=args.cap_trial)
+    print(f"Capacity: {capacity:.2f} Mbps sau {len(probes)} lần thử")
+
+    if args.ping != "off":
+        ping_test(run_dir)
+    return (STATUS_OK if not math.isnan(capacity) else "no_capacity"), len(probes)
+
+def rr_test(run_dir, duration):
+    """Probe request/response → rr_probe.json (lỗi kết nối được ghi trong trường errors)"""
+    res = rr_probe.probe(args.server_ip, run_dir / "rr_probe.json", port=args.rr_port,
+                         proto=args.rr_proto, duration=duration)
+    print(f"  RR {args.rr_proto}: {res['tps']:.0f} giao dịch/s, p50 {res['rr_p50_ms']:.3f} ms, "
+          f"p99 {res['rr_p99_ms']:.3f} ms, p99.9 {res['rr_p999_ms']:.3f} ms")
+
+def ping_test(run_dir, window=None):
+    """
+    Ping --ping-count gói tới server → ping.log.
+    window (giây, ping concurrent): chỉ ping trong thời gian iperf3 chạy – tối đa window gói (1 gói/s)
+    và deadline -w window trên Linux, để không mẫu nào rơi vào lúc đường truyền đã hết tải
+    """
+    ping_flag = "-c" if platform.system() != "Windows" else "-n"
+    count = args.ping_count if window is None else max(1, min(args.ping_count, int(window)))
+    cmd = ["ping", ping_flag, str(count)]
+    if window is not None and platform.system() == "Linux":
+        cmd += ["-w", str(max(1, math.ceil(window)))]
     with open(run_dir / "ping.log", "w") as f:
-        subprocess.run(
-            ["ping", ping_flag, "100", args.server_ip],
-            stdout=f, stderr=subprocess.STDOUT
-        )
+        subprocess.run([*cmd, args.server_ip], stdout=f, stderr=subprocess.STDOUT)
 
 # ---------------- Meta -----------------
-def write_metadata(run_dir):
+def write_metadata(run_dir, **extra):
     """Lưu thông tin cấu hình test"""
     meta = {
         "role": args.role,
@@ -125,20 +316,89 @@ def write_metadata(run_dir):
         "platform": platform.system(),
         "repeat_index": str(run_dir.name),
         "qos": args.qos,
-        "direction": args.direction
+        "qos_profile": describe(QOS_PROFILE),
+        "direction": args.direction,
+        "omit": args.omit,
+        "mode": args.mode,
+        "rr_probe": args.rr_probe,
+        "clock_sync": args.clock_sync,
+        "env_backend": BACKEND.name,
+        "monitor": args.monitor,
+        "sample_period": args.sample_period,
+        "ping": args.ping,
+        **extra
     }
     with open(run_dir / "meta.txt", "w") as f:
         for k, v in meta.items():
             f.write(f"{k}={v}\n")
 
+def measure(run_dir, params, **meta):
+    """Một lần đo hoàn chỉnh (capacity hoặc TCP với params) + meta.txt; trả về Mbps của iperf3 (TCP)"""
+    run_dir.mkdir(parents=True, exist_ok=True)
+    if args.mode == "capacity":
+        status, attempts = capacity_run(run_dir)
+    else:
+        status, attempts = client_run(run_dir, params)
+        meta.update({f"param_{k}": v for k, v in params.items()})
+    write_metadata(run_dir, iperf_status=status, attempts=attempts, **meta)
+    time.sleep(3)
+    try:
+        with open(run_dir / "iperf_client.json") as f:
+            end = json.load(f).get("end", {})
+        return (end.get("sum_sent") or end.get("sum") or {}).get("bits_per_second", math.nan) / 1e6
+    except (OSError, ValueError, AttributeError):
+        return math.nan
+
+def qos_sweep(params):
+    """
+    Quét một tham số tc của profile --qos: --qos-initial điểm đều, sau đó mỗi điểm mới đặt vào
+    đoạn mà throughput thay đổi nhiều nhất (next_point) cho tới --qos-points điểm.
+    Mỗi điểm chạy --repeat lần (run_qKK_NN); tiến trình ghi vào qos_sweep.json.
+    """
+    if QOS_PROFILE is None:
+        sys.exit("--mode qos-sweep cần một profile có qdisc (vd --qos qos2)")
+    lo, hi = args.qos_range
+    queue = initial_points(lo, hi, args.qos_initial, args.qos_log)
+    points = []
+    while len(points) < args.qos_points:
+        x = queue.pop(0) if queue else next_point([p["x"] for p in points], [p["mbps"] for p in points],
+                                                  args.qos_log)
+        if x is None:
+            break
+        value = f"{x:.4g}{args.qos_unit}"
+        profile = with_overrides(QOS_PROFILE, {args.qos_param: value})
+        apply_qos(profile)
+        k = len(points) + 1
+        mbps = []
+        for i in range(1, args.repeat + 1):
+            print(f"\nĐiểm {k}/{args.qos_points} ({args.qos_param}={value}), lần {i}/{args.repeat}")
+            mbps.append(measure(BASE / f"run_q{k:02d}_{i:02d}", params, qos_param=args.qos_param,
+                                qos_value=value, qos_sweep_profile=describe(profile)))
+        ok = [m for m in mbps if m == m]
+        points.append({"x": x, "value": value, "mbps": sum(ok) / len(ok) if ok else math.nan, "runs": len(mbps)})
+        with open(BASE / "qos_sweep.json", "w") as f:
+            json.dump({"qos": args.qos, "param": args.qos_param, "unit": args.qos_unit,
+                       "log": args.qos_log, "points": points}, f, indent=1)
+    apply_qos(QOS_PROFILE)  # trả lại profile gốc
+    print(f"\nSweep QoS xong: {len(points)} điểm. Kết quả lưu tại {BASE.resolve()}")
+
 # ---------------- MAIN -----------------
 if args.role == "server":
-    apply_qos()
+    apply_qos(QOS_PROFILE)
     start_iperf_server_in_new_window()
+    if args.rr_probe != "off" or args.clock_sync:  # echo TCP/UDP cho rr_probe / clock_offset của client
+        threading.Thread(target=asyncio.run, args=(rr_probe.serve(port=args.rr_port),), daemon=True).start()
+    # CPU tích luỹ của các tiến trình iperf3 server (mỗi session một pid) → proc_usage.log
+    ProcessTreeSampler(period=1.0, name="iperf3", log_path=BASE / "proc_usage.log").start()
+    with open(BASE / "server_meta.txt", "w") as f:  # chu kỳ mẫu để aggregator cắt sys_usage.log theo session
+        f.write(f"sample_period={args.sample_period}\n")
     monitor(BASE, None)
 
 else:
-    apply_qos()
+    apply_qos(QOS_PROFILE)
+    USE_STREAM = not args.no_stream and supports_json_stream()
+    if not USE_STREAM:
+        print("iperf3 không hỗ trợ --json-stream: chỉ kiểm tra kết quả sau mỗi lần đo.")
 
     # Gợi ý hướng QoS
     if args.direction == "cs":
@@ -148,18 +408,27 @@ else:
     elif args.direction == "bidir":
         print("QoS nên áp tại cả CLIENT và SERVER (mô phỏng WAN).")
 
-    for i in range(1, args.repeat + 1):
-        run_dir = BASE / f"run_{i:02d}"
-        run_dir.mkdir(parents=True, exist_ok=True)
-        print(f"\nBắt đầu lần đo {i}/{args.repeat}: {run_dir}")
+    params = {"streams": args.streams, "window": args.window, "blocklen": args.blocklen,
+              "zerocopy": int(args.zerocopy), "affinity": args.affinity}
+    if args.mode == "qos-sweep":
+        qos_sweep(params)
+        sys.exit(0)
 
-        t = threading.Thread(target=monitor, args=(run_dir, args.duration), daemon=True)
-        t.start()
-        client_run(run_dir)
-        t.join()
+    # Kế hoạch đo: (tên run, tham số). Sweep xen kẽ các cấu hình trong mỗi vòng lặp lại
+    # để trôi dạt của môi trường không dồn vào một cấu hình.
+    if args.mode == "sweep":
+        grid = sweep_grid(args.sweep_streams, args.sweep_window, args.sweep_blocklen,
+                          args.sweep_zerocopy, args.sweep_affinity)
+        plan = [(f"run_{i:02d}_cfg{c:02d}", cfg)
+                for i in range(1, args.repeat + 1) for c, cfg in enumerate(grid, 1)]
+        print(f"Sweep {len(grid)} cấu hình × {args.repeat} lần ≈ "
+              f"{len(plan) * (args.duration + args.omit + args.ping_count + 5) / 60:.0f} phút")  # + ping, nghỉ 3 s
+    else:
+        plan = [(f"run_{i:02d}", params) for i in range(1, args.repeat + 1)]
 
-        write_metadata(run_dir)
-        print(f"Hoàn tất lần đo {i}/{args.repeat}")
-        time.sleep(3)
+    for n, (name, cfg) in enumerate(plan, 1):
+        print(f"\nBắt đầu lần đo {n}/{len(plan)}: {BASE / name}")
+        measure(BASE / name, cfg)
+        print(f"Hoàn tất lần đo {n}/{len(plan)}")
 
-    print(f"\nHoàn thành {args.repeat} lần đo. Kết quả lưu tại {BASE.resolve()}")
+    print(f"\nHoàn thành {len(plan)} lần đo. Kết quả lưu tại {BASE.resolve()}")
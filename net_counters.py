@@ -0,0 +1,183 @@
+# net_counters.py
+# ------------------------------------------
+# Bộ đếm NIC / kernel cho từng lần đo (Linux)
+# - /sys/class/net/<iface>/statistics/* (dự phòng: /proc/net/dev)
+# - /proc/net/snmp: Tcp, Udp
+# - tc -s qdisc show dev <iface> (qdisc mà apply_qos cài: tbf / netem)
+# Harness chụp trước/sau (và tuỳ chọn mỗi giây) → net_counters.json;
+# aggregator dùng derive_metrics() để tính pps, drops, backlog, overlimits, retrans.
+# Chỉ dùng thư viện chuẩn để chạy được trên mọi máy đo.
+# ------------------------------------------
+
+import json, re, subprocess, threading, time
+from pathlib import Path
+
+DEV_FIELDS = ["rx_bytes", "rx_packets", "rx_errors", "rx_dropped",
+              "tx_bytes", "tx_packets", "tx_errors", "tx_dropped"]
+QDISC_FIELDS = ["bytes", "packets", "drops", "overlimits", "requeues", "backlog", "qlen"]
+
+
+# ---------------- ĐỌC BỘ ĐẾM -----------------
+def read_dev(iface):
+    """Bộ đếm interface: ưu tiên sysfs, dự phòng /proc/net/dev"""
+    stats_dir = Path("/sys/class/net") / iface / "statistics"
+    if stats_dir.exists():
+        out = {}
+        for f in DEV_FIELDS:
+            try:
+                out[f] = int((stats_dir / f).read_text())
+            except (OSError, ValueError):
+                pass
+        return out
+    try:
+        for line in Path("/proc/net/dev").read_text().splitlines():
+            name, _, rest = line.partition(":")
+            if name.strip() == iface:
+                v = [int(x) for x in rest.split()]
+                return dict(zip(DEV_FIELDS, [v[0], v[1], v[2], v[3], v[8], v[9], v[10], v[11]]))
+    except OSError:
+        pass
+    return {}
+
+
+def read_snmp():
+    """Bộ đếm Tcp/Udp trong /proc/net/snmp (dòng tên cột + dòng giá trị)"""
+    out = {}
+    try:
+        lines = Path("/proc/net/snmp").read_text().splitlines()
+    except OSError:
+        return out
+    for head, vals in zip(lines[::2], lines[1::2]):
+        proto, _, names = head.partition(":")
+        if proto in ("Tcp", "Udp"):
+            out[proto] = dict(zip(names.split(), (int(x) for x in vals.partition(":")[2].split())))
+    return out
+
+
+def _size(text):
+    """'12Kb' / '3p' / '1500b' → số nguyên (iproute2 dùng cơ số 1024)"""
+    m = re.match(r"(\d+)([KMG]?)", text)
+    if not m:
+        return 0
+    return int(m.group(1)) * {"": 1, "K": 1024, "M": 1024 ** 2, "G": 1024 ** 3}[m.group(2)]
+
+
+def parse_tc_text(text):
+    """Dự phòng khi iproute2 không có -j: đọc 'Sent ... (dropped, overlimits requeues)' và 'backlog'"""
+    qdiscs = []
+    for block in re.split(r"\n(?=qdisc )", text.strip()):
+        m = re.match(r"qdisc (\S+) (\S+)", block)
+        if not m:
+            continue
+        q = {"kind": m.group(1), "handle": m.group(2)}
+        s = re.search(r"Sent (\d+) bytes (\d+) pkt \(dropped (\d+), overlimits (\d+) requeues (\d+)\)", block)
+        if s:
+            q.update(zip(["bytes", "packets", "drops", "overlimits", "requeues"], map(int, s.groups())))
+        b = re.search(r"backlog (\S+) (\S+)", block)
+        if b:
+            q["backlog"], q["qlen"] = _size(b.group(1)), _size(b.group(2))
+        qdiscs.append(q)
+    return qdiscs
+
+
+def read_qdisc(iface):
+    """Thống kê qdisc của iface (tc -s -j, dự phòng dạng text)"""
+    try:
+        out = subprocess.run(["tc", "-s", "-j", "qdisc", "show", "dev", iface],
+                             capture_output=True, text=True, timeout=5)
+        if out.returncode == 0 and out.stdout.strip().startswith("["):
+            return [{k: q.get(k) for k in ["kind", "handle", *QDISC_FIELDS] if k in q}
+                    for q in json.loads(out.stdout)]
+        out = subprocess.run(["tc", "-s", "qdisc", "show", "dev", iface],
+                             capture_output=True, text=True, timeout=5)
+        return parse_tc_text(out.stdout) if out.returncode == 0 else []
+    except (OSError, subprocess.SubprocessError, ValueError):
+        return []
+
+
+def snapshot(iface):
+    return {"time": time.time(), "dev": read_dev(iface), "snmp": read_snmp(), "qdisc": read_qdisc(iface)}
+
+
+# ---------------- LẤY MẪU THEO GIÂY -----------------
+class CounterSampler:
+    """Chụp bộ đếm trước/sau, tuỳ chọn mỗi `period` giây trong lúc đo"""
+
+    def __init__(self, iface, period=None):
+        self.iface, self.period = iface, period
+        self.samples, self._stop = [], threading.Event()
+        self._thread = None
+
+    def start(self):
+        self.before = snapshot(self.iface)
+        if self.period:
+            self._thread = threading.Thread(target=self._loop, daemon=True)
+            self._thread.start()
+
+    def _loop(self):
+        while not self._stop.wait(self.period):
+            self.samples.append(snapshot(self.iface))
+
+    def stop(self, out_path):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+        doc = {"iface": self.iface, "before": self.before, "after": snapshot(self.iface),
+               "samples": self.samples}
+        with open(out_path, "w") as f:
+            json.dump(doc, f, indent=1)
+        return doc
+
+
+# ---------------- SUY RA CHỈ SỐ (AGGREGATOR) -----------------
+def _delta(a, b, key):
+    if key in a and key in b and a[key] is not None and b[key] is not None:
+        return b[key] - a[key]
+    return None
+
+
+def derive_metrics(doc):
+    """Từ net_counters.json → pps, drops, qdisc backlog/overlimits, TCP retrans"""
+    before, after = doc.get("before", {}), doc.get("after", {})
+    dt = after.get("time", 0) - before.get("time", 0)
+    out = {}
+    if dt <= 0:
+        return out
+
+    dev_a, dev_b = before.get("dev", {}), after.get("dev", {})
+    for side in ("rx", "tx"):
+        d = _delta(dev_a, dev_b, f"{side}_packets")
+        if d is not None:
+            out[f"nic_{side}_pps"] = d / dt
+        drops = _delta(dev_a, dev_b, f"{side}_dropped")
+        if drops is not None:
+            out[f"nic_{side}_drops"] = drops
+
+    tcp_a, tcp_b = before.get("snmp", {}).get("Tcp", {}), after.get("snmp", {}).get("Tcp", {})
+    retrans, out_segs = _delta(tcp_a, tcp_b, "RetransSegs"), _delta(tcp_a, tcp_b, "OutSegs")
+    if retrans is not None:
+        out["tcp_retrans_segs"] = retrans
+        if out_segs:
+            out["tcp_retrans_pct"] = retrans / out_segs * 100
+    udp_a, udp_b = before.get("snmp", {}).get("Udp", {}), after.get("snmp", {}).get("Udp", {})
+    for key, name in [("RcvbufErrors", "udp_rcvbuf_errors"), ("InErrors", "udp_in_errors")]:
+        d = _delta(udp_a, udp_b, key)
+        if d is not None:
+            out[name] = d
+
+    # qdisc gốc (apply_qos cài ở root); so khớp theo handle
+    q_a = {q.get("handle"): q for q in before.get("qdisc", [])}
+    for q in after.get("qdisc", []):
+        prev = q_a.get(q.get("handle"))
+        if prev is None or prev.get("kind") != q.get("kind"):
+            continue
+        out["qdisc_kind"] = q.get("kind")
+        for key in ("drops", "overlimits"):
+            d = _delta(prev, q, key)
+            if d is not None:
+                out[f"qdisc_{key}"] = d
+        backlogs = [s.get("backlog", 0) for smp in doc.get("samples", [])
+                    for s in smp.get("qdisc", []) if s.get("handle") == q.get("handle")]
+        out["qdisc_backlog_max"] = max(backlogs + [q.get("backlog") or 0])
+        break
+    return out
@@ -0,0 +1,186 @@
+# plot_timeseries.py
+# ------------------------------------------
+# Throughput iperf3 theo từng giây của mọi lần lặp trong một ô (env, nic_mode, qos, direction):
+# đường trung vị + dải p10–p90 và min–max qua các run, RTT khi có tải vẽ chồng ở trục phải.
+# Thấy được các lần tụt / stall và pha tăng tốc dưới netem mà biểu đồ cột trung bình che mất.
+# - Đầu vào: timeline_client_series.csv (runs/aggregate_results.py, xem timeline.py)
+#   + summary_client_clean.csv (run hợp lệ, nhãn đã chuẩn hoá bởi analyze_summary_full.py)
+# - Interval rơi vào cùng một giây (làm tròn t) của một run được gộp bằng trung bình có trọng số
+#   theo độ dài interval (dt) trước khi xếp vào khối, không interval nào bị ghi đè
+# - Chuỗi của mọi run được xếp vào một khối (ô × run × giây); phân vị của tất cả các ô
+#   tính trong một lượt vectorised (sort theo trục run, nội suy theo số run có mặt ở từng giây)
+#
+#   python plot_timeseries.py
+#   python plot_timeseries.py --env DOCKER --out plots_timeseries
+# ------------------------------------------
+
+import argparse
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+
+SERIES_FILE = "timeline_client_series.csv"
+RUNS_FILE = "summary_client_clean.csv"
+CELL_KEYS = ["env", "nic_mode", "qos", "direction"]
+QUANTILES = [0, 10, 50, 90, 100]  # min, p10, trung vị, p90, max
+
+
+# ---------------- MA TRẬN (run × giây) -----------------
+def per_second(series, cols=("mbps", "rtt_ms")):
+    """
+    Một dòng mỗi (path, giây làm tròn): trung bình các interval trong giây đó, trọng số = dt
+    (file cũ không có dt → trọng số đều); NaN không tính vào trung bình của cột
+    """
+    sec = np.rint(series["t"].to_numpy(float)).astype(int)
+    w = series["dt"].to_numpy(float) if "dt" in series.columns else np.ones(len(series))
+    w = np.where(np.isfinite(w) & (w > 0), w, 1e-9)  # interval rỗng cuối test: gần như không đóng góp
+    parts = {"path": series["path"].to_numpy(), "sec": sec}
+    for col in cols:
+        x = series[col].to_numpy(float)
+        has = ~np.isnan(x)
+        parts[f"{col}_num"] = np.where(has, x * w, 0.0)
+        parts[f"{col}_den"] = np.where(has, w, 0.0)
+    g = pd.DataFrame(parts).groupby(["path", "sec"], sort=False).sum().reset_index()
+    for col in cols:
+        with np.errstate(invalid="ignore"):
+            g[col] = g.pop(f"{col}_num") / g.pop(f"{col}_den")
+    return g
+
+
+def series_cube(series, runs, keys=CELL_KEYS):
+    """
+    Xếp chuỗi theo giây thành khối (ô × run × giây) cho mbps và rtt_ms, ô trống là NaN.
+    Trả về (cells: DataFrame keys + runs, seconds, {"mbps": cube, "rtt_ms": cube})
+    """
+    labels = runs[keys + ["path"]].drop_duplicates("path")
+    s = series[series["path"].isin(labels["path"])]
+    if s.empty:
+        return pd.DataFrame(columns=keys + ["runs"]), np.empty(0, int), {}
+    s = per_second(s).merge(labels, on="path", how="inner")
+    sec = s["sec"].to_numpy()
+    seconds = np.arange(sec.min(), sec.max() + 1)
+
+    run_tab = s[keys + ["path"]].drop_duplicates("path")
+    run_tab = run_tab.assign(cell=run_tab.groupby(keys, sort=True).ngroup().to_numpy())
+    run_tab["slot"] = run_tab.groupby("cell").cumcount()
+    cells = (run_tab.groupby("cell").agg(**{k: (k, "first") for k in keys}, runs=("path", "size"))
+             .reset_index(drop=True))
+
+    pos = s[["path"]].merge(run_tab[["path", "cell", "slot"]], on="path", how="left")
+    ci, ri, ti = pos["cell"].to_numpy(), pos["slot"].to_numpy(), sec - seconds[0]
+    shape = (len(cells), int(cells["runs"].max()), len(seconds))
+    cubes = {}
+    for col in ["mbps", "rtt_ms"]:
+        cube = np.full(shape, np.nan)
+        cube[ci, ri, ti] = s[col].to_numpy(float)
+        cubes[col] = cube
+    return cells, seconds, cubes
+
+
+def band_percentiles(cube, qs=QUANTILES):
+    """
+    Phân vị theo trục run (axis=1) cho mọi ô và mọi giây cùng lúc: (len(qs) × ô × giây).
+    Nội suy tuyến tính như np.percentile, chỉ trên các run có mẫu ở giây đó (NaN bị bỏ qua);
+    ô/giây không có run nào → NaN
+    """
+    ordered = np.sort(cube, axis=1)  # NaN dồn về cuối
+    n = np.sum(~np.isnan(cube), axis=1)  # (ô × giây)
+    out = np.full((len(qs),) + n.shape, np.nan)
+    top = np.maximum(n - 1, 0)
+    for i, q in enumerate(qs):
+        pos = q / 100 * top
+        lo = np.floor(pos).astype(int)
+        hi = np.minimum(lo + 1, top)
+        frac = pos - lo
+        v_lo = np.take_along_axis(ordered, lo[:, None, :], axis=1)[:, 0, :]
+        v_hi = np.take_along_axis(ordered, hi[:, None, :], axis=1)[:, 0, :]
+        out[i] = np.where(n > 0, v_lo + (v_hi - v_lo) * frac, np.nan)
+    return out, n
+
+
+def bands_frame(cells, seconds, mbps_bands, rtt_bands, n):
+    """Bảng dài (ô × giây): n_runs, mbps_min/p10/p50/p90/max, rtt_p10/p50/p90"""
+    names = ["min", "p10", "p50", "p90", "max"]
+    idx = np.repeat(np.arange(len(cells)), len(seconds))
+    out = cells.iloc[idx][CELL_KEYS].reset_index(drop=True)
+    out["t"] = np.tile(seconds, len(cells))
+    out["n_runs"] = n.ravel()
+    for name, band in zip(names, mbps_bands):
+        out[f"mbps_{name}"] = band.ravel()
+    for name, band in zip(names, rtt_bands):
+        if name in ("p10", "p50", "p90"):
+            out[f"rtt_{name}_ms"] = band.ravel()
+    return out[out["n_runs"] > 0].reset_index(drop=True)
+
+
+# ---------------- VẼ -----------------
+def draw_cell(fig, ax, ax_rtt, seconds, mbps, rtt, title):
+    """Vẽ một ô lên figure dùng lại (xoá trục cũ), mbps/rtt: (len(QUANTILES) × giây)"""
+    ax.clear(); ax_rtt.clear()
+    lo, p10, p50, p90, hi = mbps
+    ax.fill_between(seconds, lo, hi, color="tab:blue", alpha=0.12, linewidth=0, label="min–max")
+    ax.fill_between(seconds, p10, p90, color="tab:blue", alpha=0.3, linewidth=0, label="p10–p90")
+    ax.plot(seconds, p50, color="tab:blue", linewidth=1.8, label="trung vị")
+    ax.set_xlabel("giây"); ax.set_ylabel("Mbps"); ax.set_ylim(bottom=0)
+    ax.set_title(title)
+
+    ax_rtt.yaxis.set_label_position("right"); ax_rtt.yaxis.tick_right()
+    if np.isfinite(rtt[2]).any():
+        ax_rtt.fill_between(seconds, rtt[1], rtt[3], color="tab:red", alpha=0.12, linewidth=0)
+        ax_rtt.plot(seconds, rtt[2], color="tab:red", linewidth=1.2, linestyle="--", label="RTT trung vị")
+        ax_rtt.set_ylabel("RTT khi có tải (ms)"); ax_rtt.set_ylim(bottom=0)
+    else:
+        ax_rtt.set_yticks([])
+
+    handles = [h for a in (ax, ax_rtt) for h in a.get_legend_handles_labels()[0]]
+    ax.legend(handles=handles, loc="lower right", fontsize=8, frameon=True)
+    fig.tight_layout()
+
+
+def cell_name(row):
+    parts = [row[k] for k in CELL_KEYS if k != "direction" or row[k] != "none"]
+    return "_".join(str(p).replace(" ", "") for p in parts)
+
+
+# ---------------- MAIN -----------------
+def main():
+    parser = argparse.ArgumentParser(description="Throughput/RTT theo giây với dải phân vị qua các run")
+    parser.add_argument("--series", default=SERIES_FILE)
+    parser.add_argument("--runs", default=RUNS_FILE, help="Bảng run hợp lệ (nhãn env/nic_mode/qos/direction)")
+    parser.add_argument("--env", nargs="+", help="Chỉ vẽ các env này")
+    parser.add_argument("--out", default="plots_timeseries")
+    args = parser.parse_args()
+
+    runs = pd.read_csv(args.runs)
+    if args.env:
+        runs = runs[runs["env"].isin(args.env)]
+    series = pd.read_csv(args.series)
+    cells, seconds, cubes = series_cube(series, runs)
+    if cells.empty:
+        print("Không có run nào có chuỗi theo giây")
+        return
+
+    mbps_bands, n = band_percentiles(cubes["mbps"])
+    rtt_bands, _ = band_percentiles(cubes["rtt_ms"])
+    bands_frame(cells, seconds, mbps_bands, rtt_bands, n).to_csv("summary_timeseries_bands.csv", index=False)
+
+    out_dir = Path(args.out)
+    out_dir.mkdir(exist_ok=True)
+    fig, ax = plt.subplots(figsize=(10, 4.5))
+    ax_rtt = ax.twinx()
+    for i, row in cells.iterrows():
+        keep = n[i] > 0
+        title = f"{' / '.join(str(row[k]) for k in CELL_KEYS)} – {row['runs']} run"
+        draw_cell(fig, ax, ax_rtt, seconds[keep], mbps_bands[:, i, keep], rtt_bands[:, i, keep], title)
+        fig.savefig(out_dir / f"ts_{cell_name(row)}.png", dpi=110)
+    plt.close(fig)
+    print(f"Vẽ chuỗi theo giây của {len(cells)} ô ({int(cells['runs'].sum())} run) → {out_dir}/, "
+          f"summary_timeseries_bands.csv")
+
+
+if __name__ == "__main__":
+    main()
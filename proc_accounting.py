@@ -0,0 +1,105 @@
+# proc_accounting.py
+# ------------------------------------------
+# Theo dõi CPU/RSS/context switch của riêng cây tiến trình iperf3
+# (psutil.cpu_percent của host bị lẫn tải nền trên VM/K8S dùng chung)
+# - Client: theo dõi iperf3 do harness khởi chạy (pid gốc + con cháu)
+# - Server: iperf3 -s -1 khởi động lại mỗi session → tìm theo tên tiến trình
+# Giá trị cuối của mỗi pid được giữ lại, tổng các pid là số tích luỹ (tăng dần).
+# Client: rusage lúc thu tiến trình (iperf_runner on_exit → finish) thay cho mẫu cuối của pid gốc,
+# để không mất CPU tiêu thụ sau mẫu cuối cùng.
+# ------------------------------------------
+
+import json, threading, time
+import psutil
+
+
+class ProcessTreeSampler:
+    """Lấy mẫu user/system CPU-seconds, context switch và RSS mỗi `period` giây"""
+
+    def __init__(self, period=0.5, name=None, log_path=None):
+        self.period, self.name, self.log_path = period, name, log_path
+        self.root = None
+        self.last = {}  # pid → (user, system, ctx_vol, ctx_invol)
+        self.rss_max = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self, pid=None):
+        if pid is not None:
+            try:
+                self.root = psutil.Process(pid)
+            except psutil.Error:
+                return
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+
+    def _procs(self):
+        if self.root is not None:
+            try:
+                return [self.root] + self.root.children(recursive=True)
+            except psutil.Error:
+                return []
+        return [p for p in psutil.process_iter(["name"]) if self.name and self.name in (p.info["name"] or "")]
+
+    def sample(self):
+        for p in self._procs():
+            try:
+                with p.oneshot():
+                    ct, cs, rss = p.cpu_times(), p.num_ctx_switches(), p.memory_info().rss
+            except psutil.Error:
+                continue
+            self.last[p.pid] = (ct.user, ct.system, cs.voluntary, cs.involuntary)
+            self.rss_max = max(self.rss_max, rss)
+        return self.summary()
+
+    def _loop(self):
+        log = open(self.log_path, "a") if self.log_path else None
+        try:
+            if log and log.tell() == 0:
+                log.write("timestamp,cpu_user_s,cpu_system_s,ctx_voluntary,ctx_involuntary,rss_max_mb,host_cpus\n")
+            host_cpus = psutil.cpu_count()
+            while True:
+                s = self.sample()
+                if log:
+                    log.write(f"{time.time()},{s['cpu_user_s']:.3f},{s['cpu_system_s']:.3f},"
+                              f"{s['ctx_voluntary']},{s['ctx_involuntary']},{s['rss_max_mb']:.2f},{host_cpus}\n")
+                    log.flush()
+                if self._stop.wait(self.period):
+                    break
+        finally:
+            if log:
+                log.close()
+
+    def summary(self):
+        vals = list(self.last.values())
+        return {
+            "cpu_user_s": sum(v[0] for v in vals),
+            "cpu_system_s": sum(v[1] for v in vals),
+            "ctx_voluntary": sum(v[2] for v in vals),
+            "ctx_involuntary": sum(v[3] for v in vals),
+            "rss_max_mb": self.rss_max / (1024 * 1024),
+            "n_procs": len(vals),
+        }
+
+    def finish(self, usage):
+        """Dừng lấy mẫu, lấy số cuối của pid gốc từ rusage khi thu tiến trình (os.wait4)"""
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+        if self.root is None:
+            return
+        prev = self.last.get(self.root.pid, (0.0, 0.0, 0, 0))
+        self.last[self.root.pid] = (max(prev[0], usage.ru_utime), max(prev[1], usage.ru_stime),
+                                    max(prev[2], usage.ru_nvcsw), max(prev[3], usage.ru_nivcsw))
+        self.rss_max = max(self.rss_max, usage.ru_maxrss * 1024)  # Linux: ru_maxrss tính bằng KB
+
+    def stop(self, out_path=None):
+        """Dừng lấy mẫu; ghi tóm tắt (kèm số CPU host để quy đổi số liệu host-wide) nếu có out_path"""
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+        doc = {**self.summary(), "host_cpus": psutil.cpu_count()}
+        if out_path:
+            with open(out_path, "w") as f:
+                json.dump(doc, f, indent=1)
+        return doc
@@ -0,0 +1,151 @@
+# qos_profiles.py
+# ------------------------------------------
+# Profile QoS (tc qdisc) khai báo trong qos_profiles.json thay cho 3 lệnh f-string cố định
+# - Mỗi profile: {"qdisc": "<tbf|netem|...>", "params": {"<tên>": "<giá trị>" | [nhiều token]}};
+#   null = không áp QoS. Tham số tc tuỳ ý, giữ nguyên thứ tự trong file.
+# - Áp dụng bằng danh sách đối số (không qua shell), đọc lại `tc -s qdisc show`
+#   để kiểm tra qdisc gốc đúng loại và các giá trị tc in ra khớp với profile
+# - Lấy mẫu thích nghi cho sweep QoS: điểm mới đặt vào đoạn mà đường
+#   throughput–tham số thay đổi nhiều nhất (độ dài đoạn sau chuẩn hoá hai trục)
+# Chỉ dùng thư viện chuẩn (chạy trên máy đo).
+# ------------------------------------------
+
+import json, math, re, subprocess
+from pathlib import Path
+
+PROFILE_FILE = Path(__file__).resolve().parent / "qos_profiles.json"
+
+# tc in một số tham số dưới tên ngắn (tbf latency → lat)
+PRINTED_NAME = {"latency": "lat"}
+UNITS = {"": 1, "%": 1, "us": 1e-6, "usec": 1e-6, "ms": 1e-3, "msec": 1e-3, "s": 1, "sec": 1,
+         "bit": 1, "kbit": 1e3, "mbit": 1e6, "gbit": 1e9, "bps": 8, "kbps": 8e3, "mbps": 8e6, "gbps": 8e9}
+
+
+# ---------------- PROFILE -----------------
+def load_profiles(path=PROFILE_FILE):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def parse_overrides(items):
+    """["delay=50ms", "loss=2%"] → {"delay": "50ms", "loss": "2%"}; nhiều token cách nhau bởi dấu cách"""
+    out = {}
+    for item in items or []:
+        k, sep, v = item.partition("=")
+        if not sep:
+            raise ValueError(f"Tham số QoS phải có dạng tên=giá_trị, nhận {item!r}")
+        out[k.strip()] = v.split() if " " in v.strip() else v.strip()
+    return out
+
+
+def with_overrides(profile, overrides):
+    """Bản sao profile với params ghi đè (profile None không ghi đè được)"""
+    if not overrides:
+        return profile
+    if profile is None:
+        raise ValueError("Không thể ghi đè tham số cho profile không áp QoS (noqos)")
+    return {**profile, "params": {**profile.get("params", {}), **overrides}}
+
+
+def tc_add_args(iface, profile):
+    """Profile → ["tc", "qdisc", "add", "dev", iface, "root", kind, tên, giá trị, ...]"""
+    args = ["tc", "qdisc", "add", "dev", iface, "root", profile["qdisc"]]
+    for name, value in profile.get("params", {}).items():
+        args += [name, *(value if isinstance(value, list) else [str(value)])]
+    return args
+
+
+def describe(profile):
+    """Mô tả ngắn gọn để in / ghi meta, vd "netem delay 25ms loss 1%" """
+    return "none" if profile is None else " ".join(tc_add_args("", profile)[6:])
+
+
+# ---------------- ÁP DỤNG + KIỂM TRA -----------------
+def to_number(text):
+    """'25ms' → 0.025, '40Mbit' → 4e7, '1%' → 1.0; không đọc được → None"""
+    m = re.fullmatch(r"([\d.]+)\s*([a-zA-Z%]*)", str(text).strip())
+    if not m or m.group(2).lower() not in UNITS:
+        return None
+    return float(m.group(1)) * UNITS[m.group(2).lower()]
+
+
+def root_qdisc_line(text):
+    """Dòng mô tả qdisc gốc trong `tc qdisc show`"""
+    for line in text.splitlines():
+        if line.startswith("qdisc ") and " root " in line:
+            return line
+    return ""
+
+
+def verify_profile(iface, profile):
+    """
+    Đọc lại `tc -s qdisc show dev <iface>`: qdisc gốc phải đúng loại; tham số nào tc in lại
+    (delay, loss, rate, lat, limit...) phải khớp giá trị profile trong sai số 1%.
+    Trả về {"ok", "root", "mismatch", "readback"}.
+    """
+    out = subprocess.run(["tc", "-s", "qdisc", "show", "dev", iface], capture_output=True, text=True, timeout=5)
+    line = root_qdisc_line(out.stdout)
+    tokens = line.split()
+    kind = tokens[1] if len(tokens) > 1 else None
+    mismatch = []
+    if profile is None:
+        ok = kind not in ("tbf", "netem", "htb", "hfsc")
+    else:
+        ok = kind == profile["qdisc"]
+        for name, value in profile.get("params", {}).items():
+            printed = PRINTED_NAME.get(name, name)
+            if printed not in tokens[:-1]:
+                continue  # tc không in lại tham số này (vd burst đổi đơn vị)
+            want = to_number(value[0] if isinstance(value, list) else value)
+            got = to_number(tokens[tokens.index(printed) + 1])
+            if want is not None and got is not None and abs(got - want) > 0.01 * max(abs(want), 1e-12):
+                mismatch.append(f"{name}: muốn {value}, tc báo {tokens[tokens.index(printed) + 1]}")
+        ok = ok and not mismatch
+    return {"ok": ok, "root": line, "mismatch": mismatch, "readback": out.stdout}
+
+
+def apply_profile(iface, profile, sudo=()):
+    """Xoá qdisc gốc cũ, cài profile (nếu có) rồi kiểm tra lại; lỗi tc → RuntimeError"""
+    subprocess.run([*sudo, "tc", "qdisc", "del", "dev", iface, "root"],
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    if profile is not None:
+        res = subprocess.run([*sudo, *tc_add_args(iface, profile)], capture_output=True, text=True)
+        if res.returncode != 0:
+            raise RuntimeError(f"tc lỗi ({res.returncode}): {res.stderr.strip()}")
+    check = verify_profile(iface, profile)
+    if not check["ok"]:
+        raise RuntimeError(f"qdisc sau khi áp không khớp profile: {check['root'] or '(trống)'} "
+                           f"{'; '.join(check['mismatch'])}")
+    return check
+
+
+# ---------------- LẤY MẪU THÍCH NGHI -----------------
+def initial_points(lo, hi, n, log=False):
+    """n điểm đều (tuyến tính hoặc log) trên [lo, hi]"""
+    if n < 2:
+        return [lo]
+    if log:
+        a, b = math.log(lo), math.log(hi)
+        return [math.exp(a + (b - a) * i / (n - 1)) for i in range(n)]
+    return [lo + (hi - lo) * i / (n - 1) for i in range(n)]
+
+
+def next_point(xs, ys, log=False):
+    """
+    Điểm mẫu tiếp theo: trung điểm (hình học nếu log) của đoạn có độ dài lớn nhất
+    trên đường (x, y) đã chuẩn hoá về [0, 1] → dồn điểm vào chỗ đường cong dốc/gãy.
+    """
+    pts = sorted((x, y) for x, y in zip(xs, ys) if y == y)  # bỏ điểm NaN
+    if len(pts) < 2:
+        return None
+    tx = [math.log(x) if log else x for x, _ in pts]
+    x_span = (tx[-1] - tx[0]) or 1.0
+    y_vals = [y for _, y in pts]
+    y_span = (max(y_vals) - min(y_vals)) or 1.0
+    best, best_len = None, -1.0
+    for i in range(len(pts) - 1):
+        seg = math.hypot((tx[i + 1] - tx[i]) / x_span, (pts[i + 1][1] - pts[i][1]) / y_span)
+        if seg > best_len:
+            best, best_len = i, seg
+    mid = (tx[best] + tx[best + 1]) / 2
+    return math.exp(mid) if log else mid
@@ -0,0 +1,257 @@
+# rr_probe.py
+# ------------------------------------------
+# Probe độ trễ request/response kiểu TCP_RR / UDP_RR (asyncio, chỉ thư viện chuẩn)
+# thay cho ping ICMP 1 Hz: ICMP đi đường khác TCP/UDP qua NAT của Docker/K8S,
+# và 100 mẫu không đủ để ước lượng p99.
+# - server: echo TCP (TCP_NODELAY) + UDP trên cùng một port
+# - client: mỗi kết nối gửi `size` byte, chờ đủ `size` byte trả về, lặp trong `duration` giây
+#   (--concurrency kết nối song song); UDP có số thứ tự, quá timeout tính là mất
+# Độ trễ ghi vào LogHistogram (bucket log, sai số tương đối ~1%) → gộp được p50/p99/p99.9
+# giữa các run mà không cần giữ mẫu thô.
+# Echo UDP cũng trả lời gói "TIME" bằng đồng hồ server → clock_offset() ước lượng
+# lệch đồng hồ client/server kiểu NTP (lấy mẫu có round-trip nhỏ nhất).
+#
+#   python rr_probe.py server --port 5301
+#   python rr_probe.py client --host <ip> --port 5301 --proto tcp --duration 10 --out rr_probe.json
+# ------------------------------------------
+
+import argparse, asyncio, json, math, socket, struct, time
+
+DEFAULT_PORT = 5301
+TIME_MAGIC = b"TIME"
+
+
+# ---------------- HISTOGRAM -----------------
+class LogHistogram:
+    """
+    Histogram bucket log kiểu HDR: giá trị v (µs, >= 1) rơi vào bucket ceil(log(v) / log(1 + precision)).
+    Bucket cố định theo precision → hai histogram cùng precision gộp chính xác bằng cộng số đếm.
+    """
+
+    def __init__(self, precision=0.01):
+        self.precision = precision
+        self._log_base = math.log1p(precision)
+        self.counts = {}
+        self.count, self.total = 0, 0.0
+        self.min, self.max = math.inf, 0.0
+
+    def record(self, value_us):
+        v = max(value_us, 1.0)
+        idx = math.ceil(math.log(v) / self._log_base)
+        self.counts[idx] = self.counts.get(idx, 0) + 1
+        self.count += 1
+        self.total += v
+        self.min, self.max = min(self.min, v), max(self.max, v)
+
+    def merge(self, other):
+        if other.precision != self.precision:
+            raise ValueError("Chỉ gộp được histogram cùng precision")
+        for idx, n in other.counts.items():
+            self.counts[idx] = self.counts.get(idx, 0) + n
+        self.count += other.count
+        self.total += other.total
+        self.min, self.max = min(self.min, other.min), max(self.max, other.max)
+        return self
+
+    def quantile(self, q):
+        """Cận trên của bucket chứa phân vị q (kẹp trong [min, max]); rỗng → NaN"""
+        if not self.count:
+            return math.nan
+        rank, seen = q * self.count, 0
+        for idx in sorted(self.counts):
+            seen += self.counts[idx]
+            if seen >= rank:
+                return min(max(math.exp(idx * self._log_base), self.min), self.max)
+        return self.max
+
+    def mean(self):
+        return self.total / self.count if self.count else math.nan
+
+    def to_dict(self):
+        return {"precision": self.precision, "count": self.count, "total": self.total,
+                "min": self.min if self.count else None, "max": self.max,
+                "counts": {str(k): v for k, v in sorted(self.counts.items())}}
+
+    @classmethod
+    def from_dict(cls, d):
+        h = cls(d.get("precision", 0.01))
+        h.counts = {int(k): v for k, v in d.get("counts", {}).items()}
+        h.count, h.total = d.get("count", 0), d.get("total", 0.0)
+        h.min = d["min"] if d.get("min") is not None else math.inf
+        h.max = d.get("max", 0.0)
+        return h
+
+    def summary(self, prefix="rr_"):
+        """p50/p99/p99.9/mean theo ms"""
+        return {f"{prefix}p50_ms": self.quantile(0.50) / 1000, f"{prefix}p99_ms": self.quantile(0.99) / 1000,
+                f"{prefix}p999_ms": self.quantile(0.999) / 1000, f"{prefix}mean_ms": self.mean() / 1000}
+
+
+# ---------------- SERVER -----------------
+class UdpEcho(asyncio.DatagramProtocol):
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        if data.startswith(TIME_MAGIC):  # t2 (nhận), t3 (gửi) theo đồng hồ server
+            t2 = time.time()
+            self.transport.sendto(data[:12] + struct.pack("!dd", t2, time.time()), addr)
+            return
+        self.transport.sendto(data, addr)
+
+
+async def _tcp_echo(reader, writer):
+    writer.get_extra_info("socket").setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    try:
+        while data := await reader.read(65536):
+            writer.write(data)
+            await writer.drain()
+    except ConnectionError:
+        pass
+    finally:
+        writer.close()
+
+
+async def serve(host="0.0.0.0", port=DEFAULT_PORT):
+    """Echo TCP + UDP trên cùng port, chạy đến khi bị huỷ"""
+    server = await asyncio.start_server(_tcp_echo, host, port)
+    loop = asyncio.get_running_loop()
+    transport, _ = await loop.create_datagram_endpoint(UdpEcho, local_addr=(host, port))
+    print(f"[RR] Echo TCP/UDP trên {host}:{port}")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        transport.close()
+
+
+# ---------------- CLIENT -----------------
+async def _tcp_worker(host, port, size, deadline, hist):
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.get_extra_info("socket").setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    payload = b"x" * size
+    try:
+        while time.monotonic() < deadline:
+            t0 = time.perf_counter_ns()
+            writer.write(payload)
+            await reader.readexactly(size)
+            hist.record((time.perf_counter_ns() - t0) / 1000)
+    finally:
+        writer.close()
+
+
+class _UdpClient(asyncio.DatagramProtocol):
+    def __init__(self):
+        self.waiting = {}  # seq → future
+
+    def datagram_received(self, data, addr):
+        fut = self.waiting.pop(struct.unpack_from("!Q", data)[0], None)
+        if fut and not fut.done():
+            fut.set_result(None)
+
+
+async def _udp_worker(host, port, size, deadline, hist, timeout, lost):
+    loop = asyncio.get_running_loop()
+    transport, proto = await loop.create_datagram_endpoint(_UdpClient, remote_addr=(host, port))
+    pad = b"x" * max(size - 8, 0)
+    seq = 0
+    try:
+        while time.monotonic() < deadline:
+            seq += 1
+            fut = loop.create_future()
+            proto.waiting[seq] = fut
+            t0 = time.perf_counter_ns()
+            transport.sendto(struct.pack("!Q", seq) + pad)
+            try:
+                await asyncio.wait_for(fut, timeout)
+                hist.record((time.perf_counter_ns() - t0) / 1000)
+            except asyncio.TimeoutError:
+                proto.waiting.pop(seq, None)
+                lost[0] += 1
+    finally:
+        transport.close()
+
+
+async def run_client(host, port=DEFAULT_PORT, proto="tcp", duration=10, size=64, concurrency=1, timeout=1.0):
+    """Chạy probe, trả về dict kết quả (kèm histogram dạng dict)"""
+    hist, lost = LogHistogram(), [0]
+    deadline = time.monotonic() + duration
+    start = time.time()
+    if proto == "tcp":
+        jobs = [_tcp_worker(host, port, size, deadline, hist) for _ in range(concurrency)]
+    else:
+        jobs = [_udp_worker(host, port, size, deadline, hist, timeout, lost) for _ in range(concurrency)]
+    results = await asyncio.gather(*jobs, return_exceptions=True)
+    errors = [repr(r) for r in results if isinstance(r, Exception)]
+    elapsed = time.time() - start
+    return {
+        "proto": proto, "size": size, "concurrency": concurrency, "start": start, "seconds": elapsed,
+        "transactions": hist.count, "tps": hist.count / elapsed if elapsed > 0 else math.nan,
+        "lost": lost[0], "errors": errors, **hist.summary(), "histogram": hist.to_dict(),
+    }
+
+
+def probe(host, out_path=None, **kwargs):
+    """Gọi đồng bộ (dùng được trong thread song song với iperf3); ghi JSON nếu có out_path"""
+    res = asyncio.run(run_client(host, **kwargs))
+    if out_path:
+        with open(out_path, "w") as f:
+            json.dump(res, f, indent=1)
+    return res
+
+
+# ---------------- CLOCK OFFSET -----------------
+def clock_offset(host, port=DEFAULT_PORT, samples=8, timeout=0.5):
+    """
+    Lệch đồng hồ kiểu NTP: offset = ((t2 - t1) + (t3 - t4)) / 2, delay = (t4 - t1) - (t3 - t2);
+    đồng hồ server ≈ đồng hồ client + offset. Lấy mẫu có delay nhỏ nhất (ít bị hàng đợi làm lệch).
+    Không có phản hồi → offset NaN.
+    """
+    best = {"offset_s": math.nan, "delay_s": math.nan, "samples": 0, "time": time.time()}
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        sock.settimeout(timeout)
+        for seq in range(samples):
+            t1 = time.time()
+            try:
+                sock.sendto(TIME_MAGIC + struct.pack("!Q", seq), (host, port))
+                data = sock.recv(64)
+            except OSError:
+                continue
+            t4 = time.time()
+            if len(data) < 28 or struct.unpack_from("!Q", data, 4)[0] != seq:
+                continue
+            t2, t3 = struct.unpack_from("!dd", data, 12)
+            delay = (t4 - t1) - (t3 - t2)
+            best["samples"] += 1
+            if not delay >= best["delay_s"]:  # NaN ban đầu → nhận mẫu đầu tiên
+                best.update(offset_s=((t2 - t1) + (t3 - t4)) / 2, delay_s=delay)
+    return best
+
+
+# ---------------- CLI -----------------
+def main():
+    parser = argparse.ArgumentParser(description="Probe độ trễ request/response TCP/UDP")
+    parser.add_argument("role", choices=["server", "client"])
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--proto", choices=["tcp", "udp"], default="tcp")
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--size", type=int, default=64, help="Kích thước request/response (byte)")
+    parser.add_argument("--concurrency", type=int, default=1, help="Số kết nối song song")
+    parser.add_argument("--out", default=None, help="File JSON kết quả (client)")
+    args = parser.parse_args()
+
+    if args.role == "server":
+        try:
+            asyncio.run(serve(args.host, args.port))
+        except KeyboardInterrupt:
+            pass
+        return
+    res = probe(args.host, args.out, port=args.port, proto=args.proto, duration=args.duration,
+                size=args.size, concurrency=args.concurrency)
+    print(f"{res['transactions']} giao dịch ({res['tps']:.0f}/s), p50 {res['rr_p50_ms']:.3f} ms, "
+          f"p99 {res['rr_p99_ms']:.3f} ms, p99.9 {res['rr_p999_ms']:.3f} ms, mất {res['lost']}")
+
+
+if __name__ == "__main__":
+    main()
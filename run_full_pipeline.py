@@ -52,6 +52,7 @@ def main():
     steps = [
         ("runs/aggregate_results.py", "Bước 1: Tổng hợp dữ liệu thô từ runs/"),
         ("analyze_summary_full.py", "Bước 2: Phân tích chi tiết và tạo grouped data"),
+        ("plot_timeseries.py", "Bước 2b: Throughput/RTT theo từng giây (dải phân vị qua các run)"),
         ("analyze_summary_comparison.py", "Bước 3: Tạo biểu đồ so sánh (6 charts)"),
         ("analyze_summary_overview.py", "Bước 4: Tạo biểu đồ tổng hợp"),
         ("validate_data.py", "Bước 5: Kiểm tra và validate dữ liệu"),
@@ -87,6 +88,7 @@ def main():
 
 📊 PLOTS:
    - plots_client/                 (detailed charts)
+   - plots_timeseries/             (per-second throughput/RTT bands)
    - plots_summary/                (summary charts)
      • 1_env_fair_comparison.png
      • 2_env_fair_jitter.png
@@ -0,0 +1,381 @@
+# run_parsers.py
+# ------------------------------------------
+# Các hàm đọc dữ liệu thô của một lần đo (iperf JSON, ping, sys_usage, meta)
+# Dùng chung cho runs/aggregate_results.py và watch_runs.py
+# ------------------------------------------
+
+import json, re, pandas as pd, numpy as np
+from pathlib import Path
+
+from steady_state import steady_state_metrics
+from tcp_stats import tcp_internals
+from iperf_accounting import direction_accounting, resolve_labels
+from net_counters import derive_metrics
+from sweep_params import meta_params
+from rr_probe import LogHistogram
+from timeline import SAMPLE_PERIOD, read_sys_samples
+from session_match import session_window, window_mean, window_delta
+from run_source import (read_csv, as_source, find_client_runs as _find_client_runs,
+                        find_server_dirs as _find_server_dirs)
+
+
+# ----------------- PING PARSER -----------------
+def parse_ping_log(path: Path):
+    if not path.exists():
+        return np.nan, np.nan, np.nan
+    text = path.read_text(errors="ignore")
+    latency, loss, jitter = np.nan, np.nan, np.nan
+    if "Average" in text:
+        m_avg = re.search(r"Average = (\d+)ms", text)
+        m_min = re.search(r"Minimum = (\d+)ms", text)
+        m_max = re.search(r"Maximum = (\d+)ms", text)
+        m_loss = re.search(r"Lost = \d+ \((\d+)% loss", text)
+        if m_avg: latency = float(m_avg.group(1))
+        if m_loss: loss = float(m_loss.group(1))
+        if m_min and m_max: jitter = abs(float(m_max.group(1)) - float(m_min.group(1)))
+    elif "rtt" in text:
+        m = re.search(r"rtt .* = [\d\.]+/([\d\.]+)/([\d\.]+)/([\d\.]+)", text)
+        if m:
+            latency = float(m.group(1))
+            jitter = float(m.group(3))
+        m2 = re.search(r"(\d+)% packet loss", text)
+        loss = float(m2.group(1)) if m2 else np.nan
+    return latency, loss, jitter
+
+
+# ----------------- SYS USAGE PARSER -----------------
+def parse_sys_usage(path: Path):
+    if not path.exists():
+        return np.nan, np.nan
+    try:
+        df = read_csv(path)
+        if df.empty:
+            return np.nan, np.nan
+        return df["cpu_percent"].mean(), df["mem_used_mb"].mean()
+    except Exception:
+        return np.nan, np.nan
+
+
+CGROUP_COLUMNS = {"cg_cpu_percent": "cg_cpu_mean", "cg_mem_mb": "cg_mem_mean",
+                  "cg_cpu_pressure": "cg_cpu_pressure_mean"}
+
+
+def parse_cgroup_usage(path: Path):
+    """
+    Trung bình các cột cgroup v2 (cg_*) mà backend container ghi thêm vào sys_usage.log;
+    log cũ / backend host không có các cột này → dict rỗng
+    """
+    try:
+        df = read_csv(path)
+    except Exception:
+        return {}
+    return {name: df[col].mean() for col, name in CGROUP_COLUMNS.items() if col in df.columns}
+
+
+# ----------------- RR PROBE (rr_probe.py) -----------------
+def parse_rr_probe(path: Path):
+    """rr_probe.json → giao dịch/s và p50/p99/p99.9 (ms); thiếu file → dict rỗng"""
+    if not path.exists():
+        return {}
+    doc = safe_load_json(path)
+    if not doc:
+        return {}
+    return {"rr_proto": doc.get("proto"), "rr_tps": doc.get("tps", np.nan), "rr_lost": doc.get("lost", 0),
+            **{k: doc.get(k, np.nan) for k in ("rr_p50_ms", "rr_p99_ms", "rr_p999_ms", "rr_mean_ms")}}
+
+def merge_rr_histograms(df, keys):
+    """
+    Gộp histogram của rr_probe.json theo nhóm (cộng số đếm từng bucket, không cần mẫu thô)
+    → p50/p99/p99.9 đúng của cả nhóm thay vì trung bình các phân vị từng run
+    """
+    if "rr_tps" not in df.columns:
+        return pd.DataFrame()
+    rows = []
+    for key, g in df[df["rr_tps"].notna()].groupby(keys + ["rr_proto"], dropna=False):
+        hist = None
+        for run_path in g["path"]:
+            h = safe_load_json(as_source(run_path) / "rr_probe.json").get("histogram")
+            if h:
+                h = LogHistogram.from_dict(h)
+                hist = h if hist is None else hist.merge(h)
+        if hist is not None and hist.count:
+            rows.append({**dict(zip(keys + ["rr_proto"], key)), "runs": len(g),
+                         "transactions": hist.count, **hist.summary()})
+    return pd.DataFrame(rows)
+
+
+# ----------------- CLOCK OFFSET (rr_probe.clock_offset) -----------------
+def parse_clock(path: Path):
+    """clock.json (trước/sau mỗi run) → lệch đồng hồ server - client trung bình và round-trip nhỏ nhất"""
+    if not path.exists():
+        return {}
+    samples = [s for s in safe_load_json(path).values()
+               if isinstance(s, dict) and s.get("samples")]
+    if not samples:
+        return {}
+    return {"clock_offset_s": float(np.mean([s["offset_s"] for s in samples])),
+            "clock_delay_s": min(s["delay_s"] for s in samples)}
+
+
+# ----------------- PROC USAGE (cây tiến trình iperf3) -----------------
+def transfer_stats(data):
+    """(số byte đã truyền, số giây) theo end.sum_sent/sum_received của iperf JSON"""
+    end = data.get("end", {})
+    sums = [end.get(k) or {} for k in ("sum_sent", "sum_received", "sum")]
+    nbytes = max((s.get("bytes", 0) or 0 for s in sums), default=0)
+    seconds = max((s.get("seconds", 0) or 0 for s in sums), default=0)
+    return nbytes, seconds
+
+def proc_metrics(proc, cpu_mean, nbytes, seconds):
+    """
+    CPU-seconds riêng của iperf3 trên mỗi GB truyền, đặt cạnh con số host-wide
+    (cpu_mean% × số CPU × thời gian test) để so sánh.
+    """
+    if not proc:
+        return {}
+    cpu_s = proc.get("cpu_user_s", 0) + proc.get("cpu_system_s", 0)
+    gb = nbytes / 1e9 if nbytes else np.nan
+    host_cpu_s = cpu_mean / 100 * proc.get("host_cpus", np.nan) * seconds
+    return {
+        "proc_cpu_s": cpu_s,
+        "proc_ctx_voluntary": proc.get("ctx_voluntary", np.nan),
+        "proc_ctx_involuntary": proc.get("ctx_involuntary", np.nan),
+        "proc_rss_max_mb": proc.get("rss_max_mb", np.nan),
+        "proc_cpu_s_per_gb": cpu_s / gb,
+        "host_cpu_s_per_gb": host_cpu_s / gb,
+    }
+
+def read_proc_log(path: Path):
+    """proc_usage.log (server, tích luỹ theo thời gian) → DataFrame; lỗi/thiếu → rỗng"""
+    try:
+        return read_csv(path).sort_values("timestamp", ignore_index=True)
+    except Exception:
+        return pd.DataFrame()
+
+def proc_summary(df, window=None):
+    """
+    Tóm tắt proc_usage.log dạng proc_usage.json: cả log (số cuối cùng) hoặc,
+    nếu có window = (t0, t1), mức tăng của các bộ đếm trong đúng cửa sổ session
+    """
+    if df.empty:
+        return {}
+    last = df.iloc[-1]
+    out = {"rss_max_mb": df["rss_max_mb"].max(), "host_cpus": last.get("host_cpus", np.nan)}
+    counters = ["cpu_user_s", "cpu_system_s", "ctx_voluntary", "ctx_involuntary"]
+    if window is None or np.isnan(window[0]):
+        return {**out, **{c: last[c] for c in counters}}
+    ts = df["timestamp"].to_numpy(float)
+    return {**out, **{c: window_delta(ts, df[c].to_numpy(float), *window) for c in counters}}
+
+
+# ----------------- UTILS -----------------
+def read_meta(path: Path):
+    """meta.txt (key=value mỗi dòng) → dict; thiếu file → dict rỗng"""
+    meta = {}
+    try:
+        for line in path.read_text(encoding="utf-8").splitlines():
+            k, sep, v = line.partition("=")
+            if sep:
+                meta[k.strip()] = v.strip()
+    except (OSError, ValueError):
+        pass
+    return meta
+
+def sample_period(meta):
+    """Chu kỳ mẫu của sys_usage.log (--sample-period trong meta.txt); run cũ không ghi → 1 s"""
+    try:
+        period = float(meta.get("sample_period", SAMPLE_PERIOD))
+    except ValueError:
+        return SAMPLE_PERIOD
+    return period if period > 0 else SAMPLE_PERIOD
+
+def qos_sweep_cols(meta):
+    """Run của --mode qos-sweep: tham số tc được quét, giá trị (chuỗi) và phần số của giá trị"""
+    if not meta.get("qos_param"):
+        return {}
+    value = meta.get("qos_value", "")
+    m = re.match(r"[\d.]+", value)
+    return {"qos_param": meta["qos_param"], "qos_value": value,
+            "qos_value_num": float(m.group(0)) if m else np.nan}
+
+def clean_name(name: str):
+    return re.sub(r"^\d+\.\s*", "", name).strip()
+
+def safe_load_json(path: Path):
+    """Đọc iperf JSON an toàn (xử lý file có nhiều đối tượng JSON)"""
+    try:
+        text = path.read_text(encoding="utf-8")
+        parts = re.split(r"}\s*{", text.strip())
+        if len(parts) > 1:
+            text = "{" + parts[-1]  # chỉ lấy JSON cuối
+        return json.loads(text)
+    except Exception:
+        return {}
+
+def extract_env_info(parts):
+    """Trích xuất env, NIC, QoS, hướng, và pod_config"""
+    env = next(
+        (p for p in parts if any(x in p.upper() for x in ["KUBERNETES", "K8S", "NATIVE", "VM", "DOCKER"])),
+        "unknown"
+    )
+    if "K8S" in env.upper() or "KUBERNETES" in env.upper():
+        env = "KUBERNETES"
+
+    nic_mode = next(
+        (p for p in parts if any(x in p.upper() for x in ["CROSS", "BRIDGED", "NAT", "HOST", "MACVLAN"])),
+        "unknown"
+    )
+
+    qos = next(
+        (p for p in parts if re.search(r"QOS\d+|NOQOS", p, re.IGNORECASE)),
+        "NOQOS"
+    ).upper()
+
+    # Hướng đo (chỉ áp dụng khi QoS != NOQOS)
+    direction = "none"
+    joined = "_".join(parts).lower()
+    if qos != "NOQOS":
+        if re.search(r"s[-_]*c", joined):
+            direction = "sc"
+        elif re.search(r"c[-_]*s", joined):
+            direction = "cs"
+
+    pod_config = next(
+        (p for p in parts if re.search(r"\b\d+\s*POD", p, re.IGNORECASE)),
+        "none"
+    )
+
+    return clean_name(env), clean_name(nic_mode), qos, direction, clean_name(pod_config)
+
+
+# ----------------- DISCOVERY -----------------
+# So khớp tên thư mục không phân biệt hoa/thường ("1. Client", "0. SERVER", ...)
+# để kết quả trên Linux giống với khi chạy trên Windows
+def find_server_dirs(root: Path):
+    """Thư mục *SERVER trong root (thư mục hoặc file .zip đợt đo, xem run_source.py)"""
+    return _find_server_dirs(root)
+
+def find_client_runs(root: Path):
+    """run_* rời và run đã gói trong runs.pack.zip (PackPath, xem run_source.py)"""
+    return _find_client_runs(root)
+
+
+# ----------------- RECORDS -----------------
+def parse_server_dir(server_dir: Path):
+    """Trả về danh sách bản ghi server (mỗi session JSON một bản ghi)"""
+    rows = []
+    parts = [clean_name(p) for p in server_dir.parts]
+    env, nic_mode, qos, direction, pod_cfg = extract_env_info(parts)
+    cpu, ram = parse_sys_usage(server_dir / "sys_usage.log")
+    cgroup = parse_cgroup_usage(server_dir / "sys_usage.log")
+    period = sample_period(read_meta(server_dir / "server_meta.txt"))
+
+    json_dir = server_dir / "server_json"
+    if json_dir.exists():
+        # sys_usage.log / proc_usage.log chạy suốt phiên đo → cắt theo cửa sổ từng session
+        ts, cpu_samples = read_sys_samples(server_dir / "sys_usage.log")
+        proc_log = read_proc_log(server_dir / "proc_usage.log")
+        for f in sorted(json_dir.glob("session_*.json")):
+            data = safe_load_json(f)
+            start = data.get("start", {})
+            throughput = direction_accounting(data, "server")
+            udp = start.get("test_start", {}).get("protocol") == "UDP"
+            window = session_window(data)
+            cpu_win = window_mean(ts, cpu_samples, *window, period) if not np.isnan(window[0]) else np.nan
+            cpu_sess = cpu if np.isnan(cpu_win) else cpu_win
+            proc_cols = proc_metrics(proc_summary(proc_log, window), cpu_sess, *transfer_stats(data))
+            rows.append({
+                "env": env, "nic_mode": nic_mode, **resolve_labels(direction, qos, data),
+                "pod_config": pod_cfg, "role": "server",
+                "record_type": "udp_probe" if udp else "tcp",
+                "cookie": start.get("cookie"), "session_start": window[0], "session_end": window[1],
+                **throughput,
+                **tcp_internals(data),
+                "cpu_mean": cpu_sess, "cpu_mean_log": cpu, "ram_mean": ram, **cgroup, **proc_cols,
+                "path": str(f)
+            })
+    return rows
+
+def parse_client_run(run_dir: Path, timeline=None):
+    """
+    Trả về bản ghi client của một thư mục run_NN.
+    timeline (TimelineCollector, tuỳ chọn): gom interval iperf + sys_usage để ghép theo thời gian
+    """
+    parts = [clean_name(p) for p in run_dir.parts]
+    env, nic_mode, qos, direction, pod_cfg = extract_env_info(parts)
+    iperf_path = run_dir / "iperf_client.json"
+
+    meta = read_meta(run_dir / "meta.txt")
+    data = {}
+    steady = {"steady_throughput_mbps": np.nan, "warmup_s": np.nan, "omit_s": np.nan}
+    tcp = {}
+    if iperf_path.exists():
+        data = safe_load_json(iperf_path)
+        steady = steady_state_metrics(data)
+        tcp = tcp_internals(data)
+        if timeline is not None:
+            timeline.add(str(run_dir), data, run_dir / "sys_usage.log", sample_period(meta))
+
+    latency, loss, jitter = parse_ping_log(run_dir / "ping.log")
+    cpu, ram = parse_sys_usage(run_dir / "sys_usage.log")
+    cgroup = parse_cgroup_usage(run_dir / "sys_usage.log")
+    counters_path = run_dir / "net_counters.json"
+    counters = derive_metrics(safe_load_json(counters_path)) if counters_path.exists() else {}
+    proc_path = run_dir / "proc_usage.json"
+    proc = proc_metrics(safe_load_json(proc_path), cpu, *transfer_stats(data)) if proc_path.exists() else {}
+    rr = parse_rr_probe(run_dir / "rr_probe.json")
+    clock = parse_clock(run_dir / "clock.json")
+
+    return {
+        "env": env, "nic_mode": nic_mode, **resolve_labels(direction, qos, data), "pod_config": pod_cfg,
+        "role": "client", "record_type": "tcp",
+        **meta_params(meta), **qos_sweep_cols(meta),
+        "cookie": data.get("start", {}).get("cookie"),
+        "start_time": data.get("start", {}).get("timestamp", {}).get("timesecs", np.nan), **clock,
+        **direction_accounting(data, "client"), **steady, **tcp,
+        "latency_ms": latency, "packet_loss_pct": loss, "jitter_ms": jitter, **rr,
+        "cpu_mean": cpu, "ram_mean": ram, **cgroup, **counters, **proc, "path": str(run_dir)
+    }
+
+
+def is_capacity_run(run_dir: Path):
+    """Run của chế độ --mode capacity (có capacity.json thay cho iperf_client.json)"""
+    return (run_dir / "capacity.json").exists()
+
+def parse_capacity_run(run_dir: Path):
+    """
+    Bản ghi capacity UDP của một run_NN (record_type = "capacity")
+    kèm danh sách từng lần thử (tốc độ gửi, Mbps nhận, loss, jitter, đạt/trượt)
+    """
+    parts = [clean_name(p) for p in run_dir.parts]
+    env, nic_mode, qos, direction, pod_cfg = extract_env_info(parts)
+    doc = safe_load_json(run_dir / "capacity.json")
+    probes = doc.get("probes", [])
+    capacity = doc.get("capacity_mbps")
+    capacity = np.nan if capacity is None else capacity
+    at_cap = [p for p in probes if p.get("passed") and p.get("rate_mbps") == capacity]
+
+    latency, loss, jitter = parse_ping_log(run_dir / "ping.log")
+    cpu, ram = parse_sys_usage(run_dir / "sys_usage.log")
+    counters_path = run_dir / "net_counters.json"
+    counters = derive_metrics(safe_load_json(counters_path)) if counters_path.exists() else {}
+    labels = {"env": env, "nic_mode": nic_mode,
+              **resolve_labels(direction, qos, safe_load_json(run_dir / "probe_01.json")), "pod_config": pod_cfg}
+
+    row = {
+        **labels, "role": "client", "record_type": "capacity",
+        "capacity_mbps": capacity, "capacity_trials": doc.get("trials", len(probes)),
+        "capacity_loss_pct": at_cap[-1].get("loss_pct", np.nan) if at_cap else np.nan,
+        "capacity_jitter_ms": at_cap[-1].get("jitter_ms", np.nan) if at_cap else np.nan,
+        "loss_target": doc.get("loss_target", np.nan),
+        "latency_ms": latency, "packet_loss_pct": loss, "jitter_ms": jitter,
+        "cpu_mean": cpu, "ram_mean": ram, **parse_cgroup_usage(run_dir / "sys_usage.log"),
+        **counters, "path": str(run_dir)
+    }
+    probe_rows = [
+        {**labels, "trial": p.get("trial"), "rate_mbps": p.get("rate_mbps"),
+         "received_mbps": p.get("received_mbps"), "loss_pct": p.get("loss_pct"),
+         "jitter_ms": p.get("jitter_ms"), "passed": p.get("passed"), "path": str(run_dir)}
+        for p in probes
+    ]
+    return row, probe_rows
@@ -0,0 +1,347 @@
+# run_source.py
+# ------------------------------------------
+# Nguồn dữ liệu run: thư mục rời (run_NN/) hoặc gói nén runs.pack.zip trong thư mục CLIENT
+# - pack: gom các run đã xong (có meta.txt) của một thư mục CLIENT vào một file zip
+#   (deflate từng member, central directory của zip là chỉ mục + pack_index.json)
+# - PackPath: view kiểu pathlib (/, exists, read_text, open, glob, parts...) trên member zip,
+#   đọc trực tiếp bằng truy cập ngẫu nhiên qua mmap, không giải nén ra đĩa
+# - find_client_runs: trả về cả run rời (đang đo) lẫn run trong gói; trùng tên → run rời thắng
+# - Root có thể là thư mục hoặc một file .zip chứa cả cây runs/ của một đợt đo
+# - unique_sources: gom run từ nhiều root, bỏ bản sao (cùng kịch bản) theo vân tay nội dung
+#   (tên + kích thước + CRC32 từng file; gói zip có sẵn CRC trong central directory)
+#   và theo cookie iperf3 → chỉ run duy nhất được parse
+#
+#   python run_source.py pack --root runs            # gói run đã xong, giữ thư mục rời
+#   python run_source.py pack --root runs --remove   # kiểm tra CRC rồi xoá thư mục rời đã gói
+# ------------------------------------------
+
+import argparse, fnmatch, hashlib, io, json, mmap, os, re, shutil, time, zipfile
+from pathlib import Path
+
+import pandas as pd
+
+PACK_NAME = "runs.pack.zip"
+INDEX_NAME = "pack_index.json"
+_ARCHIVES = {}  # đường dẫn gói → (ZipFile trên mmap, tập member, tập thư mục, thư mục → [ZipInfo])
+
+
+class _Mapped(mmap.mmap):
+    """mmap dùng làm file cho ZipFile (Python < 3.13: mmap chưa có seekable())"""
+
+    def seekable(self):
+        return True
+
+
+def _archive(path):
+    """Mở gói một lần (mmap chỉ đọc) và giữ lại cho các lần đọc sau"""
+    key = str(path)
+    if key not in _ARCHIVES:
+        with open(path, "rb") as f:
+            mm = _Mapped(f.fileno(), 0, access=mmap.ACCESS_READ)
+        zf = zipfile.ZipFile(mm)
+        names, members = set(), {}
+        for info in zf.infolist():
+            if info.is_dir():
+                continue
+            names.add(info.filename)
+            for i in range(1, info.filename.count("/") + 1):
+                members.setdefault(info.filename.rsplit("/", i)[0], []).append(info)
+        _ARCHIVES[key] = (zf, names, set(members), members)
+    return _ARCHIVES[key]
+
+
+def close_archives():
+    for zf, *_ in _ARCHIVES.values():
+        zf.close()
+    _ARCHIVES.clear()
+
+
+# ---------------- PATH TRONG GÓI -----------------
+class PackPath:
+    """Đường dẫn tới một member (file hoặc thư mục) bên trong gói; parts như thể gói đã giải nén"""
+
+    def __init__(self, archive, inner):
+        self.archive, self.inner = Path(archive), inner.strip("/")
+
+    def __truediv__(self, name):
+        return PackPath(self.archive, f"{self.inner}/{name}")
+
+    def __str__(self):
+        return str(self.archive / self.inner)
+
+    def __repr__(self):
+        return f"PackPath({str(self)!r})"
+
+    def __eq__(self, other):
+        return isinstance(other, PackPath) and str(self) == str(other)
+
+    def __hash__(self):
+        return hash(str(self))
+
+    @property
+    def parts(self):
+        return self.archive.parent.parts + tuple(self.inner.split("/"))
+
+    @property
+    def name(self):
+        return self.inner.rsplit("/", 1)[-1]
+
+    @property
+    def parent(self):
+        head, sep, _ = self.inner.rpartition("/")
+        return PackPath(self.archive, head) if sep else self.archive.parent
+
+    def is_dir(self):
+        return self.inner in _archive(self.archive)[2]
+
+    def is_file(self):
+        return self.inner in _archive(self.archive)[1]
+
+    def exists(self):
+        return self.is_file() or self.is_dir()
+
+    def read_bytes(self):
+        if not self.is_file():
+            raise FileNotFoundError(str(self))
+        return _archive(self.archive)[0].read(self.inner)
+
+    def read_text(self, encoding="utf-8", errors=None):
+        return self.read_bytes().decode(encoding or "utf-8", errors or "strict")
+
+    def open(self, mode="r", encoding="utf-8", errors=None):
+        if not self.is_file():
+            raise FileNotFoundError(str(self))
+        f = _archive(self.archive)[0].open(self.inner)
+        return f if "b" in mode else io.TextIOWrapper(f, encoding=encoding, errors=errors)
+
+    def glob(self, pattern):
+        """Member con trực tiếp khớp pattern (đủ cho session_*.json, probe_*.json)"""
+        _, names, dirs, _ = _archive(self.archive)
+        prefix = self.inner + "/"
+        children = {n[len(prefix):].split("/", 1)[0] for n in names | dirs if n.startswith(prefix)}
+        return [self / c for c in sorted(children) if fnmatch.fnmatch(c, pattern)]
+
+
+def as_source(path):
+    """Chuỗi path (cột "path" của bảng run) → Path hoặc PackPath (thành phần .zip đầu tiên là gói)"""
+    parts = Path(str(path)).parts
+    for i, part in enumerate(parts[:-1]):
+        if part.lower().endswith(".zip") and Path(*parts[:i + 1]).is_file():
+            return PackPath(Path(*parts[:i + 1]), "/".join(parts[i + 1:]))
+    return Path(str(path))
+
+
+def read_csv(path, **kwargs):
+    """pd.read_csv cho cả Path lẫn PackPath"""
+    if isinstance(path, PackPath):
+        with path.open("rb") as f:
+            return pd.read_csv(f, **kwargs)
+    return pd.read_csv(path, **kwargs)
+
+
+# ---------------- DISCOVERY -----------------
+def packed_runs(pack):
+    """Các run trong một gói, theo pack_index.json (không có → suy từ danh sách member)"""
+    zf, names, *_ = _archive(pack)
+    if INDEX_NAME in names:
+        runs = json.loads(zf.read(INDEX_NAME)).get("runs", {})
+    else:
+        runs = {n.split("/", 1)[0] for n in names if "/" in n}
+    return [PackPath(pack, r) for r in sorted(runs)]
+
+
+def is_campaign_archive(root: Path):
+    return root.is_file() and root.suffix.lower() == ".zip"
+
+
+def archive_dirs(archive, match):
+    """Thư mục trong một file zip đợt đo thoả match(PackPath)"""
+    dirs = _archive(archive)[2]
+    return sorted((p for p in (PackPath(archive, d) for d in dirs) if match(p)), key=lambda p: p.parts)
+
+
+def find_server_dirs(root: Path):
+    if is_campaign_archive(root):
+        return archive_dirs(root, lambda p: p.name.upper().endswith("SERVER"))
+    return sorted(p for p in root.rglob("*") if p.is_dir() and p.name.upper().endswith("SERVER"))
+
+
+def find_client_runs(root: Path):
+    """run_* rời và run trong runs.pack.zip dưới các thư mục *CLIENT (không phân biệt hoa/thường)"""
+    if is_campaign_archive(root):
+        return archive_dirs(root, lambda p: fnmatch.fnmatch(p.name, "run_*")
+                            and p.parent.name.upper().endswith("CLIENT"))
+    loose = [p for p in root.rglob("run_*") if p.is_dir() and p.parent.name.upper().endswith("CLIENT")]
+    found = {(str(p.parent), p.name): p for p in loose}
+    for pack in root.rglob(PACK_NAME):
+        if not pack.parent.name.upper().endswith("CLIENT"):
+            continue
+        for run in packed_runs(pack):
+            found.setdefault((str(pack.parent), run.name), run)
+    return sorted(found.values(), key=lambda p: tuple(p.parts))
+
+
+# ---------------- VÂN TAY / BỎ BẢN SAO -----------------
+COOKIE_RE = re.compile(rb'"cookie"\s*:\s*"([^"]+)"')
+
+
+class FingerprintCache:
+    """CRC32 của file rời theo (đường dẫn, kích thước, mtime) → lần tổng hợp sau không đọc lại file cũ"""
+
+    def __init__(self, path=None):
+        self.path, self.entries, self.dirty = path, {}, False
+        if path and Path(path).exists():
+            with open(path) as f:
+                self.entries = json.load(f)
+
+    def crc(self, f: Path):
+        st = f.stat()
+        key, stamp = str(f), [st.st_size, st.st_mtime_ns]
+        hit = self.entries.get(key)
+        if hit and hit[:2] == stamp:
+            return hit[2]
+        crc = zipfile.crc32(f.read_bytes())
+        self.entries[key], self.dirty = stamp + [crc], True
+        return crc
+
+    def save(self):
+        if self.path and self.dirty:
+            with open(self.path, "w") as f:
+                json.dump(self.entries, f)
+
+
+def file_digests(src, cache=None):
+    """[(tên tương đối, kích thước, crc32)] mọi file của một run/thư mục; file trong gói lấy CRC sẵn có"""
+    if isinstance(src, PackPath):
+        prefix = src.inner + "/"
+        infos = _archive(src.archive)[3].get(src.inner, [])
+        return sorted((i.filename[len(prefix):], i.file_size, i.CRC) for i in infos)
+    cache = cache or FingerprintCache()
+    return sorted((f.relative_to(src).as_posix(), f.stat().st_size, cache.crc(f))
+                  for f in src.rglob("*") if f.is_file())
+
+
+def fingerprint(src, cache=None):
+    """Vân tay nội dung: sha1 của danh sách (tên, kích thước, crc32) – giống nhau giữa bản rời và bản gói"""
+    h = hashlib.sha1()
+    for name, size, crc in file_digests(src, cache):
+        h.update(f"{name}\0{size}\0{crc:08x}\n".encode())
+    return h.hexdigest()
+
+
+def read_cookie(src, name="iperf_client.json"):
+    """Cookie iperf3 (start.cookie nằm ở đầu JSON) – chỉ đọc 8 KB đầu; không có → None"""
+    f = src / name
+    try:
+        if not f.exists():
+            return None
+        with f.open("rb") as fh:
+            m = COOKIE_RE.search(fh.read(8192))
+    except OSError:
+        return None
+    return m.group(1).decode() if m else None
+
+
+def unique_sources(roots, finder, cache=None, scope=None):
+    """
+    Gom nguồn (run / thư mục server) từ nhiều root theo thứ tự ưu tiên, bỏ bản sao trong cùng
+    kịch bản scope(nguồn) (vd nhãn env/nic/qos/hướng): trùng vân tay nội dung, hoặc trùng cookie
+    iperf3 (cùng một test, bản sao bị sửa/thêm file).
+    Nội dung giống hệt nhưng khác kịch bản (thường là thư mục bị chép nhầm nhãn) vẫn giữ cả hai
+    và được trả về trong danh sách xung đột để cảnh báo.
+    Trả về ([(nguồn, {"source_root", "fingerprint", "copies", "copy_roots"})], [(nguồn, nguồn giống)])
+    """
+    scope = scope or (lambda src: None)
+    kept, by_fp, by_cookie, first_fp, conflicts = [], {}, {}, {}, []
+    for root in roots:
+        for src in finder(Path(root)):
+            fp, sc = fingerprint(src, cache), scope(src)
+            idx = by_fp.get((sc, fp))
+            cookie = read_cookie(src) if idx is None else None
+            if idx is None and cookie:
+                idx = by_cookie.get((sc, cookie))
+            if idx is not None:
+                info = kept[idx][1]
+                info["copies"] += 1
+                if str(root) not in info["copy_roots"]:
+                    info["copy_roots"].append(str(root))
+                by_fp.setdefault((sc, fp), idx)
+                continue
+            if fp in first_fp:
+                conflicts.append((src, kept[first_fp[fp]][0]))
+            first_fp.setdefault(fp, len(kept))
+            by_fp[(sc, fp)] = len(kept)
+            if cookie:
+                by_cookie[(sc, cookie)] = len(kept)
+            kept.append((src, {"source_root": str(root), "fingerprint": fp, "copies": 1,
+                               "copy_roots": [str(root)]}))
+    return kept, conflicts
+
+
+# ---------------- PACK -----------------
+def pack_client_dir(client_dir: Path, remove=False):
+    """
+    Gói các run_* đã xong (có meta.txt) của một thư mục CLIENT vào runs.pack.zip.
+    Gói đã có được viết lại (member cũ + run mới) qua file tạm rồi thay thế nguyên tử.
+    Trả về số run mới được gói.
+    """
+    pack = client_dir / PACK_NAME
+    loose = sorted(p for p in client_dir.glob("run_*") if p.is_dir() and (p / "meta.txt").exists())
+    index = {}
+    if pack.exists():
+        with zipfile.ZipFile(pack) as old:
+            if INDEX_NAME in old.namelist():
+                index = json.loads(old.read(INDEX_NAME)).get("runs", {})
+    new = [p for p in loose if p.name not in index]
+    if not new:
+        return 0
+
+    tmp = pack.with_suffix(".tmp")
+    with zipfile.ZipFile(tmp, "w", zipfile.ZIP_DEFLATED) as zf:
+        if pack.exists():
+            with zipfile.ZipFile(pack) as old:
+                for info in old.infolist():
+                    if info.filename != INDEX_NAME:
+                        zf.writestr(info, old.read(info))
+        for run in new:
+            files = sorted(f for f in run.rglob("*") if f.is_file())
+            for f in files:
+                zf.write(f, f"{run.name}/{f.relative_to(run).as_posix()}")
+            index[run.name] = [f.relative_to(run).as_posix() for f in files]
+        zf.writestr(INDEX_NAME, json.dumps({"packed": time.strftime("%Y-%m-%d %H:%M:%S"), "runs": index}))
+
+    with zipfile.ZipFile(tmp) as check:
+        bad = check.testzip()
+    if bad:
+        tmp.unlink()
+        raise RuntimeError(f"Gói {tmp} lỗi CRC tại {bad}")
+    if str(pack) in _ARCHIVES:
+        _ARCHIVES.pop(str(pack))[0].close()
+    os.replace(tmp, pack)
+    if remove:
+        for run in new:
+            shutil.rmtree(run)
+    return len(new)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gói các run đã xong thành runs.pack.zip trong mỗi thư mục CLIENT")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p = sub.add_parser("pack")
+    p.add_argument("--root", default="runs")
+    p.add_argument("--remove", action="store_true", help="Xoá thư mục run rời sau khi gói và kiểm tra CRC")
+    args = parser.parse_args()
+
+    client_dirs = sorted({p.parent for p in Path(args.root).rglob("run_*")
+                          if p.is_dir() and p.parent.name.upper().endswith("CLIENT")})
+    total = 0
+    for client_dir in client_dirs:
+        n = pack_client_dir(client_dir, args.remove)
+        if n:
+            print(f"Gói {n} run → {client_dir / PACK_NAME}")
+        total += n
+    print(f"Đã gói {total} run trong {len(client_dirs)} thư mục CLIENT")
+
+
+if __name__ == "__main__":
+    main()
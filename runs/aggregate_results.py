@@ -1,162 +1,146 @@
 # aggregate_results.py
 # ------------------------------------------
 # Hợp nhất logic v4 + fix đọc iperf JSON nhiều đối tượng
+# Các parser dùng chung nằm ở run_parsers.py (thư mục gốc project)
+# Nhận nhiều root (thư mục runs/ hoặc file .zip của đợt đo); run trùng giữa các root
+# (cùng vân tay nội dung hoặc cùng cookie iperf3) chỉ được parse một lần
+# Luật kiểm tra (validation_rules.py) chạy ngay trên bảng client/server → validation_results.csv,
+# cột invalid_reason của client; vi phạm luật error → exit code 1 (sau khi đã ghi đủ các file)
+#   python runs/aggregate_results.py --root runs /mnt/laptop/runs campaign_b.zip
 # ------------------------------------------
 
-import json, re, pandas as pd, numpy as np
+import argparse, sys, pandas as pd, numpy as np
 from pathlib import Path
 
-root = Path("runs")
-rows = []
-
-# ----------------- PING PARSER -----------------
-def parse_ping_log(path: Path):
-    if not path.exists():
-        return np.nan, np.nan, np.nan
-    text = path.read_text(errors="ignore")
-    latency, loss, jitter = np.nan, np.nan, np.nan
-    if "Average" in text:
-        m_avg = re.search(r"Average = (\d+)ms", text)
-        m_min = re.search(r"Minimum = (\d+)ms", text)
-        m_max = re.search(r"Maximum = (\d+)ms", text)
-        m_loss = re.search(r"Lost = \d+ \((\d+)% loss", text)
-        if m_avg: latency = float(m_avg.group(1))
-        if m_loss: loss = float(m_loss.group(1))
-        if m_min and m_max: jitter = abs(float(m_max.group(1)) - float(m_min.group(1)))
-    elif "rtt" in text:
-        m = re.search(r"rtt .* = [\d\.]+/([\d\.]+)/([\d\.]+)/([\d\.]+)", text)
-        if m:
-            latency = float(m.group(1))
-            jitter = float(m.group(3))
-        m2 = re.search(r"(\d+)% packet loss", text)
-        loss = float(m2.group(1)) if m2 else np.nan
-    return latency, loss, jitter
-
-
-# ----------------- SYS USAGE PARSER -----------------
-def parse_sys_usage(path: Path):
-    if not path.exists():
-        return np.nan, np.nan
-    try:
-        df = pd.read_csv(path)
-        if df.empty:
-            return np.nan, np.nan
-        return df["cpu_percent"].mean(), df["mem_used_mb"].mean()
-    except Exception:
-        return np.nan, np.nan
-
-
-# ----------------- UTILS -----------------
-def clean_name(name: str):
-    return re.sub(r"^\d+\.\s*", "", name).strip()
-
-def safe_load_json(path: Path):
-    """Đọc iperf JSON an toàn (xử lý file có nhiều đối tượng JSON)"""
-    try:
-        text = path.read_text(encoding="utf-8")
-        parts = re.split(r"}\s*{", text.strip())
-        if len(parts) > 1:
-            text = "{" + parts[-1]  # chỉ lấy JSON cuối
-        return json.loads(text)
-    except Exception:
-        return {}
-
-def extract_env_info(parts):
-    """Trích xuất env, NIC, QoS, hướng, và pod_config"""
-    env = next(
-        (p for p in parts if any(x in p.upper() for x in ["KUBERNETES", "K8S", "NATIVE", "VM", "DOCKER"])),
-        "unknown"
-    )
-    if "K8S" in env.upper() or "KUBERNETES" in env.upper():
-        env = "KUBERNETES"
-
-    nic_mode = next(
-        (p for p in parts if any(x in p.upper() for x in ["CROSS", "BRIDGED", "NAT", "HOST", "MACVLAN"])),
-        "unknown"
-    )
-
-    qos = next(
-        (p for p in parts if re.search(r"QOS\d+|NOQOS", p, re.IGNORECASE)),
-        "NOQOS"
-    ).upper()
-
-    # Hướng đo (chỉ áp dụng khi QoS != NOQOS)
-    direction = "none"
-    joined = "_".join(parts).lower()
-    if qos != "NOQOS":
-        if re.search(r"s[-_]*c", joined):
-            direction = "sc"
-        elif re.search(r"c[-_]*s", joined):
-            direction = "cs"
-
-    pod_config = next(
-        (p for p in parts if re.search(r"\b\d+\s*POD", p, re.IGNORECASE)),
-        "none"
-    )
-
-    return clean_name(env), clean_name(nic_mode), qos, direction, clean_name(pod_config)
-
-
-# ----------------- SERVER -----------------
-for server_dir in root.rglob("*SERVER"):
-    if not server_dir.is_dir():
-        continue
-
-    parts = [clean_name(p) for p in server_dir.parts]
-    env, nic_mode, qos, direction, pod_cfg = extract_env_info(parts)
-    cpu, ram = parse_sys_usage(server_dir / "sys_usage.log")
-
-    json_dir = server_dir / "server_json"
-    if json_dir.exists():
-        for f in sorted(json_dir.glob("session_*.json")):
-            data = safe_load_json(f)
-            end = data.get("end", {})
-            sum_stats = end.get("sum_sent") or end.get("sum") or {}
-            bits = sum_stats.get("bits_per_second", np.nan) / 1e6
-            retrans = sum_stats.get("retransmits", np.nan)
-            rows.append({
-                "env": env, "nic_mode": nic_mode, "qos": qos,
-                "direction": direction, "pod_config": pod_cfg, "role": "server",
-                "throughput_mbps": bits, "retransmits": retrans,
-                "cpu_mean": cpu, "ram_mean": ram, "path": str(f)
-            })
-
-
-# ----------------- CLIENT -----------------
-for run_dir in root.rglob("*CLIENT/run_*"):
-    if not run_dir.is_dir():
-        continue
-
-    parts = [clean_name(p) for p in run_dir.parts]
-    env, nic_mode, qos, direction, pod_cfg = extract_env_info(parts)
-    iperf_path = run_dir / "iperf_client.json"
-
-    bits, retrans = np.nan, np.nan
-    if iperf_path.exists():
-        data = safe_load_json(iperf_path)
-        end = data.get("end", {})
-        sent = end.get("sum_sent") or end.get("sum") or {}
-        bits = sent.get("bits_per_second", np.nan) / 1e6
-        retrans = sent.get("retransmits", np.nan)
-
-    latency, loss, jitter = parse_ping_log(run_dir / "ping.log")
-    cpu, ram = parse_sys_usage(run_dir / "sys_usage.log")
-
-    rows.append({
-        "env": env, "nic_mode": nic_mode, "qos": qos,
-        "direction": direction, "pod_config": pod_cfg, "role": "client",
-        "throughput_mbps": bits, "retransmits": retrans,
-        "latency_ms": latency, "packet_loss_pct": loss, "jitter_ms": jitter,
-        "cpu_mean": cpu, "ram_mean": ram, "path": str(run_dir)
-    })
-
-
-# ----------------- OUTPUT -----------------
-df = pd.DataFrame(rows).replace([np.inf, -np.inf], np.nan)
-df.to_csv("summary_all_full.csv", index=False)
-df[df["role"]=="client"].to_csv("summary_client_only.csv", index=False)
-df[df["role"]=="server"].to_csv("summary_server_only.csv", index=False)
-
-print(f"Tổng hợp {len(df)} bản ghi → summary_all_full.csv")
-print(f"Tổng hợp {len(df[df['role']=='client'])} bản ghi client → summary_client_only.csv")
-print(f"Tổng hợp {len(df[df['role']=='server'])} bản ghi server → summary_server_only.csv")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from run_parsers import (find_server_dirs, find_client_runs, parse_server_dir, parse_client_run,
+                         is_capacity_run, parse_capacity_run, merge_rr_histograms, extract_env_info, clean_name)
+from timeline import TimelineCollector, efficiency
+from session_match import match_sessions
+from data_quality import normalize_labels
+from validation_rules import evaluate, hard_failures, format_report
+from run_source import FingerprintCache, unique_sources
+
+
+def provenance(info):
+    """Cột nguồn gốc: root được dùng, số bản sao đã thấy (mọi root) và các root chứa bản sao"""
+    return {"source_root": info["source_root"], "source_copies": info["copies"],
+            "source_roots": ";".join(info["copy_roots"]), "run_fingerprint": info["fingerprint"]}
+
+
+def scenario(src):
+    """Nhãn kịch bản suy từ đường dẫn – chỉ bỏ bản sao trong cùng kịch bản"""
+    return extract_env_info([clean_name(p) for p in src.parts])
+
+
+def warn_conflicts(kind, conflicts):
+    if conflicts:
+        src, other = conflicts[0]
+        print(f"⚠️  {len(conflicts)} {kind} có nội dung giống hệt {kind} ở kịch bản khác (chép nhầm nhãn?), "
+              f"vd {src} = {other}", file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tổng hợp dữ liệu thô từ một hoặc nhiều đợt đo")
+    parser.add_argument("--root", nargs="+", default=["runs"],
+                        help="Thư mục runs/ hoặc file .zip của đợt đo; root trước được ưu tiên khi trùng")
+    parser.add_argument("--fingerprint-cache", default="fingerprint_cache.json",
+                        help="Cache CRC32 của file rời (đường dẫn, kích thước, mtime)")
+    args = parser.parse_args()
+    cache = FingerprintCache(args.fingerprint_cache)
+    rows = []
+
+    # ----------------- SERVER -----------------
+    server_dirs, server_conflicts = unique_sources(args.root, find_server_dirs, cache, scenario)
+    warn_conflicts("thư mục server", server_conflicts)
+    for server_dir, info in server_dirs:
+        rows.extend({**r, **provenance(info)} for r in parse_server_dir(server_dir))
+
+    # ----------------- CLIENT -----------------
+    client_runs, client_conflicts = unique_sources(args.root, find_client_runs, cache, scenario)
+    warn_conflicts("run client", client_conflicts)
+    cache.save()
+    timeline = TimelineCollector()
+    capacity, probes = [], []
+    for run_dir, info in client_runs:
+        if is_capacity_run(run_dir):  # --mode capacity: bản ghi loại "capacity" riêng
+            row, run_probes = parse_capacity_run(run_dir)
+            capacity.append({**row, **provenance(info)})
+            probes.extend(run_probes)
+            continue
+        rows.append({**parse_client_run(run_dir, timeline), **provenance(info)})
+
+    # ----------------- TIMELINE (CPU × iperf theo từng giây) -----------------
+    pairs = timeline.align()
+    pairs.to_csv("timeline_client_pairs.csv", index=False)
+    series = timeline.series()
+    series.to_csv("timeline_client_series.csv", index=False)
+
+    # ----------------- OUTPUT -----------------
+    df = pd.DataFrame(rows).merge(efficiency(pairs), on="path", how="left")
+    df = pd.concat([df, pd.DataFrame(capacity)], ignore_index=True)
+    # Cùng cookie (mỗi test iperf3 một cookie) + cùng nhãn kịch bản đã phân giải theo test_start (direction
+    # và phần hướng của nhãn QoS bị ghi đè, xem iperf_accounting.resolve_labels) = cùng một test bị chép:
+    # session server trong các thư mục server không giống hệt nhau (log dài hơn...), run client chép sang
+    # thư mục QoS khác (vd bản sao "QoS2 S-_C" thực chất đo cs); giữ bản có hướng theo thư mục khớp hướng thật
+    label_cols = ["env", "nic_mode", "qos", "direction", "pod_config"]
+    agree = df["path"].map(lambda p: scenario(Path(p))[3]) == df["direction"]
+    ranked = df.assign(_agree=agree).sort_values("_agree", ascending=False, kind="stable")
+    copied = ranked["cookie"].notna() & ranked.duplicated(["role", "cookie"] + label_cols)
+    dup = df.index.isin(ranked.index[copied])
+    df = df[~dup].reset_index(drop=True)
+    df = df.replace([np.inf, -np.inf], np.nan)
+    for col in ["param_streams", "param_zerocopy"]:  # giữ kiểu nguyên dù dòng server/capacity bỏ trống
+        if col in df.columns:
+            df[col] = df[col].astype("Int64")
+    # Ghép session server ↔ run client (cookie, dự phòng theo thời gian đã bù lệch đồng hồ)
+    tcp = df["record_type"] == "tcp"
+    client, server = match_sessions(df[tcp & (df["role"]=="client")], df[tcp & (df["role"]=="server")])
+    # Kiểm tra một lượt trên nhãn đã chuẩn hoá (nhóm CV giống analyze_summary_full.py)
+    checks = []
+    for table, part in (("client", client), ("server", server)):
+        results, reason = evaluate(normalize_labels(part.copy()), table)
+        checks.append(results)
+        if table == "client":
+            client["invalid_reason"] = reason
+    checks = pd.concat(checks, ignore_index=True)
+    checks.to_csv("validation_results.csv", index=False)
+    df = pd.concat([client, server, df[~tcp]], ignore_index=True)
+    df.to_csv("summary_all_full.csv", index=False)
+    client.to_csv("summary_client_only.csv", index=False)
+    server.to_csv("summary_server_only.csv", index=False)
+    rr = merge_rr_histograms(client, ["env", "nic_mode", "qos", "direction", "pod_config"])
+    if not rr.empty:
+        rr.to_csv("summary_rr_grouped.csv", index=False)
+    if capacity:
+        df[df["record_type"]=="capacity"].dropna(axis=1, how="all").to_csv("summary_capacity.csv", index=False)
+        pd.DataFrame(probes).to_csv("capacity_probes.csv", index=False)
+
+    copies = sum(i["copies"] - 1 for _, i in client_runs + server_dirs) + int(dup.sum())
+    print(f"{len(client_runs)} run client, {len(server_dirs)} thư mục server duy nhất từ {len(args.root)} root "
+          f"(bỏ {copies} bản sao)")
+    print(f"Tổng hợp {len(df)} bản ghi → summary_all_full.csv")
+    print(f"Tổng hợp {len(client)} bản ghi client → summary_client_only.csv")
+    print(f"Tổng hợp {len(server)} bản ghi server → summary_server_only.csv")
+    print(f"Ghép {(server['match_method'] != '').sum()} session server với run client "
+          f"({(server['match_method'] == 'cookie').sum()} theo cookie)")
+    if not rr.empty:
+        print(f"Gộp histogram RR probe của {int(rr['runs'].sum())} run → summary_rr_grouped.csv")
+    if capacity:
+        print(f"Tổng hợp {len(capacity)} run capacity UDP ({len(probes)} lần thử) → summary_capacity.csv, capacity_probes.csv")
+    print(f"Ghép {len(pairs)} cặp CPU/Mbps theo giây → timeline_client_pairs.csv")
+    print(f"Chuỗi theo giây của {series['path'].nunique()} run ({len(series)} interval) → timeline_client_series.csv")
+
+    hard = hard_failures(checks)
+    dropped = int((client["invalid_reason"] != "").sum())
+    warned = int(((checks["severity"] == "warn") & (checks["failed"] > 0)).sum())
+    print(f"Kiểm tra {len(checks)} luật: {len(hard)} lỗi cứng, {dropped} run client bị loại, "
+          f"{warned} cảnh báo → validation_results.csv")
+    if not hard.empty:
+        print("\n".join(format_report(hard)), file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
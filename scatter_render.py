@@ -0,0 +1,137 @@
+# scatter_render.py
+# ------------------------------------------
+# Scatter / pairplot / ma trận tương quan cho corpus lớn (nhiều run, dữ liệu theo giây)
+# - Số điểm ≤ max_points: giữ nguyên sns.scatterplot / sns.pairplot như trước
+#   Nhiều hơn: hexbin (màu = số điểm, thang log) thay cho một marker mỗi điểm
+# - stratified_sample: lấy mẫu phân tầng tối đa n điểm mỗi nhóm (vd mỗi env), không vòng lặp theo nhóm
+# - corr_by_group: tương quan Pearson của mọi nhóm trong một lượt (mỗi tổng theo cặp metric là
+#   một np.bincount trên mã nhóm), bỏ NaN theo từng cặp như DataFrame.corr()
+# ------------------------------------------
+
+import numpy as np
+import pandas as pd
+import matplotlib.pyplot as plt
+import seaborn as sns
+
+HEXBIN_GRID = 40
+HEXBIN_CMAP = "viridis"
+
+
+# ---------------- LẤY MẪU -----------------
+def stratified_sample(df, by, n_per_group, seed=0):
+    """Tối đa n_per_group dòng ngẫu nhiên của mỗi nhóm `by` (nhóm nhỏ hơn giữ nguyên)"""
+    if not n_per_group:
+        return df
+    rng = np.random.default_rng(seed)
+    shuffled = df.iloc[rng.permutation(len(df))]
+    keep = shuffled.groupby(by, sort=False).cumcount() < n_per_group
+    return shuffled[keep.to_numpy()].sort_index()
+
+
+# ---------------- TƯƠNG QUAN -----------------
+def corr_by_group(df, cols, by=None):
+    """
+    Ma trận tương quan Pearson của từng nhóm → DataFrame dài (by, x, y, r, n).
+    Mỗi cặp metric chỉ dùng các dòng có đủ cả hai giá trị (như DataFrame.corr()).
+    by=None → cả bảng là một nhóm.
+    """
+    keys = [by] if isinstance(by, str) else list(by or [])
+    if keys:
+        grouped = df.groupby(keys, sort=True, dropna=False)
+        codes, labels = grouped.ngroup().to_numpy(), grouped.size().index.to_frame(index=False)
+    else:
+        codes, labels = np.zeros(len(df), int), None
+    groups = int(codes.max()) + 1 if len(codes) else 0
+    count = lambda w: np.bincount(codes, weights=w, minlength=groups)
+
+    x = df[cols].to_numpy(float)
+    valid = ~np.isnan(x)
+    vf = valid.astype(float)
+    # Trừ trung bình nhóm từng cột trước khi cộng tích → tránh mất chính xác với giá trị lớn;
+    # ô NaN thành 0 nên tích x_i·x_j tự bỏ các dòng thiếu một trong hai
+    x0 = np.where(valid, x, 0.0)
+    means = np.column_stack([count(x0[:, c]) / np.maximum(count(vf[:, c]), 1) for c in range(x.shape[1])])
+    x0 = np.where(valid, x - means[codes], 0.0) if groups else x0
+    sq = x0 * x0
+
+    k = len(cols)
+    n, sx, sxx, sxy = (np.zeros((groups, k, k)) for _ in range(4))
+    for i in range(k):
+        for j in range(k):
+            # sx[i, j] = Σ x_i trên các dòng có x_j; sxx tương tự với x_i²
+            sx[:, i, j] = count(x0[:, i] * vf[:, j])
+            sxx[:, i, j] = count(sq[:, i] * vf[:, j])
+            if j >= i:
+                n[:, i, j] = n[:, j, i] = count(vf[:, i] * vf[:, j])
+                sxy[:, i, j] = sxy[:, j, i] = count(x0[:, i] * x0[:, j])
+    sy, syy = sx.transpose(0, 2, 1), sxx.transpose(0, 2, 1)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cov = n * sxy - sx * sy
+        r = cov / np.sqrt((n * sxx - sx * sx) * (n * syy - sy * sy))
+    r = np.where(n >= 2, np.clip(r, -1, 1), np.nan)
+    ii, jj = np.indices((k, k))
+    g = np.repeat(np.arange(groups), k * k)
+    names = np.asarray(cols)
+    out = pd.DataFrame({"x": np.tile(names[ii.ravel()], groups), "y": np.tile(names[jj.ravel()], groups),
+                        "r": r.ravel(), "n": n.ravel().astype(int)})
+    if keys:
+        out = pd.concat([labels.iloc[g].reset_index(drop=True), out], axis=1)
+    return out
+
+
+def corr_matrix(long, cols):
+    """Bảng dài của một nhóm (corr_by_group) → ma trận vuông theo thứ tự cols"""
+    return long.pivot(index="x", columns="y", values="r").loc[cols, cols].rename_axis(index=None, columns=None)
+
+
+# ---------------- VẼ -----------------
+def density(ax, x, y, xscale="linear", yscale="linear"):
+    """Hexbin số điểm (thang log) trên ax, trả về collection để gắn colorbar"""
+    ok = np.isfinite(x) & np.isfinite(y)
+    if xscale == "log": ok &= x > 0
+    if yscale == "log": ok &= y > 0
+    return ax.hexbin(x[ok], y[ok], gridsize=HEXBIN_GRID, bins="log", mincnt=1, cmap=HEXBIN_CMAP,
+                     xscale=xscale, yscale=yscale, linewidths=0)
+
+
+def scatter_or_density(ax, data, x, y, hue=None, style=None, max_points=3000, **scatter_kws):
+    """≤ max_points: sns.scatterplot như cũ; nhiều hơn: hexbin mật độ + colorbar"""
+    if len(data) <= max_points:
+        sns.scatterplot(data=data, x=x, y=y, hue=hue, style=style, ax=ax, **scatter_kws)
+        return "scatter"
+    hb = density(ax, data[x].to_numpy(float), data[y].to_numpy(float))
+    ax.figure.colorbar(hb, ax=ax, label="số điểm")
+    ax.set_xlabel(x); ax.set_ylabel(y)
+    return "hexbin"
+
+
+def pair_density(data, cols, hue=None, height=2.2):
+    """
+    Pairplot dạng mật độ (corner): đường chéo là histogram theo hue, dưới đường chéo là hexbin
+    của mọi điểm. Trả về figure.
+    """
+    k = len(cols)
+    fig, axes = plt.subplots(k, k, figsize=(height * k, height * k), squeeze=False)
+    levels = list(data[hue].dropna().unique()) if hue else [None]
+    colors = sns.color_palette(None, len(levels))
+    for i, yc in enumerate(cols):
+        for j, xc in enumerate(cols):
+            ax = axes[i, j]
+            if j > i:
+                ax.set_visible(False)
+                continue
+            if i == j:
+                values = data[xc].to_numpy(float)
+                bins = np.histogram_bin_edges(values[np.isfinite(values)], bins=30)
+                for level, color in zip(levels, colors):
+                    v = values if level is None else data.loc[data[hue] == level, xc].to_numpy(float)
+                    ax.hist(v[np.isfinite(v)], bins=bins, histtype="step", color=color,
+                            label=None if level is None else str(level))
+            else:
+                density(ax, data[xc].to_numpy(float), data[yc].to_numpy(float))
+            ax.set_xlabel(xc if i == k - 1 else ""); ax.set_ylabel(yc if j == 0 and i > 0 else "")
+    if hue:
+        axes[0, 0].legend(title=hue, fontsize=7, loc="upper right")
+    fig.tight_layout()
+    return fig
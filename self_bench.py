@@ -0,0 +1,244 @@
+# self_bench.py
+# ------------------------------------------
+# Tự đo chi phí của chính harness (measure_system_loop.py) trên testbed cục bộ, không cần máy thứ hai
+# hay mạng ngoài: harness có làm sai lệch kết quả trên VM nhỏ không (thread monitor + flush mỗi
+# mẫu, ping chạy cùng iperf3...)
+# - Testbed: loopback (127.0.0.1) hoặc cặp veth với đầu server trong network namespace riêng
+#   (cần root + iproute2; auto = netns nếu dựng được, ngược lại loopback)
+# - Mỗi biến thể bật/tắt một tính năng (VARIANTS); các biến thể chạy xen kẽ theo từng vòng để
+#   trôi dạt của máy không dồn vào một biến thể
+# - Mỗi lần chạy: Mbps bên nhận, CPU của iperf3 hai đầu (end.cpu_utilization_percent),
+#   CPU-seconds của cả cây tiến trình harness (rusage) và CPU host trong lúc chạy
+# - Báo cáo chênh lệch của từng biến thể so với "minimal" (không monitor, không ping)
+#   → self_bench_runs.csv, self_bench_summary.csv
+#
+#   python self_bench.py --rounds 5 --duration 10
+#   sudo python self_bench.py --testbed netns --variants minimal monitor_1s ping_concurrent
+# ------------------------------------------
+
+import argparse, csv, json, os, resource, shutil, statistics, subprocess, sys, time
+from pathlib import Path
+
+import psutil
+
+HARNESS = Path(__file__).with_name("measure_system_loop.py")
+BASELINE = "minimal"
+# Tham số harness của từng biến thể (thêm vào lệnh chung, xem run_variant)
+VARIANTS = {
+    "minimal":         ["--monitor", "off", "--ping", "off"],
+    "monitor_1s":      ["--monitor", "on", "--sample-period", "1", "--ping", "off"],
+    "monitor_0.2s":    ["--monitor", "on", "--sample-period", "0.2", "--ping", "off"],
+    "ping_sequential": ["--monitor", "off", "--ping", "sequential"],
+    "ping_concurrent": ["--monitor", "off", "--ping", "concurrent"],
+    "harness_default": ["--monitor", "on", "--sample-period", "1", "--ping", "sequential"],
+}
+METRICS = ["mbps", "sender_mbps", "iperf_cpu_local", "iperf_cpu_remote", "harness_cpu_s", "host_cpu_pct", "wall_s"]
+
+
+# ---------------- TESTBED -----------------
+class Loopback:
+    """iperf3 server và client cùng namespace, qua 127.0.0.1"""
+
+    name = "loopback"
+    server_ip = "127.0.0.1"
+    iface = "lo"
+
+    def up(self):
+        pass
+
+    def wrap(self, cmd):
+        return cmd
+
+    def down(self):
+        pass
+
+
+class NetnsVeth(Loopback):
+    """Cặp veth: đầu client ở namespace hiện tại, đầu server trong namespace riêng (cần root)"""
+
+    name = "netns"
+    NS = "nt531-bench"
+    HOST_IF, NS_IF = "nt531b0", "nt531b1"
+    HOST_IP, server_ip = "10.231.0.1", "10.231.0.2"
+    iface = HOST_IF
+
+    def up(self):
+        self.down()
+        for cmd in (["ip", "netns", "add", self.NS],
+                    ["ip", "link", "add", self.HOST_IF, "type", "veth", "peer", "name", self.NS_IF],
+                    ["ip", "link", "set", self.NS_IF, "netns", self.NS],
+                    ["ip", "addr", "add", f"{self.HOST_IP}/30", "dev", self.HOST_IF],
+                    ["ip", "link", "set", self.HOST_IF, "up"],
+                    ["ip", "netns", "exec", self.NS, "ip", "addr", "add", f"{self.server_ip}/30", "dev", self.NS_IF],
+                    ["ip", "netns", "exec", self.NS, "ip", "link", "set", self.NS_IF, "up"],
+                    ["ip", "netns", "exec", self.NS, "ip", "link", "set", "lo", "up"]):
+            res = subprocess.run(cmd, capture_output=True, text=True)
+            if res.returncode != 0:
+                self.down()
+                raise RuntimeError(f"{' '.join(cmd)}: {res.stderr.strip()}")
+
+    def wrap(self, cmd):
+        return ["ip", "netns", "exec", self.NS, *cmd]
+
+    def down(self):
+        # Xoá namespace thì veth (cả đầu bên ngoài) bị xoá theo
+        subprocess.run(["ip", "netns", "del", self.NS], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        subprocess.run(["ip", "link", "del", self.HOST_IF], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def make_testbed(kind="auto"):
+    """netns khi được yêu cầu / khi auto và có quyền root + ip; lỗi dựng netns ở auto → loopback"""
+    if kind == "loopback":
+        return Loopback()
+    can_netns = hasattr(os, "geteuid") and os.geteuid() == 0 and shutil.which("ip")
+    if kind == "netns" and not can_netns:
+        sys.exit("--testbed netns cần quyền root và iproute2 (ip)")
+    if can_netns:
+        bed = NetnsVeth()
+        try:
+            bed.up()
+            return bed
+        except RuntimeError as e:
+            if kind == "netns":
+                sys.exit(f"Không dựng được netns: {e}")
+            print(f"⚠️  Không dựng được netns ({e}) → dùng loopback")
+    return Loopback()
+
+
+# ---------------- ĐO MỘT LẦN -----------------
+def iperf_result(path):
+    """iperf_client.json → Mbps bên nhận / bên gửi và % CPU iperf3 hai đầu; lỗi → dict rỗng"""
+    try:
+        end = json.loads(path.read_text()).get("end", {})
+    except (OSError, ValueError):
+        return {}
+    sent = end.get("sum_sent") or end.get("sum") or {}
+    received = end.get("sum_received") or sent
+    cpu = end.get("cpu_utilization_percent", {})
+    return {"mbps": received.get("bits_per_second", float("nan")) / 1e6,
+            "sender_mbps": sent.get("bits_per_second", float("nan")) / 1e6,
+            "iperf_cpu_local": cpu.get("host_total", float("nan")),
+            "iperf_cpu_remote": cpu.get("remote_total", float("nan"))}
+
+
+def busy_seconds(times):
+    return sum(times) - times.idle - getattr(times, "iowait", 0.0)
+
+
+def run_variant(bed, name, round_no, args):
+    """Một lần chạy harness (--repeat 1) của biến thể name → dòng kết quả"""
+    base = Path(args.out) / name / f"round_{round_no:02d}"
+    cmd = [sys.executable, str(HARNESS), "--role", "client", "--server-ip", bed.server_ip,
+           "--base-dir", str(base), "--duration", str(args.duration), "--repeat", "1", "--retries", "0",
+           "--no-qos", "--iface", bed.iface, "--ping-count", str(args.ping_count), *VARIANTS[name]]
+    usage0 = resource.getrusage(resource.RUSAGE_CHILDREN)
+    cpu0, t0 = psutil.cpu_times(), time.time()
+    with open(Path(args.out) / "harness.log", "a") as log:
+        log.write(f"\n===== {name} vòng {round_no}: {' '.join(cmd)}\n")
+        log.flush()
+        code = subprocess.run(cmd, stdout=log, stderr=subprocess.STDOUT).returncode
+    cpu1, wall = psutil.cpu_times(), time.time() - t0
+    usage1 = resource.getrusage(resource.RUSAGE_CHILDREN)
+
+    total = sum(cpu1) - sum(cpu0)
+    row = {"variant": name, "round": round_no, "testbed": bed.name, "exit_code": code,
+           **{m: float("nan") for m in METRICS},
+           **iperf_result(base / "run_01" / "iperf_client.json"),
+           "harness_cpu_s": (usage1.ru_utime - usage0.ru_utime) + (usage1.ru_stime - usage0.ru_stime),
+           "host_cpu_pct": (busy_seconds(cpu1) - busy_seconds(cpu0)) / total * 100 if total > 0 else float("nan"),
+           "wall_s": wall}
+    print(f"  {name:16s} vòng {round_no}: {row['mbps']:10.1f} Mbps, iperf3 CPU {row['iperf_cpu_local']:5.1f}%, "
+          f"harness {row['harness_cpu_s']:.2f} CPU·s")
+    return row
+
+
+# ---------------- TỔNG HỢP -----------------
+def summarize(rows, baseline=BASELINE):
+    """
+    Trung bình / độ lệch chuẩn từng metric theo biến thể + chênh lệch so với baseline:
+    *_delta (tuyệt đối) và *_delta_pct (% so với trung bình baseline)
+    """
+    by_variant = {}
+    for r in rows:
+        if r["exit_code"] == 0 and r["mbps"] == r["mbps"]:
+            by_variant.setdefault(r["variant"], []).append(r)
+    means = {v: {m: statistics.fmean(r[m] for r in rs) for m in METRICS} for v, rs in by_variant.items()}
+    base = means.get(baseline)
+    out = []
+    for v, rs in by_variant.items():
+        row = {"variant": v, "runs": len(rs)}
+        for m in METRICS:
+            values = [r[m] for r in rs]
+            row[f"{m}_mean"] = means[v][m]
+            row[f"{m}_std"] = statistics.stdev(values) if len(values) > 1 else float("nan")
+            if base is not None:
+                row[f"{m}_delta"] = means[v][m] - base[m]
+                row[f"{m}_delta_pct"] = (means[v][m] - base[m]) / base[m] * 100 if base[m] else float("nan")
+        out.append(row)
+    return out
+
+
+def write_csv(path, rows):
+    fields = list(dict.fromkeys(k for r in rows for k in r))
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=fields)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def print_report(summary, baseline=BASELINE):
+    print(f"\n{'biến thể':16s} {'run':>3s} {'Mbps':>10s} {'Δ Mbps %':>9s} {'CPU iperf3 %':>12s} "
+          f"{'Δ CPU host %':>12s} {'harness CPU·s':>13s}")
+    for r in summary:
+        print(f"{r['variant']:16s} {r['runs']:3d} {r['mbps_mean']:10.1f} {r.get('mbps_delta_pct', float('nan')):+9.2f} "
+              f"{r['iperf_cpu_local_mean']:12.1f} {r.get('host_cpu_pct_delta', float('nan')):+12.2f} "
+              f"{r['harness_cpu_s_mean']:13.2f}")
+    print(f"(Δ so với '{baseline}': không monitor, không ping)")
+
+
+# ---------------- MAIN -----------------
+def main():
+    parser = argparse.ArgumentParser(description="Đo chi phí của harness trên loopback / netns cục bộ")
+    parser.add_argument("--testbed", choices=["auto", "loopback", "netns"], default="auto")
+    parser.add_argument("--variants", nargs="+", choices=list(VARIANTS), default=list(VARIANTS))
+    parser.add_argument("--rounds", type=int, default=5, help="Số vòng; mỗi vòng chạy mỗi biến thể một lần")
+    parser.add_argument("--duration", type=int, default=10, help="Thời lượng iperf3 mỗi lần (giây)")
+    parser.add_argument("--ping-count", type=int, default=20)
+    parser.add_argument("--out", default="self_bench")
+    args = parser.parse_args()
+    if not shutil.which("iperf3"):
+        sys.exit("Không tìm thấy iperf3")
+    variants = [BASELINE] + [v for v in args.variants if v != BASELINE]
+
+    Path(args.out).mkdir(parents=True, exist_ok=True)
+    bed = make_testbed(args.testbed)
+    server = subprocess.Popen(bed.wrap(["iperf3", "-s"]), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    print(f"Testbed {bed.name}: server {bed.server_ip}, {len(variants)} biến thể × {args.rounds} vòng "
+          f"≈ {len(variants) * args.rounds * (args.duration + 8) / 60:.0f} phút (chưa tính ping tuần tự)")
+    rows = []
+    try:
+        time.sleep(1)
+        for k in range(1, args.rounds + 1):
+            j = (k - 1) % len(variants)  # xoay vòng thứ tự giữa các vòng (vòng > số biến thể vẫn xoay)
+            order = variants[j:] + variants[:j]
+            for name in order:
+                rows.append(run_variant(bed, name, k, args))
+    finally:
+        server.terminate()
+        server.wait()
+        bed.down()
+
+    write_csv(Path(args.out) / "self_bench_runs.csv", rows)
+    summary = summarize(rows)
+    if summary:
+        write_csv(Path(args.out) / "self_bench_summary.csv", summary)
+        print_report(summary)
+    failed = sum(r["exit_code"] != 0 or r["mbps"] != r["mbps"] for r in rows)
+    if failed:
+        print(f"⚠️  {failed}/{len(rows)} lần chạy lỗi (xem {Path(args.out) / 'harness.log'})")
+    print(f"Kết quả → {Path(args.out) / 'self_bench_summary.csv'}")
+    return 1 if failed == len(rows) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,94 @@
+# session_match.py
+# ------------------------------------------
+# Ghép session iperf3 của server với run của client và cắt số liệu server
+# theo đúng cửa sổ session
+# - Khoá chính: start.cookie (client và server cùng một cookie) → chỉ mục băm cookie → run
+# - Dự phòng (thiếu cookie): thời điểm bắt đầu theo đồng hồ server
+#   ≈ thời điểm client + clock_offset_s (clock.json, rr_probe.clock_offset), trong cùng kịch bản
+# - sys_usage.log / proc_usage.log của server là log dài cả phiên đo (cùng đồng hồ server)
+#   → cắt theo [timesecs, timesecs + omit + seconds] của từng session; mỗi mẫu phủ một chu kỳ
+#   lấy mẫu (--sample-period, ghi trong meta.txt / server_meta.txt, mặc định 1 s)
+# ------------------------------------------
+
+import numpy as np
+import pandas as pd
+
+from timeline import SAMPLE_PERIOD
+
+SCENARIO_KEYS = ["env", "nic_mode", "qos", "direction", "pod_config"]
+MATCH_TOLERANCE_S = 5.0
+
+
+# ---------------- CỬA SỔ SESSION -----------------
+def session_window(doc):
+    """(t0, t1) epoch của phần truyền dữ liệu trong một iperf JSON; thiếu mốc → (nan, nan)"""
+    start = doc.get("start", {})
+    t0 = start.get("timestamp", {}).get("timesecs")
+    if t0 is None:
+        return np.nan, np.nan
+    end = doc.get("end", {})
+    seconds = max((end.get(k) or {}).get("seconds", 0) or 0 for k in ("sum_sent", "sum_received", "sum"))
+    if not seconds:
+        seconds = start.get("test_start", {}).get("duration", 0) or 0
+    omit = start.get("test_start", {}).get("omit", 0) or 0
+    return float(t0), float(t0 + omit + seconds)
+
+
+def window_mean(ts, values, t0, t1, period=SAMPLE_PERIOD):
+    """Trung bình các mẫu có khoảng [ts - period, ts] nằm trong [t0, t1 + period); không có mẫu → NaN"""
+    lo, hi = np.searchsorted(ts, [t0 + period, t1 + period])
+    return values[lo:hi].mean() if hi > lo else np.nan
+
+
+def window_delta(ts, cumulative, t0, t1, period=SAMPLE_PERIOD):
+    """Mức tăng của một bộ đếm tích luỹ giữa mẫu cuối trước t0 và mẫu cuối trước t1 + period"""
+    i0, i1 = np.searchsorted(ts, [t0, t1 + period], side="right") - 1
+    if i1 < 0:
+        return np.nan
+    return cumulative[i1] - (cumulative[i0] if i0 >= 0 else 0.0)
+
+
+# ---------------- GHÉP SERVER ↔ CLIENT -----------------
+def match_sessions(client, server, tol_s=MATCH_TOLERANCE_S):
+    """
+    Trả về (client, server) kèm cột ghép:
+    - server: client_path, match_method ("cookie" / "time" / "")
+    - client: server_path, server_cpu_mean, server_rx_mbps, server_proc_cpu_s_per_gb
+    """
+    client, server = client.copy(), server.copy()
+    server["client_path"], server["match_method"] = None, ""
+
+    # 1) Chỉ mục băm cookie → path client
+    if "cookie" in client.columns and "cookie" in server.columns:
+        index = {c: p for c, p in zip(client["cookie"], client["path"]) if isinstance(c, str) and c}
+        hit = server["cookie"].map(index)
+        server.loc[hit.notna(), "client_path"] = hit[hit.notna()]
+        server.loc[hit.notna(), "match_method"] = "cookie"
+
+    # 2) Dự phòng theo thời gian (đồng hồ client đã quy về đồng hồ server) trong cùng kịch bản
+    taken = set(server["client_path"].dropna())
+    rest = server[server["client_path"].isna() & server["session_start"].notna()]
+    free = client[~client["path"].isin(taken) & client["start_time"].notna()]
+    if not rest.empty and not free.empty:
+        offset = free["clock_offset_s"].fillna(0.0) if "clock_offset_s" in free.columns else 0.0
+        free = free.assign(t_server=free["start_time"] + offset)[SCENARIO_KEYS + ["t_server", "path"]]
+        left = rest.reset_index()[SCENARIO_KEYS + ["index", "session_start"]]
+        keys = {k: str for k in SCENARIO_KEYS}
+        pairs = pd.merge_asof(
+            left.astype(keys).sort_values("session_start"),
+            free.astype(keys).sort_values("t_server").rename(columns={"path": "matched"}),
+            left_on="session_start", right_on="t_server", by=SCENARIO_KEYS,
+            direction="nearest", tolerance=tol_s,
+        ).dropna(subset=["matched"])
+        pairs = pairs.drop_duplicates("matched")  # mỗi run client chỉ nhận một session
+        server.loc[pairs["index"], "client_path"] = pairs["matched"].to_numpy()
+        server.loc[pairs["index"], "match_method"] = "time"
+
+    # 3) Đưa số liệu server (đã cắt theo session) sang dòng client tương ứng
+    cols = {"path": "server_path", "cpu_mean": "server_cpu_mean", "receiver_mbps": "server_rx_mbps",
+            "proc_cpu_s_per_gb": "server_proc_cpu_s_per_gb"}
+    matched = server[server["client_path"].notna()]
+    matched = matched[["client_path"] + [c for c in cols if c in matched.columns]].rename(columns=cols)
+    matched = matched.drop_duplicates("client_path")
+    client = client.merge(matched.rename(columns={"client_path": "path"}), on="path", how="left")
+    return client, server
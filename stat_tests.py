@@ -0,0 +1,148 @@
+# stat_tests.py
+# ------------------------------------------
+# Kiểm định thống kê vector hoá cho nhiều ô cùng lúc (mỗi phần tử mảng = một ô)
+# - Welch t-test từ mean/std/count (không cần dữ liệu thô)
+# - Mann-Whitney U (xấp xỉ chuẩn, hiệu chỉnh ties) từ dữ liệu thô theo nhóm
+# - Effect size: Hedges' g, rank-biserial
+# - Benjamini-Hochberg FDR
+# Dùng scipy.special.betainc nếu có; không có thì tính hàm beta không đầy đủ
+# bằng liên phân số (Lentz) trên numpy.
+# ------------------------------------------
+
+import math
+import numpy as np
+
+try:
+    from scipy.special import betainc as _betainc
+except ImportError:  # scipy là tuỳ chọn
+    _betainc = None
+
+_lgamma = np.frompyfunc(math.lgamma, 1, 1)
+
+
+def _betacf(a, b, x, iters=200, eps=1e-14):
+    """Liên phân số của I_x(a, b) (Numerical Recipes, Lentz), vector hoá"""
+    tiny = 1e-300
+    qab, qap, qam = a + b, a + 1.0, a - 1.0
+    c = np.ones_like(x)
+    d = 1.0 - qab * x / qap
+    d = 1.0 / np.where(np.abs(d) < tiny, tiny, d)
+    h = d.copy()
+    for m in range(1, iters + 1):
+        m2 = 2 * m
+        aa = m * (b - m) * x / ((qam + m2) * (a + m2))
+        d = 1.0 + aa * d
+        d = 1.0 / np.where(np.abs(d) < tiny, tiny, d)
+        c = 1.0 + aa / c
+        c = np.where(np.abs(c) < tiny, tiny, c)
+        h *= d * c
+        aa = -(a + m) * (qab + m) * x / ((a + m2) * (qap + m2))
+        d = 1.0 + aa * d
+        d = 1.0 / np.where(np.abs(d) < tiny, tiny, d)
+        c = 1.0 + aa / c
+        c = np.where(np.abs(c) < tiny, tiny, c)
+        delta = d * c
+        h *= delta
+        if np.all(np.abs(delta - 1.0) < eps):
+            break
+    return h
+
+
+def betainc(a, b, x):
+    """Hàm beta không đầy đủ chuẩn hoá I_x(a, b), vector hoá"""
+    a, b, x = np.broadcast_arrays(*(np.asarray(v, float) for v in (a, b, x)))
+    if _betainc is not None:
+        return _betainc(a, b, x)
+    out = np.full(x.shape, np.nan)
+    ok = (a > 0) & (b > 0) & (x >= 0) & (x <= 1)
+    a, b, x = a[ok], b[ok], x[ok]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        lbeta = (_lgamma(a + b) - _lgamma(a) - _lgamma(b)).astype(float)
+        front = np.exp(lbeta + a * np.log(x) + b * np.log1p(-x))
+    # Đối xứng I_x(a, b) = 1 - I_{1-x}(b, a) để liên phân số hội tụ nhanh
+    flip = x > (a + 1) / (a + b + 2)
+    res = np.empty_like(x)
+    if np.any(~flip):
+        i = ~flip
+        res[i] = front[i] * _betacf(a[i], b[i], x[i]) / a[i]
+    if np.any(flip):
+        i = flip
+        res[i] = 1.0 - front[i] * _betacf(b[i], a[i], 1.0 - x[i]) / b[i]
+    res[x == 0], res[x == 1] = 0.0, 1.0
+    out[ok] = res
+    return out
+
+
+def t_sf_two_sided(t, df):
+    """p hai phía của phân phối t: I_{df/(df+t²)}(df/2, 1/2)"""
+    t, df = np.asarray(t, float), np.asarray(df, float)
+    return betainc(df / 2, 0.5, df / (df + t * t))
+
+
+def welch_test(m1, s1, n1, m2, s2, n2):
+    """
+    Welch t-test (hai phía) cho từng ô: trả về (t, df, p).
+    Ô có n < 2 hoặc phương sai hai phía bằng 0 → NaN.
+    """
+    m1, s1, n1, m2, s2, n2 = (np.asarray(v, float) for v in (m1, s1, n1, m2, s2, n2))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        v1, v2 = s1 ** 2 / n1, s2 ** 2 / n2
+        se = np.sqrt(v1 + v2)
+        t = (m2 - m1) / se
+        df = (v1 + v2) ** 2 / (v1 ** 2 / (n1 - 1) + v2 ** 2 / (n2 - 1))
+    bad = (n1 < 2) | (n2 < 2) | ~(se > 0)
+    t, df = np.where(bad, np.nan, t), np.where(bad, np.nan, df)
+    return t, df, t_sf_two_sided(t, df)
+
+
+def hedges_g(m1, s1, n1, m2, s2, n2):
+    """Chênh lệch chuẩn hoá (m2 - m1) / s_pooled, hiệu chỉnh lệch mẫu nhỏ"""
+    m1, s1, n1, m2, s2, n2 = (np.asarray(v, float) for v in (m1, s1, n1, m2, s2, n2))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        sp = np.sqrt(((n1 - 1) * s1 ** 2 + (n2 - 1) * s2 ** 2) / (n1 + n2 - 2))
+        d = (m2 - m1) / sp
+        return d * (1 - 3 / (4 * (n1 + n2) - 9))
+
+
+def mann_whitney(df, keys, value, side):
+    """
+    Mann-Whitney U hai phía cho mọi nhóm `keys` trong một lượt groupby:
+    df chứa cả hai mẫu, cột `side` = 0 (baseline) / 1 (mới).
+    Trả về DataFrame keys + n1, n2, u, p, rank_biserial (> 0: mẫu mới lớn hơn).
+    """
+    d = df[keys + [side, value]].dropna(subset=[value])
+    d = d.assign(_rank=d.groupby(keys, dropna=False)[value].rank())
+    g = d.groupby(keys, dropna=False)
+    n = g[side].agg(n2="sum", n="size")
+    n["n1"] = n["n"] - n["n2"]
+    r2 = d[d[side] == 1].groupby(keys, dropna=False)["_rank"].sum().rename("r2")
+    ties = d.groupby(keys + [value], dropna=False).size()
+    tie_term = (ties ** 3 - ties).groupby(level=list(range(len(keys))), dropna=False).sum().rename("tie")
+    res = n.join(r2).join(tie_term).fillna({"r2": 0.0, "tie": 0.0})
+
+    n1, n2, N = res["n1"].to_numpy(float), res["n2"].to_numpy(float), res["n"].to_numpy(float)
+    u = res["r2"].to_numpy(float) - n2 * (n2 + 1) / 2  # U của mẫu mới
+    mu = n1 * n2 / 2
+    with np.errstate(divide="ignore", invalid="ignore"):
+        sigma = np.sqrt(n1 * n2 / 12 * ((N + 1) - res["tie"].to_numpy(float) / (N * (N - 1))))
+        z = (np.abs(u - mu) - 0.5) / sigma  # hiệu chỉnh liên tục
+        p = np.array([math.erfc(v / math.sqrt(2)) if v == v else np.nan for v in np.maximum(z, 0)])
+        rb = 2 * u / (n1 * n2) - 1
+    bad = (n1 < 1) | (n2 < 1) | ~(sigma > 0)
+    out = res[["n1", "n2"]].copy()
+    out["u"], out["p"], out["rank_biserial"] = u, np.where(bad, np.nan, p), np.where(bad, np.nan, rb)
+    return out.reset_index()
+
+
+def bh_fdr(p):
+    """q-value Benjamini-Hochberg; NaN giữ nguyên và không tính vào số kiểm định"""
+    p = np.asarray(p, float)
+    q = np.full(p.shape, np.nan)
+    ok = np.flatnonzero(~np.isnan(p))
+    if not len(ok):
+        return q
+    order = ok[np.argsort(p[ok])]
+    m = len(order)
+    ranked = p[order] * m / np.arange(1, m + 1)
+    q[order] = np.minimum(np.minimum.accumulate(ranked[::-1])[::-1], 1.0)
+    return q
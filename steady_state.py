@@ -0,0 +1,59 @@
+# steady_state.py
+# ------------------------------------------
+# Phát hiện trạng thái ổn định (steady state) trên chuỗi throughput theo interval
+# để tách pha TCP slow-start / ramp-up khỏi throughput báo cáo
+# - Mức tham chiếu: trung vị nửa sau của chuỗi
+# - Warm-up kết thúc ở interval đầu tiên mà cửa sổ trượt `window` interval
+#   có trung bình trong ±tol quanh tham chiếu và CV <= cv_max
+#   (cửa sổ vọt lố đầu test, vd burst lúc cwnd còn lớn, không được tính là ổn định)
+# ------------------------------------------
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from timeline import interval_mbps
+
+WINDOW = 3
+TOL = 0.10
+CV_MAX = 0.10
+
+
+def detect_steady_state(mbps, seconds, window=WINDOW, tol=TOL, cv_max=CV_MAX):
+    """
+    Trả về (steady_mbps, warmup_s) cho một chuỗi interval.
+    Không tìm thấy đoạn ổn định → (nan, nan).
+    """
+    mbps = np.asarray(mbps, float)
+    seconds = np.asarray(seconds, float)
+    if len(mbps) < window + 1:
+        return np.nan, np.nan
+
+    ref = np.median(mbps[len(mbps) // 2:])
+    if not ref > 0:
+        return np.nan, np.nan
+
+    win = sliding_window_view(mbps, window)
+    mean = win.mean(axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cv = win.std(axis=1, ddof=1) / mean
+    ok = np.flatnonzero((mean >= (1 - tol) * ref) & (mean <= (1 + tol) * ref) & (cv <= cv_max))
+    if not len(ok):
+        return np.nan, np.nan
+
+    k = ok[0]
+    steady = np.sum(mbps[k:] * seconds[k:]) / np.sum(seconds[k:])
+    return steady, float(np.sum(seconds[:k]))
+
+
+def steady_state_metrics(doc):
+    """Tính steady state từ iperf JSON (bỏ qua interval omitted của -O)"""
+    mbps, seconds = [], []
+    for iv in doc.get("intervals", []):
+        s = iv.get("sum", {})
+        if s.get("omitted"):
+            continue
+        mbps.append(interval_mbps(iv))
+        seconds.append(s.get("seconds", 1.0))
+    steady, warmup = detect_steady_state(mbps, seconds)
+    omit = doc.get("start", {}).get("test_start", {}).get("omit", 0) or 0
+    return {"steady_throughput_mbps": steady, "warmup_s": warmup, "omit_s": omit}
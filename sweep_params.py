@@ -0,0 +1,49 @@
+# sweep_params.py
+# ------------------------------------------
+# Tham số iperf3 được quét trong --mode sweep và ghi vào meta.txt (param_*):
+#   streams (-P), window (-w), blocklen (-l), zerocopy (-Z), affinity (-A n[,m])
+# Run cũ không có param_* trong meta → coi như cấu hình mặc định (-P 4, còn lại mặc định iperf3).
+# Dùng chung cho harness (dựng lệnh) và aggregator/analysis (thêm chiều vào bảng run).
+# Chỉ dùng thư viện chuẩn.
+# ------------------------------------------
+
+import itertools
+
+DEFAULT_PARAMS = {"streams": 4, "window": "default", "blocklen": "default", "zerocopy": 0, "affinity": "none"}
+PARAM_COLUMNS = [f"param_{k}" for k in DEFAULT_PARAMS]
+
+
+def normalize_params(params):
+    """Ép kiểu (streams, zerocopy → int; còn lại → chuỗi) và điền mặc định cho khoá thiếu"""
+    p = {**DEFAULT_PARAMS, **{k: v for k, v in params.items() if v not in (None, "")}}
+    p["streams"], p["zerocopy"] = int(p["streams"]), int(p["zerocopy"])
+    p["window"], p["blocklen"], p["affinity"] = str(p["window"]), str(p["blocklen"]), str(p["affinity"])
+    return p
+
+
+def iperf_args(params):
+    """Tham số → cờ iperf3 (giá trị 'default' / 'none' / 0 thì không thêm cờ)"""
+    p = normalize_params(params)
+    args = ["-P", str(p["streams"])]
+    if p["window"] != "default":
+        args += ["-w", p["window"]]
+    if p["blocklen"] != "default":
+        args += ["-l", p["blocklen"]]
+    if p["zerocopy"]:
+        args.append("-Z")
+    if p["affinity"] != "none":
+        args += ["-A", p["affinity"]]  # "n" = client, "n,m" = client + server
+    return args
+
+
+def sweep_grid(streams, windows, blocklens, zerocopy, affinity):
+    """Tích Descartes của các lưới → danh sách cấu hình (dict)"""
+    return [normalize_params(dict(zip(DEFAULT_PARAMS, combo)))
+            for combo in itertools.product(streams, windows, blocklens, zerocopy, affinity)]
+
+
+def meta_params(meta):
+    """meta.txt (dict) → cột param_* của bảng run"""
+    p = normalize_params({k: meta.get(f"param_{k}") for k in DEFAULT_PARAMS})
+    return {f"param_{k}": v for k, v in p.items()}
+
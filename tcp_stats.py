@@ -0,0 +1,76 @@
+# tcp_stats.py
+# ------------------------------------------
+# Trích TCP internals từ stream record của iperf3 JSON
+# (intervals[*].streams và end.streams): snd_cwnd, rtt, rttvar, retransmits,
+# max_snd_cwnd / max_rtt. Chỉ phía gửi (sender=true) có các trường này;
+# iperf3 trên Windows/Cygwin không xuất → các cột là NaN.
+# ------------------------------------------
+
+import numpy as np
+
+FIELDS = ["rtt", "rttvar", "snd_cwnd", "retransmits"]
+
+
+def stream_arrays(doc):
+    """
+    Mảng (n_interval × n_stream) float cho từng trường trong FIELDS,
+    cột theo thứ tự socket; ô thiếu dữ liệu là NaN.
+    """
+    intervals = doc.get("intervals", [])
+    sockets = sorted({st.get("socket") for iv in intervals for st in iv.get("streams", [])
+                      if st.get("sender", True)}, key=str)
+    col = {s: j for j, s in enumerate(sockets)}
+    arrays = {f: np.full((len(intervals), len(sockets)), np.nan) for f in FIELDS}
+    for i, iv in enumerate(intervals):
+        if iv.get("sum", {}).get("omitted"):
+            continue
+        for st in iv.get("streams", []):
+            j = col.get(st.get("socket"))
+            if j is None or not st.get("sender", True):
+                continue
+            for f in FIELDS:
+                if f in st:
+                    arrays[f][i, j] = st[f]
+    return arrays
+
+
+def jain_index(x):
+    """Chỉ số công bằng Jain: (Σx)² / (n·Σx²), 1 = chia đều tuyệt đối"""
+    x = np.asarray(x, float)
+    x = x[~np.isnan(x)]
+    if len(x) < 2 or not np.any(x):
+        return np.nan
+    return x.sum() ** 2 / (len(x) * np.sum(x * x))
+
+
+def tcp_internals(doc):
+    """Tóm tắt TCP internals của một run (RTT ms, cwnd KB, retransmits/GB, Jain)"""
+    arrays = stream_arrays(doc)
+    rtt = arrays["rtt"]
+    rtt = rtt[rtt > 0] / 1000  # µs → ms; 0 = hệ điều hành không báo
+    cwnd = arrays["snd_cwnd"]
+    cwnd = cwnd[cwnd > 0] / 1024
+    rttvar = arrays["rttvar"]
+    rttvar = rttvar[rttvar > 0] / 1000
+
+    end_streams = doc.get("end", {}).get("streams", [])
+    senders = [st.get("sender", {}) for st in end_streams]
+    receivers = [st.get("receiver", {}) for st in end_streams]
+    max_rtt = [s.get("max_rtt", 0) for s in senders if s.get("max_rtt")]
+    max_cwnd = [s.get("max_snd_cwnd", 0) for s in senders if s.get("max_snd_cwnd")]
+
+    end = doc.get("end", {})
+    sent = end.get("sum_sent") or end.get("sum") or {}
+    retrans, sent_bytes = sent.get("retransmits"), sent.get("bytes")
+    retrans_per_gb = retrans / (sent_bytes / 1e9) if retrans is not None and sent_bytes else np.nan
+
+    return {
+        "rtt_loaded_ms": np.median(rtt) if len(rtt) else np.nan,
+        "rtt_loaded_p95_ms": np.percentile(rtt, 95) if len(rtt) else np.nan,
+        "rttvar_ms": np.median(rttvar) if len(rttvar) else np.nan,
+        "rtt_max_ms": max(max_rtt) / 1000 if max_rtt else np.nan,
+        "cwnd_median_kb": np.median(cwnd) if len(cwnd) else np.nan,
+        "cwnd_max_kb": max(max_cwnd) / 1024 if max_cwnd else (cwnd.max() if len(cwnd) else np.nan),
+        "retransmits_per_gb": retrans_per_gb,
+        "stream_fairness": jain_index([r.get("bytes", np.nan) for r in receivers]),
+    }
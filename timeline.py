@@ -0,0 +1,158 @@
+# timeline.py
+# ------------------------------------------
+# Ghép theo thời gian (as-of join) mẫu CPU/RAM trong sys_usage.log
+# với các interval của iperf3 (start.timestamp.timesecs + offset interval)
+# - Mỗi mẫu monitor (psutil.cpu_percent(interval=p), p = sample_period của run trong meta.txt,
+#   mặc định 1 s) phủ [ts-p, ts], được gán vào interval iperf chứa điểm giữa ts-p/2
+# - Toàn bộ corpus được ghép trong một lần np.searchsorted trên khoá (run, thời gian)
+# Kèm chuỗi theo giây của mọi run (Mbps + RTT khi có tải) cho plot_timeseries.py
+# ------------------------------------------
+
+import warnings
+import numpy as np
+import pandas as pd
+from pathlib import Path
+
+from run_source import read_csv
+from tcp_stats import stream_arrays
+
+SAMPLE_PERIOD = 1.0  # chu kỳ mẫu monitor mặc định (run không ghi sample_period); dùng chung với session_match
+RUN_SPAN = 1e6  # khoảng cách khoá giữa 2 run (giây), lớn hơn mọi độ dài run
+
+
+def interval_mbps(iv):
+    """Throughput (Mbps) của một interval iperf3, cộng cả chiều ngược khi --bidir"""
+    bps = iv.get("sum", {}).get("bits_per_second", 0.0)
+    bps += iv.get("sum_bidir_reverse", {}).get("bits_per_second", 0.0)
+    return bps / 1e6
+
+
+def iperf_intervals(doc):
+    """
+    Trả về (t0, t1, mbps) của từng interval, tính theo epoch.
+    Interval sau -O được iperf3 đánh lại mốc 0 nên cộng thêm thời gian omit.
+    """
+    start = doc.get("start", {})
+    epoch = start.get("timestamp", {}).get("timesecs")
+    intervals = doc.get("intervals", [])
+    if epoch is None or not intervals:
+        return np.empty(0), np.empty(0), np.empty(0)
+    omit = start.get("test_start", {}).get("omit", 0) or 0
+
+    t0, t1, mbps = [], [], []
+    for iv in intervals:
+        s = iv.get("sum", {})
+        offset = 0 if s.get("omitted") else omit
+        t0.append(epoch + offset + s.get("start", 0.0))
+        t1.append(epoch + offset + s.get("end", 0.0))
+        mbps.append(interval_mbps(iv))
+    return np.asarray(t0, float), np.asarray(t1, float), np.asarray(mbps, float)
+
+
+def interval_series(doc):
+    """
+    Chuỗi theo giây của một run: (t, dt, mbps, rtt_ms), t = giây tính từ lúc bắt đầu test
+    (cộng thời gian omit như iperf_intervals, không cần timestamp), dt = độ dài interval (giây).
+    rtt_ms: trung vị RTT các stream phía gửi trong interval; NaN khi iperf3 không báo (phía nhận, Windows)
+    """
+    intervals = doc.get("intervals", [])
+    if not intervals:
+        return np.empty(0), np.empty(0), np.empty(0), np.empty(0)
+    omit = doc.get("start", {}).get("test_start", {}).get("omit", 0) or 0
+    t = np.array([(0 if iv.get("sum", {}).get("omitted") else omit) + iv.get("sum", {}).get("start", 0.0)
+                  for iv in intervals], float)
+    dt = np.array([iv.get("sum", {}).get("end", 0.0) - iv.get("sum", {}).get("start", 0.0)
+                   for iv in intervals], float)
+    mbps = np.array([interval_mbps(iv) for iv in intervals], float)
+    rtt = stream_arrays(doc)["rtt"]
+    rtt = np.where(rtt > 0, rtt / 1000, np.nan)  # µs → ms; 0 = không báo
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)  # interval không có RTT → NaN
+        rtt_ms = np.nanmedian(rtt, axis=1) if rtt.shape[1] else np.full(len(intervals), np.nan)
+    return t, dt, mbps, rtt_ms
+
+
+def read_sys_samples(path: Path):
+    """Đọc sys_usage.log → (timestamp, cpu_percent); rỗng nếu thiếu file"""
+    try:
+        df = read_csv(path, usecols=["timestamp", "cpu_percent"])
+    except Exception:
+        return np.empty(0), np.empty(0)
+    df = df.dropna()
+    return df["timestamp"].to_numpy(float), df["cpu_percent"].to_numpy(float)
+
+
+class TimelineCollector:
+    """Gom interval iperf + mẫu monitor của nhiều run, ghép một lần cho cả corpus"""
+
+    def __init__(self):
+        self.run_ids = []
+        self.iv, self.sys = [], []
+        self.series_parts = []
+
+    def add(self, run_id, doc, sys_path, sample_period=SAMPLE_PERIOD):
+        t, dt, mbps, rtt_ms = interval_series(doc)
+        if len(t):
+            self.series_parts.append(pd.DataFrame({"path": run_id, "t": t, "dt": dt, "mbps": mbps, "rtt_ms": rtt_ms}))
+        t0, t1, mbps = iperf_intervals(doc)
+        ts, cpu = read_sys_samples(sys_path)
+        if not len(t0) or not len(ts):
+            return
+        code = len(self.run_ids)
+        self.run_ids.append(run_id)
+        base = t0[0]  # thời gian tương đối so với interval đầu, giữ độ chính xác float
+        self.iv.append((np.full(len(t0), code), t0 - base, t1 - base, mbps))
+        self.sys.append((np.full(len(ts), code), ts - base, ts, cpu, np.full(len(ts), float(sample_period))))
+
+    def align(self):
+        """Trả về DataFrame cặp (CPU%, Mbps) theo từng giây trong cửa sổ truyền"""
+        cols = ["path", "timestamp", "t_rel", "cpu_percent", "mbps"]
+        if not self.run_ids:
+            return pd.DataFrame(columns=cols)
+        iv_code, iv_t0, iv_t1, iv_mbps = (np.concatenate(a) for a in zip(*self.iv))
+        s_code, s_rel, s_ts, s_cpu, s_period = (np.concatenate(a) for a in zip(*self.sys))
+
+        iv_key = iv_code * RUN_SPAN + iv_t0
+        order = np.argsort(iv_key, kind="stable")
+        iv_key, iv_code, iv_t0, iv_t1, iv_mbps = (a[order] for a in (iv_key, iv_code, iv_t0, iv_t1, iv_mbps))
+
+        mid = s_rel - s_period / 2
+        idx = np.searchsorted(iv_key, s_code * RUN_SPAN + mid, side="right") - 1
+        ok = idx >= 0
+        idx_c = np.clip(idx, 0, None)
+        ok &= (iv_code[idx_c] == s_code) & (mid < iv_t1[idx_c])
+
+        return pd.DataFrame({
+            "path": np.asarray(self.run_ids, dtype=object)[s_code[ok]],
+            "timestamp": s_ts[ok],
+            "t_rel": mid[ok],
+            "cpu_percent": s_cpu[ok],
+            "mbps": iv_mbps[idx_c[ok]],
+        }, columns=cols)
+
+
+    def series(self):
+        """Chuỗi theo giây của mọi run (kể cả run thiếu sys_usage.log): path, t, dt, mbps, rtt_ms"""
+        if not self.series_parts:
+            return pd.DataFrame(columns=["path", "t", "dt", "mbps", "rtt_ms"])
+        return pd.concat(self.series_parts, ignore_index=True)
+
+
+def efficiency(pairs):
+    """
+    Hiệu suất CPU theo từng run, chỉ tính trong cửa sổ truyền (Mbps > 0):
+    - cpu_active_mean, throughput_active_mbps: trung bình trong cửa sổ truyền
+    - cpu_per_gbit: %CPU cho mỗi Gbit/s (tỉ số hai trung bình trên)
+    - cpu_per_gbit_steady: trung vị tỉ số từng giây (ít bị ảnh hưởng bởi lúc khởi động)
+    """
+    active = pairs[pairs["mbps"] > 0].assign(
+        ratio=lambda d: d["cpu_percent"] / (d["mbps"] / 1000)
+    )
+    out = active.groupby("path").agg(
+        cpu_active_mean=("cpu_percent", "mean"),
+        throughput_active_mbps=("mbps", "mean"),
+        cpu_per_gbit_steady=("ratio", "median"),
+        active_samples=("mbps", "size"),
+    )
+    out["cpu_per_gbit"] = out["cpu_active_mean"] / (out["throughput_active_mbps"] / 1000)
+    return out.reset_index()
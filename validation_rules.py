@@ -0,0 +1,194 @@
+# validation_rules.py
+# ------------------------------------------
+# Luật kiểm tra dữ liệu khai báo một chỗ (RULES), đánh giá bằng mask vectorised trong một lượt
+# ngay lúc tổng hợp (runs/aggregate_results.py) → validation_results.csv
+# - Loại luật: not_null, range (gt/ge/lt/le), unique, consistency (cột ≤ cột khác × hệ số),
+#   group_variance (CV trong từng nhóm GROUP_KEYS, chỉ trên các dòng không bị loại)
+# - Mức độ:
+#     error : lỗi cứng → aggregator / validate_data.py thoát với exit code 1
+#     drop  : dòng vi phạm bị loại khỏi phân tích, invalid_reason = tên luật đầu tiên vi phạm
+#             (analyze_summary_full.py, watch_runs.py dùng chung)
+#     warn  : chỉ báo cáo
+# - Giá trị rỗng không bị luật range / consistency tính là vi phạm (đã có luật not_null riêng)
+# ------------------------------------------
+
+import numpy as np
+import pandas as pd
+
+from data_quality import GROUP_KEYS
+
+SEVERITIES = ("error", "drop", "warn")
+MAX_EXAMPLES = 3
+
+RULES = [
+    # Luật loại bản ghi (thứ tự = thứ tự ưu tiên của invalid_reason)
+    {"name": "throughput_nan", "kind": "not_null", "column": "throughput_mbps", "severity": "drop"},
+    {"name": "throughput_zero_or_neg", "kind": "range", "column": "throughput_mbps", "gt": 0, "severity": "drop"},
+    {"name": "cpu_nan", "kind": "not_null", "column": "cpu_mean", "severity": "drop"},
+    {"name": "cpu_zero_or_neg", "kind": "range", "column": "cpu_mean", "gt": 0, "severity": "drop"},
+    # Lỗi cứng: dữ liệu không thể đúng → dừng pipeline
+    {"name": "path_unique", "kind": "unique", "column": "path", "severity": "error", "tables": ("client", "server")},
+    {"name": "cookie_unique", "kind": "unique", "column": "cookie", "severity": "error", "tables": ("client", "server")},
+    {"name": "throughput_non_negative", "kind": "range", "column": "throughput_mbps", "ge": 0,
+     "severity": "error", "tables": ("client", "server")},
+    {"name": "loss_pct_range", "kind": "range", "column": "packet_loss_pct", "ge": 0, "le": 100, "severity": "error"},
+    # Chỉ client: server chỉ có số liệu phía mình (phía kia NaN) nên không có cặp gửi/nhận để so
+    {"name": "goodput_le_sender", "kind": "consistency", "column": "receiver_mbps", "other": "sender_mbps",
+     "factor": 1.05, "severity": "error"},
+    # Cảnh báo
+    {"name": "cpu_le_100", "kind": "range", "column": "cpu_mean", "le": 100, "severity": "warn"},
+    {"name": "latency_missing", "kind": "not_null", "column": "latency_ms", "severity": "warn"},
+    {"name": "latency_range", "kind": "range", "column": "latency_ms", "ge": 0, "lt": 10000, "severity": "warn"},
+    {"name": "throughput_cv", "kind": "group_variance", "column": "throughput_mbps", "max_cv": 30,
+     "min_count": 2, "severity": "warn"},
+]
+
+RESULT_COLUMNS = ["rule", "kind", "severity", "table", "column", "condition",
+                  "checked", "failed", "fail_pct", "status", "examples"]
+
+
+# ---------------- MASK TỪNG LUẬT -----------------
+def condition_text(rule):
+    """Điều kiện dạng chữ của luật, vd "> 0", "≥ 0, ≤ 100", "≤ 1.05 × sender_mbps" """
+    kind = rule["kind"]
+    if kind == "not_null":
+        return "không rỗng"
+    if kind == "unique":
+        return "không trùng"
+    if kind == "consistency":
+        return f"≤ {rule.get('factor', 1)} × {rule['other']}"
+    if kind == "group_variance":
+        return f"CV ≤ {rule['max_cv']}% (nhóm ≥ {rule.get('min_count', 2)} run)"
+    ops = {"gt": ">", "ge": "≥", "lt": "<", "le": "≤"}
+    return ", ".join(f"{ops[k]} {rule[k]}" for k in ops if k in rule)
+
+
+def row_masks(df, rule):
+    """(checked, failed) dạng mask theo dòng của một luật; cột thiếu → không kiểm tra"""
+    col = rule["column"]
+    if col not in df.columns or (rule["kind"] == "consistency" and rule["other"] not in df.columns):
+        none = np.zeros(len(df), bool)
+        return none, none
+    x = df[col]
+    if rule["kind"] == "not_null":
+        return np.ones(len(df), bool), x.isna().to_numpy()
+    if rule["kind"] == "unique":
+        present = x.notna().to_numpy()
+        return present, (x.duplicated(keep=False) & x.notna()).to_numpy()
+
+    x = pd.to_numeric(x, errors="coerce").to_numpy(float)
+    present = ~np.isnan(x)
+    with np.errstate(invalid="ignore"):
+        if rule["kind"] == "consistency":
+            other = pd.to_numeric(df[rule["other"]], errors="coerce").to_numpy(float)
+            present &= ~np.isnan(other)
+            bad = x > other * rule.get("factor", 1)
+        else:
+            ok = np.ones(len(df), bool)
+            if "gt" in rule: ok &= x > rule["gt"]
+            if "ge" in rule: ok &= x >= rule["ge"]
+            if "lt" in rule: ok &= x < rule["lt"]
+            if "le" in rule: ok &= x <= rule["le"]
+            bad = ~ok
+    return present, present & bad
+
+
+def group_variance(df, rules, keep):
+    """
+    Các luật group_variance trên những dòng keep, mọi cột gom trong một groupby:
+    → {tên luật: (số nhóm đủ run, mask nhóm vi phạm, nhãn nhóm)}
+    """
+    cols = sorted({r["column"] for r in rules if r["column"] in df.columns})
+    keys = [k for k in GROUP_KEYS if k in df.columns]
+    out = {}
+    if not cols or not keys:
+        return {r["name"]: (0, np.zeros(0, bool), []) for r in rules}
+    stats = df.loc[keep, keys + cols].groupby(keys, dropna=False)[cols].agg(["mean", "std", "count"])
+    labels = [" / ".join(map(str, k if isinstance(k, tuple) else (k,))) for k in stats.index]
+    for r in rules:
+        c = r["column"]
+        if c not in cols:
+            out[r["name"]] = (0, np.zeros(0, bool), [])
+            continue
+        mean, std, count = (stats[(c, s)].to_numpy(float) for s in ("mean", "std", "count"))
+        enough = count >= r.get("min_count", 2)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            cv = np.abs(std / mean) * 100
+        out[r["name"]] = (int(enough.sum()), enough & (cv > r["max_cv"]), labels)
+    return out
+
+
+# ---------------- ĐÁNH GIÁ -----------------
+def applicable(rules, table):
+    return [r for r in rules if table in r.get("tables", ("client",))]
+
+
+def evaluate(df, table="client", rules=RULES):
+    """
+    Đánh giá mọi luật áp dụng cho bảng table trong một lượt.
+    Trả về (results: một dòng mỗi luật theo RESULT_COLUMNS, invalid_reason theo dòng)
+    """
+    rules = applicable(rules, table)
+    paths = df["path"].astype(str).to_numpy() if "path" in df.columns else np.arange(len(df)).astype(str)
+    rows, drop_masks = [], []
+    for r in rules:
+        if r["kind"] == "group_variance":
+            continue
+        checked, failed = row_masks(df, r)
+        if r["severity"] == "drop":
+            drop_masks.append((r["name"], failed))
+        rows.append((r, int(checked.sum()), int(failed.sum()), list(paths[failed][:MAX_EXAMPLES])))
+
+    reason = pd.Series("", index=df.index, dtype=object)
+    if drop_masks:
+        reason[:] = np.select([m for _, m in drop_masks], [n for n, _ in drop_masks], default="")
+
+    variance = [r for r in rules if r["kind"] == "group_variance"]
+    if variance:
+        groups = group_variance(df, variance, (reason == "").to_numpy())
+        for r in variance:
+            checked, failed, labels = groups[r["name"]]
+            rows.append((r, checked, int(failed.sum()), [labels[i] for i in np.flatnonzero(failed)[:MAX_EXAMPLES]]))
+
+    order = {r["name"]: i for i, r in enumerate(rules)}
+    results = pd.DataFrame([{
+        "rule": r["name"], "kind": r["kind"], "severity": r["severity"], "table": table,
+        "column": r["column"], "condition": condition_text(r),
+        "checked": checked, "failed": failed,
+        "fail_pct": failed / checked * 100 if checked else np.nan,
+        "status": "fail" if failed else "ok", "examples": ";".join(examples),
+    } for r, checked, failed, examples in sorted(rows, key=lambda t: order[t[0]["name"]])],
+        columns=RESULT_COLUMNS)
+    return results, reason
+
+
+def invalid_reasons(df, rules=RULES):
+    """Lý do bản ghi client bị loại ("" = hợp lệ): luật drop đầu tiên vi phạm"""
+    drops = [r for r in applicable(rules, "client") if r["severity"] == "drop"]
+    return evaluate(df, "client", drops)[1]
+
+
+def hard_failures(results):
+    """Các luật error có vi phạm"""
+    return results[(results["severity"] == "error") & (results["failed"] > 0)]
+
+
+# ---------------- BÁO CÁO -----------------
+def format_report(results):
+    """Báo cáo terminal từ bảng kết quả (validation_results.csv): lỗi cứng, loại bỏ, cảnh báo"""
+    lines = []
+    titles = {"error": "LỖI CỨNG", "drop": "LOẠI KHỎI PHÂN TÍCH", "warn": "CẢNH BÁO"}
+    marks = {"error": "✗", "drop": "−", "warn": "⚠"}
+    for sev in SEVERITIES:
+        part = results[results["severity"] == sev]
+        if part.empty:
+            continue
+        lines.append(f"   [{titles[sev]}]")
+        for r in part.itertuples(index=False):
+            mark = "✓" if r.failed == 0 else marks[sev]
+            pct = f"{r.fail_pct:5.1f}%" if r.checked else "   – "
+            lines.append(f"   {mark} {r.table:6} {r.rule:24} {r.column:16} {r.condition:30} "
+                         f"{r.failed:4}/{r.checked:<4} {pct}")
+            if r.failed and isinstance(r.examples, str) and r.examples:
+                lines.append(f"       vd: {r.examples.split(';')[0]}")
+    return lines
@@ -0,0 +1,117 @@
+# watch_runs.py
+# ------------------------------------------
+# Watch mode: theo dõi runs/ trong lúc chiến dịch đo đang chạy
+# - Mỗi run_NN được nạp ngay khi meta.txt xuất hiện (harness ghi meta cuối cùng)
+# - Cập nhật thống kê theo nhóm (env, nic_mode, qos, direction, pod_config) tăng dần
+# - Cảnh báo ngay khi run vi phạm luật invalid (validation_rules.invalid_reasons)
+# ------------------------------------------
+
+import argparse, sys, time
+import pandas as pd
+import numpy as np
+from pathlib import Path
+
+from run_parsers import find_client_runs, parse_client_run, is_capacity_run
+from data_quality import GROUP_KEYS, normalize_labels
+from validation_rules import invalid_reasons
+from group_stats import GroupAccumulator
+
+METRICS = ["throughput_mbps", "latency_ms", "jitter_ms", "cpu_mean"]
+
+
+# ---------------- THỐNG KÊ TĂNG DẦN ----------------
+# GroupAccumulator (group_stats.py): count/mean/M2/min/max + sketch phân vị mỗi nhóm,
+# lưu ra --state giữa các lần chạy → khởi động lại chỉ nạp run mới
+def grouped_frame(stats):
+    frame = stats.to_frame(quantiles=(0.5,))
+    for m in METRICS:
+        frame[f"{m}_cv"] = frame[f"{m}_std"] / frame[f"{m}_mean"].replace(0, np.nan) * 100
+    return frame
+
+
+# ---------------- NẠP RUN ----------------
+def load_run(run_dir):
+    """Đọc một run và chuẩn hoá nhãn giống analyze_summary_full.py"""
+    df = normalize_labels(pd.DataFrame([parse_client_run(run_dir)]))
+    df["invalid_reason"] = invalid_reasons(df)
+    df.loc[(df["qos"] == "NOQOS") | (df["env"] == "NATIVE"), "direction"] = "none"
+    return df.iloc[0].to_dict()
+
+
+def alert(row, reasons, alerts_file):
+    print(f"\a⚠ CẢNH BÁO [{', '.join(reasons)}]: {row['path']}", file=sys.stderr)
+    line = pd.DataFrame([{"time": time.strftime("%Y-%m-%d %H:%M:%S"),
+                          "reasons": ";".join(reasons), **row}])
+    line.to_csv(alerts_file, mode="a", header=not alerts_file.exists(), index=False)
+
+
+def scan(root, stats, alerts_file, quiet=False):
+    """Quét một lượt, nạp các run mới đã có meta.txt (run đã có trong stats.sources bị bỏ qua);
+    trả về số run mới (run không hợp lệ chỉ cảnh báo, không đưa vào thống kê nhóm)"""
+    new = 0
+    for run_dir in find_client_runs(root):
+        if str(run_dir) in stats.sources or not (run_dir / "meta.txt").exists():
+            continue
+        stats.sources.add(str(run_dir))
+        if is_capacity_run(run_dir):  # capacity UDP không có số liệu TCP để thống kê
+            continue
+        row = load_run(run_dir)
+        key = tuple(row[k] for k in GROUP_KEYS)
+        if not row["invalid_reason"]:
+            stats.update(pd.DataFrame([row]), id_col=None)
+        new += 1
+        if quiet:
+            continue
+
+        reasons = [row["invalid_reason"]] if row["invalid_reason"] else []
+        if pd.isna(row["latency_ms"]):
+            reasons.append("ping_missing")
+        if reasons:
+            alert(row, reasons, alerts_file)
+
+        if key not in stats.cells:
+            continue
+        s = stats.summary(key)
+        cv = s["throughput_mbps_std"] / s["throughput_mbps_mean"] * 100 if s["throughput_mbps_mean"] else np.nan
+        print(f"[{time.strftime('%H:%M:%S')}] {'/'.join(map(str, key))} "
+              f"n={s['throughput_mbps_count']} "
+              f"tput={row['throughput_mbps']:.2f} Mbps (mean {s['throughput_mbps_mean']:.2f}, "
+              f"cv {cv:.1f}%)")
+    return new
+
+
+# ---------------- MAIN ----------------
+def main():
+    parser = argparse.ArgumentParser(description="Theo dõi và tổng hợp tăng dần các run mới trong runs/")
+    parser.add_argument("--root", default="runs")
+    parser.add_argument("--interval", type=float, default=5.0, help="Chu kỳ quét (giây)")
+    parser.add_argument("--out", default="summary_watch_grouped.csv")
+    parser.add_argument("--alerts", default="watch_alerts.csv")
+    parser.add_argument("--state", default="watch_state.json",
+                        help="File lưu accumulator nhóm giữa các lần chạy (xoá để nạp lại từ đầu)")
+    parser.add_argument("--alert-existing", action="store_true",
+                        help="Cảnh báo cả các run đã có sẵn khi khởi động")
+    parser.add_argument("--once", action="store_true", help="Quét một lần rồi thoát")
+    args = parser.parse_args()
+
+    root, out, alerts_file, state = Path(args.root), Path(args.out), Path(args.alerts), Path(args.state)
+    stats = GroupAccumulator.load(state) if state.exists() else GroupAccumulator(GROUP_KEYS, METRICS)
+    known = len(stats.sources)
+
+    n = scan(root, stats, alerts_file, quiet=not args.alert_existing)
+    stats.save(state)
+    grouped_frame(stats).to_csv(out, index=False)
+    print(f"Đã nạp {n} run mới từ {root} ({known} run từ {state}, {len(stats.cells)} nhóm) → {out}")
+
+    try:
+        while not args.once:
+            time.sleep(args.interval)
+            if scan(root, stats, alerts_file):
+                stats.save(state)
+                grouped_frame(stats).to_csv(out, index=False)
+    except KeyboardInterrupt:
+        print("\nDừng watch mode.")
+
+
+if __name__ == "__main__":
+    main()